@@ -0,0 +1,229 @@
+"""
+Journal des accès en JSON Lines, en ajout seul
+
+Chaque entrée est une ligne JSON ajoutée en une seule écriture (O_APPEND) :
+pas de relecture ni de réécriture du fichier du jour. Les fichiers tournent
+par jour (logs/access_AAAAMMJJ.jsonl) et, en option, par taille ; les
+fichiers fermés peuvent être compressés en gzip. Un verrou de fichier
+protège la rotation quand plusieurs processus écrivent en même temps.
+
+Les entrées passent par une file vidée par un thread d'arrière-plan : le
+formulaire de connexion n'attend jamais le disque.
+"""
+import atexit
+import datetime
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows : seul le verrou entre threads s'applique
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LOG_DIR = Path(os.environ.get("CACAO_LOG_DIR", "logs"))
+
+# Taille maximale d'un fichier du jour avant rotation (octets, 0 = rotation par jour uniquement)
+DEFAULT_MAX_BYTES = int(os.environ.get("CACAO_LOG_MAX_BYTES", "0"))
+DEFAULT_COMPRESS = os.environ.get("CACAO_LOG_COMPRESS", "0") == "1"
+
+# access_AAAAMMJJ.json (ancien format), access_AAAAMMJJ.jsonl, access_AAAAMMJJ.NNN.jsonl[.gz]
+_LOG_NAME = re.compile(r"^access_(\d{8})(?:\.(\d+))?\.(json|jsonl)(\.gz)?$")
+
+
+def _day(timestamp):
+    return datetime.datetime.fromisoformat(timestamp).strftime("%Y%m%d")
+
+
+def _compress(path):
+    """Compresse un fichier fermé en .gz puis supprime l'original"""
+    target = path.with_name(path.name + ".gz")
+    if target.exists():
+        # Entrées tardives d'un jour déjà compressé : ajoutées comme un nouveau membre gzip
+        with open(path, "rb") as src, gzip.open(target, "ab") as dst:
+            shutil.copyfileobj(src, dst)
+    else:
+        tmp = path.with_name(f".{target.name}.tmp")
+        with open(path, "rb") as src, gzip.open(tmp, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp, target)
+    path.unlink()
+    return target
+
+
+class _FileLock:
+    """Verrou exclusif inter-processus (flock) doublé d'un verrou entre threads"""
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._handle = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._handle = open(self.path, "a")
+            fcntl.flock(self._handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._handle is not None:
+            fcntl.flock(self._handle, fcntl.LOCK_UN)
+            self._handle.close()
+            self._handle = None
+        self._thread_lock.release()
+
+
+class AccessLogSink:
+    """Écrivain du journal des accès : ajout seul, rotation par jour / taille, écriture en arrière-plan"""
+
+    def __init__(self, log_dir=LOG_DIR, max_bytes=DEFAULT_MAX_BYTES, compress=DEFAULT_COMPRESS, background=True):
+        self.log_dir = Path(log_dir)
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self._lock = _FileLock(self.log_dir / ".access.lock")
+        self._queue = None
+        self._thread = None
+        if background:
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, name="access-log", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def path_for(self, day):
+        """Fichier actif d'un jour (AAAAMMJJ)"""
+        return self.log_dir / f"access_{day}.jsonl"
+
+    def write(self, entry):
+        """Ajoute une entrée (dict avec un horodatage ISO 'timestamp')"""
+        if self._queue is None:
+            self._append([entry])
+        else:
+            self._queue.put(entry)
+
+    def flush(self):
+        """Attend que toutes les entrées en file soient écrites"""
+        if self._queue is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._queue is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                self._queue.task_done()
+                return
+            batch = [entry]
+            # Regroupe les entrées arrivées entre-temps en une seule écriture
+            while True:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    self._queue.put(None)
+                    self._queue.task_done()
+                    break
+                batch.append(entry)
+            try:
+                self._append(batch)
+            except Exception:
+                # Le thread doit survivre (sinon flush() attendrait indéfiniment) : le lot est perdu
+                logger.exception("Écriture du journal des accès impossible (%d entrées perdues)", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _append(self, entries):
+        by_day = {}
+        for entry in entries:
+            by_day.setdefault(_day(entry["timestamp"]), []).append(entry)
+
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            for day, day_entries in by_day.items():
+                data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in day_entries).encode("utf-8")
+                path = self.path_for(day)
+                if self.max_bytes and path.exists() and path.stat().st_size + len(data) > self.max_bytes:
+                    self._rotate(day)
+                fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, data)
+                finally:
+                    os.close(fd)
+            if self.compress:
+                self._compress_closed(max(by_day))
+
+    def _rotate(self, day):
+        """Renomme le fichier actif du jour en segment numéroté (access_AAAAMMJJ.NNN.jsonl)"""
+        numbers = [int(m.group(2)) for m in map(_LOG_NAME.match, (p.name for p in self.log_dir.iterdir()))
+                   if m and m.group(1) == day and m.group(2)]
+        segment = self.log_dir / f"access_{day}.{max(numbers, default=0) + 1:03d}.jsonl"
+        os.replace(self.path_for(day), segment)
+        if self.compress:
+            _compress(segment)
+
+    def _compress_closed(self, current_day):
+        """Compresse les fichiers des jours précédents encore en clair"""
+        for path in self.log_dir.glob("access_*.jsonl"):
+            match = _LOG_NAME.match(path.name)
+            if match and match.group(1) < current_day:
+                _compress(path)
+
+
+def log_files(log_dir=LOG_DIR):
+    """Fichiers du journal (ancien format JSON compris), du plus récent au plus ancien"""
+    log_dir = Path(log_dir)
+    if not log_dir.exists():
+        return []
+    files = [p for p in log_dir.iterdir() if _LOG_NAME.match(p.name)]
+    return sorted(files, key=lambda p: (_LOG_NAME.match(p.name).group(1), p.name), reverse=True)
+
+
+def read_entries(path):
+    """Entrées d'un fichier du journal : JSON Lines (éventuellement gzip) ou ancienne liste JSON"""
+    path = Path(path)
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        if _LOG_NAME.match(path.name).group(3) == "json":
+            try:
+                return json.load(f)
+            except ValueError:
+                return []
+        entries = []
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # Ligne tronquée (arrêt brutal pendant une écriture) : ignorée
+                continue
+        return entries
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_sink():
+    """Écrivain partagé du processus (créé au premier appel)"""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = AccessLogSink()
+        return _sink
@@ -0,0 +1,325 @@
+"""
+Cube d'agrégats partagé par les onglets du dashboard
+
+Les achats sont agrégés une seule fois par version du jeu de données au grain
+exportateur × fournisseur × région (volumes par port et nombre de lignes).
+Tous les onglets lisent ensuite des tranches de ce cube au lieu de relancer
+un groupby sur les lignes brutes à chaque rerun Streamlit.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from data_cache import dataset_version
+
+COL_EXPORTATEUR = 'EXPORTATEUR SIMPLE'
+COL_FOURNISSEUR = 'Nom fournisseur'
+COL_REGION = 'Region activité'
+COL_VOLUME = 'Volume livré (kg)'
+COL_TOTAL_EXPORTE = 'Total Exporté'
+COL_NB_LIGNES = 'Nb lignes'
+PORT_COLS = ['ABIDJAN', 'INTERIEUR', 'SAN PEDRO']
+REGION_NON_SPECIFIEE = 'Non spécifié'
+
+# Nombre de versions de jeux de données gardées en mémoire
+_CACHE_SIZE = 8
+
+# Au-delà de ce nombre de cases clés × valeurs, grouped_mode compte en mode creux
+_DENSE_MODE_LIMIT = 20_000_000
+
+
+@dataclass(frozen=True)
+class AchatsCube:
+    """Agrégats des achats (dB ACHAT)
+
+    lignes        : (exportateur, fournisseur, région) -> volumes, ports, nb lignes
+    paires        : (exportateur, fournisseur) -> volumes, ports, nb lignes, région modale
+    exportateurs  : exportateur -> volumes, ports, nb fournisseurs
+    fournisseurs  : fournisseur -> volumes, ports, nb exportateurs, région modale
+    """
+    version: str
+    lignes: pd.DataFrame
+    paires: pd.DataFrame
+    exportateurs: pd.DataFrame
+    fournisseurs: pd.DataFrame
+    total_volume: float
+
+    def fournisseurs_exportateur(self, exportateur):
+        """Fournisseurs d'un exportateur (volumes, ports, région modale)"""
+        return self.paires.xs(exportateur, level=COL_EXPORTATEUR)
+
+
+@dataclass(frozen=True)
+class ExportsCube:
+    """Agrégats des exports (dB EXPORT) : exportateur -> volumes par port et total exporté"""
+    version: str
+    exportateurs: pd.DataFrame
+
+
+@dataclass(frozen=True)
+class RowIndex:
+    """Positions des lignes brutes par valeur d'une dimension (format CSR)
+
+    Les lignes de la valeur n°i sont order[offsets[i]:offsets[i + 1]] :
+    extraire les lignes d'un exportateur coûte O(lignes de cet exportateur).
+    """
+    valeurs: pd.Index
+    order: np.ndarray
+    offsets: np.ndarray
+
+    def positions(self, valeur):
+        """Positions (iloc) des lignes ayant cette valeur ; tableau vide si absente"""
+        loc = self.valeurs.get_indexer([valeur])[0]
+        if loc < 0:
+            return self.order[:0]
+        return self.order[self.offsets[loc]:self.offsets[loc + 1]]
+
+
+@dataclass(frozen=True)
+class AchatsIndex:
+    """Index des lignes d'achat par exportateur et par fournisseur"""
+    version: str
+    exportateurs: RowIndex
+    fournisseurs: RowIndex
+
+    def lignes_exportateur(self, df, exportateur):
+        """Lignes d'achat d'un exportateur, sans balayer toute la table"""
+        return df.iloc[self.exportateurs.positions(exportateur)]
+
+    def lignes_fournisseur(self, df, fournisseur):
+        """Lignes d'achat d'un fournisseur, sans balayer toute la table"""
+        return df.iloc[self.fournisseurs.positions(fournisseur)]
+
+
+class _VersionCache:
+    """Petit cache LRU thread-safe indexé par version de jeu de données"""
+
+    def __init__(self, size=_CACHE_SIZE):
+        self._size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, builder):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        value = builder()
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self._size:
+                self._items.popitem(last=False)
+        return value
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_achats_cubes = _VersionCache()
+_exports_cubes = _VersionCache()
+_achats_index = _VersionCache()
+
+
+def _value_cols(df):
+    return [col for col in [COL_VOLUME] + PORT_COLS if col in df.columns]
+
+
+def _factorize_keys(keys):
+    """Codes entiers (triés) et valeurs uniques d'une ou plusieurs colonnes de regroupement"""
+    if isinstance(keys, pd.DataFrame):
+        if keys.shape[1] > 1:
+            return pd.MultiIndex.from_frame(keys).factorize(sort=True)
+        keys = keys.iloc[:, 0]
+    codes, uniques = pd.factorize(keys, sort=True)
+    return codes, pd.Index(uniques, name=getattr(keys, 'name', None))
+
+
+def grouped_mode(keys, values, weights=None, default=None):
+    """Valeur la plus fréquente de values pour chaque clé (équivalent vectorisé de groupby().agg(mode))
+
+    Les valeurs sont codées par factorisation triée puis comptées en une passe
+    (np.bincount) ; en cas d'égalité, la plus petite valeur dans l'ordre de tri
+    l'emporte, comme Series.mode().iloc[0]. weights permet de compter des
+    lignes déjà pré-agrégées. Les valeurs manquantes sont ignorées ; une clé
+    sans aucune valeur reçoit default.
+    """
+    key_codes, key_uniques = _factorize_keys(keys)
+    value_codes, value_uniques = pd.factorize(values, sort=True)
+    n_keys, n_values = len(key_uniques), len(value_uniques)
+
+    result = np.full(n_keys, default, dtype=object)
+    valid = value_codes >= 0
+    if n_keys == 0 or n_values == 0 or not valid.any():
+        return pd.Series(result, index=key_uniques)
+
+    key_codes = key_codes[valid]
+    value_codes = value_codes[valid]
+    counts_weights = None if weights is None else np.asarray(weights, dtype=float)[valid]
+    pairs = key_codes.astype(np.int64) * n_values + value_codes
+
+    if n_keys * n_values <= _DENSE_MODE_LIMIT:
+        # Table dense clés × valeurs : argmax renvoie la première valeur (la plus petite) à égalité
+        counts = np.bincount(pairs, weights=counts_weights, minlength=n_keys * n_values)
+        counts = counts.reshape(n_keys, n_values)
+        best = counts.argmax(axis=1)
+        present = counts[np.arange(n_keys), best] > 0
+    else:
+        # Beaucoup de combinaisons : comptage sur les seules paires présentes
+        unique_pairs, inverse = np.unique(pairs, return_inverse=True)
+        counts = np.bincount(inverse, weights=counts_weights)
+        pair_keys, pair_values = np.divmod(unique_pairs, n_values)
+        order = np.lexsort((pair_values, -counts, pair_keys))
+        first = order[np.r_[True, pair_keys[order][1:] != pair_keys[order][:-1]]]
+        best = np.zeros(n_keys, dtype=np.int64)
+        present = np.zeros(n_keys, dtype=bool)
+        best[pair_keys[first]] = pair_values[first]
+        present[pair_keys[first]] = True
+
+    result[present] = np.asarray(value_uniques, dtype=object)[best[present]]
+    return pd.Series(result, index=key_uniques)
+
+
+def aggregate_achats_lignes(df):
+    """Grain le plus fin du cube : un groupby des lignes brutes par exportateur × fournisseur × région"""
+    value_cols = _value_cols(df)
+    keys = [COL_EXPORTATEUR, COL_FOURNISSEUR, COL_REGION]
+
+    grouped = df.groupby(keys, observed=True, sort=True)
+    lignes = grouped[value_cols].sum()
+    lignes[COL_NB_LIGNES] = grouped.size()
+    return lignes
+
+
+def build_achats_cube(df, version=None):
+    """Construit le cube des achats en un seul groupby sur les lignes brutes"""
+    return _derive_achats_cube(version or dataset_version(df), aggregate_achats_lignes(df))
+
+
+def achats_cube_from_lignes(lignes, version):
+    """Reconstruit un cube depuis son grain le plus fin (ex. relu depuis le disque)"""
+    return _derive_achats_cube(version, lignes)
+
+
+def update_achats_cube(cube, new_rows, version):
+    """Ajoute de nouvelles lignes d'achat au cube par delta
+
+    Seules les nouvelles lignes sont agrégées ; la fusion et les vues dérivées
+    coûtent O(nombre de groupes), indépendamment du nombre de lignes de la saison.
+    """
+    delta = aggregate_achats_lignes(new_rows)
+    lignes = _merge_sums(cube.lignes, delta)
+    return _derive_achats_cube(version, lignes)
+
+
+def _merge_sums(current, delta):
+    """Somme de deux agrégats indexés par les mêmes clés (union des clés)"""
+    if len(delta) == 0:
+        return current
+    levels = list(range(current.index.nlevels))
+    merged = pd.concat([current, delta]).groupby(level=levels, sort=True).sum()
+    merged.index.names = current.index.names
+    return merged
+
+
+def _derive_achats_cube(version, lignes):
+    """Dérive les vues paires / exportateurs / fournisseurs depuis le grain le plus fin"""
+    value_cols = [col for col in lignes.columns if col != COL_NB_LIGNES]
+    sum_cols = value_cols + [COL_NB_LIGNES]
+
+    paires = lignes.groupby(level=[COL_EXPORTATEUR, COL_FOURNISSEUR], sort=True)[sum_cols].sum()
+    regions = lignes.index.to_frame(index=False)
+    paires[COL_REGION] = grouped_mode(
+        regions[[COL_EXPORTATEUR, COL_FOURNISSEUR]], regions[COL_REGION],
+        weights=lignes[COL_NB_LIGNES], default=REGION_NON_SPECIFIEE
+    )
+
+    exportateurs = paires.groupby(level=COL_EXPORTATEUR, sort=True)[value_cols].sum()
+    exportateurs['Nb Fournisseurs'] = paires.groupby(level=COL_EXPORTATEUR, sort=True).size()
+
+    fournisseurs = paires.groupby(level=COL_FOURNISSEUR, sort=True)[value_cols].sum()
+    fournisseurs['Nb Exportateurs'] = paires.groupby(level=COL_FOURNISSEUR, sort=True).size()
+    fournisseurs[COL_REGION] = grouped_mode(
+        regions[COL_FOURNISSEUR], regions[COL_REGION],
+        weights=lignes[COL_NB_LIGNES], default=REGION_NON_SPECIFIEE
+    )
+
+    total_volume = lignes[COL_VOLUME].sum() if COL_VOLUME in lignes.columns else 0
+    return AchatsCube(version, lignes, paires, exportateurs, fournisseurs, total_volume)
+
+
+def build_row_index(column):
+    """Index CSR d'une colonne : tri stable des codes puis bornes par comptage"""
+    codes, valeurs = pd.factorize(column, sort=True)
+    valid = codes >= 0
+    order = np.flatnonzero(valid)[np.argsort(codes[valid], kind='stable')]
+    offsets = np.zeros(len(valeurs) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes[valid], minlength=len(valeurs)), out=offsets[1:])
+    return RowIndex(pd.Index(valeurs), order, offsets)
+
+
+def build_achats_index(df, version=None):
+    """Index des lignes d'achat par exportateur et par fournisseur"""
+    return AchatsIndex(
+        version or dataset_version(df),
+        build_row_index(df[COL_EXPORTATEUR]),
+        build_row_index(df[COL_FOURNISSEUR]),
+    )
+
+
+def _aggregate_exports(df_exports):
+    cols = [col for col in PORT_COLS + [COL_TOTAL_EXPORTE] if col in df_exports.columns]
+    return df_exports.groupby(COL_EXPORTATEUR, observed=True, sort=True)[cols].sum()
+
+
+def build_exports_cube(df_exports, version=None):
+    """Agrège les exports par exportateur (ports et total exporté)"""
+    return ExportsCube(version or dataset_version(df_exports), _aggregate_exports(df_exports))
+
+
+def update_exports_cube(cube, new_rows, version):
+    """Ajoute de nouvelles lignes d'export aux agrégats par delta"""
+    return ExportsCube(version, _merge_sums(cube.exportateurs, _aggregate_exports(new_rows)))
+
+
+def get_achats_cube(df):
+    """Cube des achats, construit une fois par version du jeu de données"""
+    version = dataset_version(df)
+    return _achats_cubes.get_or_build(version, lambda: build_achats_cube(df, version))
+
+
+def get_exports_cube(df_exports):
+    """Agrégats des exports, construits une fois par version du jeu de données"""
+    version = dataset_version(df_exports)
+    return _exports_cubes.get_or_build(version, lambda: build_exports_cube(df_exports, version))
+
+
+def register_cubes(df_achats=None, achats_cube=None, df_exports=None, exports_cube=None):
+    """Enregistre des cubes déjà calculés (ex. mis à jour par delta) pour la version de ces frames"""
+    if df_achats is not None and achats_cube is not None:
+        _achats_cubes.get_or_build(dataset_version(df_achats), lambda: achats_cube)
+    if df_exports is not None and exports_cube is not None:
+        _exports_cubes.get_or_build(dataset_version(df_exports), lambda: exports_cube)
+
+
+def get_achats_index(df):
+    """Index des lignes d'achat, construit une fois par version du jeu de données"""
+    version = dataset_version(df)
+    return _achats_index.get_or_build(version, lambda: build_achats_index(df, version))
+
+
+def clear_caches():
+    """Vide les caches de cubes et d'index (mesures de performance à froid)"""
+    for cache in (_achats_cubes, _exports_cubes, _achats_index):
+        cache.clear()
@@ -4,8 +4,35 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
-from pathlib import Path
 from auth import check_password, show_access_logs
+from catalog import DatasetCatalog
+from aggregations import get_achats_index
+from analytics import (anomalies_ecarts, anomalies_saisons, classement_fournisseurs, concentration_fournisseurs,
+                       concurrence_exportateurs, consolidation_achats, ecarts_achats_exports, fournisseurs_exportateur,
+                       preferences_ports)
+from anomalies import SEUIL_Z
+from comparison import COL_PART_SP, MAX_SAISONS, compare_seasons
+from competition import SEUIL_JACCARD, get_competition_graph
+from explorer import PAGE_SIZE, PAGE_SIZES, get_explorer_index, nb_pages, page_donnees
+from figures import cached_figure, decimate, histogram_figure
+from matrix import get_supplier_matrix
+from schema import memory_report
+from theme import BON_PLEIN_COLORS, format_number, format_tonnage
+from timeseries import FREQUENCES, courbes_campagne, season_rollups, tableau_plage
+
+# Couples saison × exportateur affichés dans la détection d'anomalies
+TOP_ANOMALIES = 200
+
+# Vues du tableau de bord (barre de navigation)
+VUES = [
+    "Vue Achats",
+    "Fournisseurs", 
+    "Écarts Achats/Exports",
+    "ABJ vs SP",
+    "Comparaison Saisons",
+    "Évolution Temporelle",
+    "Données Brutes"
+]
 
 st.set_page_config(
     page_title="Dashboard Achats Cacao - Côte d'Ivoire",
@@ -92,113 +119,31 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
-def load_data(file_path, sheet_name='dB ACHAT'):
-    """Charge les données depuis le fichier Excel"""
+@st.cache_resource
+def get_catalog():
+    """Catalogue des saisons de Master_Data/, partagé par toutes les sessions"""
+    return DatasetCatalog()
+
+def load_season(label):
+    """Charge les feuilles dB ACHAT et dB EXPORT d'une saison (à la première demande uniquement)"""
     try:
-        df = pd.read_excel(file_path, sheet_name=sheet_name)
-        
-        # Utiliser la première ligne comme en-têtes de colonnes
-        new_columns = df.iloc[0].astype(str).tolist()
-        df.columns = new_columns
-        
-        # Supprimer la première ligne qui contenait les en-têtes
-        df = df.iloc[1:].reset_index(drop=True)
-        
-        # Pour dB EXPORT, renommer les colonnes pour cohérence
-        if sheet_name == 'dB EXPORT':
-            rename_map = {
-                'ABJ': 'ABIDJAN',
-                'SP': 'SAN PEDRO',
-                'Total général': 'Total Exporté'
-            }
-            df = df.rename(columns=rename_map)
-            # Ajouter colonne INTERIEUR si elle n'existe pas
-            if 'INTERIEUR' not in df.columns:
-                df['INTERIEUR'] = 0
-        
-        # Nettoyer les colonnes numériques
-        numeric_cols = ['Volume livré (kg)', 'ABIDJAN', 'INTERIEUR', 'SAN PEDRO', 'Volume exporté (kg)', 'Total Exporté']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-        
-        # Nettoyer les colonnes texte
-        text_cols = ['Code fournisseur', 'Nom fournisseur', 'Exportateurs', 'EXPORTATEUR SIMPLE', 'Region activité']
-        for col in text_cols:
-            if col in df.columns:
-                df[col] = df[col].astype(str).replace('nan', 'Non renseigné').fillna('Non renseigné')
-        
-        # Pour la feuille ACHAT uniquement: Filtrer les lignes "Non renseigné"
-        if sheet_name == 'dB ACHAT':
-            df = df[
-                (df['Nom fournisseur'] != 'Non renseigné') & 
-                (df['EXPORTATEUR SIMPLE'] != 'Non renseigné')
-            ].copy()
-        
-        return df
+        return get_catalog().get(label)
     except Exception as e:
         st.error(f"Erreur lors du chargement des données: {e}")
-        return None
-
-# Configuration des couleurs BON PLEIN pour les graphiques
-BON_PLEIN_COLORS = {
-    'primary': '#1e3a5f',
-    'secondary': '#2c5282', 
-    'accent': '#bee3f8',
-    'text': '#2c3e50',
-    'text_secondary': '#666',
-    'palette': ['#1e3a5f', '#2c5282', '#bee3f8', '#4a5568', '#2d3748', '#1a202c', '#718096', '#4299e1', '#63b3ed', '#90cdf4']
-}
-
-def format_number(num):
-    """Formate un nombre selon les standards BON PLEIN : Arial, pas de virgule, séparateur milliers"""
-    if isinstance(num, (int, float)):
-        # Toujours convertir en entier et ajouter séparateur de milliers
-        return f"{int(num):,}".replace(",", " ")
-    return str(num)
-
-def format_tonnage(kg_value):
-    """Formate un tonnage : XXX XXX tonnes"""
-    tonnes = kg_value / 1000
-    return f"{format_number(tonnes)} tonnes"
-
-def apply_bon_plein_theme(fig):
-    """Applique le thème BON PLEIN à un graphique Plotly"""
-    fig.update_layout(
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font=dict(
-            family="Arial, sans-serif",
-            size=12,
-            color=BON_PLEIN_COLORS['text']
-        ),
-        title=dict(
-            font=dict(size=16, color=BON_PLEIN_COLORS['primary'], weight='normal'),
-            x=0.5,
-            xanchor='center'
-        ),
-        xaxis=dict(
-            gridcolor='rgba(190, 227, 248, 0.3)',
-            linecolor=BON_PLEIN_COLORS['accent'],
-            tickcolor=BON_PLEIN_COLORS['secondary']
-        ),
-        yaxis=dict(
-            gridcolor='rgba(190, 227, 248, 0.3)', 
-            linecolor=BON_PLEIN_COLORS['accent'],
-            tickcolor=BON_PLEIN_COLORS['secondary']
-        ),
-        colorway=BON_PLEIN_COLORS['palette']
-    )
-    return fig
+        return None, None
 
 def main():
     # Vérifier l'authentification
     if not check_password():
         st.stop()
     
+    # Sélection de la saison (un classeur par campagne dans Master_Data/)
+    seasons = get_catalog().seasons()
+    season_labels = [season.label for season in seasons]
+    selected_season = st.sidebar.selectbox("Saison", season_labels) if season_labels else None
+    
     # Header BON PLEIN - Style exact du repo de référence
-    st.markdown("""
+    st.markdown(f"""
     <div style="background: linear-gradient(135deg, #1e3a5f 0%, #2c5282 100%); 
                 color: white; border-radius: 8px; padding: 2rem; margin-bottom: 2rem; 
                 margin: -1rem -1rem 2rem -1rem; display: flex; align-items: center; justify-content: space-between;">
@@ -207,7 +152,7 @@ def main():
                  width="80" height="80" style="margin-right: 20px; border-radius: 8px; background: white; padding: 5px;">
             <div>
                 <h1 style='margin: 0; font-size: 2.2rem; color: white;'>Achats de cacao de Côte d'Ivoire</h1>
-                <p style='margin: 0.5rem 0 0 0; color: #bee3f8;'>Dashboard des Achats Cacao (2020-2021)</p>
+                <p style='margin: 0.5rem 0 0 0; color: #bee3f8;'>Dashboard des Achats Cacao ({selected_season or '-'})</p>
             </div>
         </div>
         <div style="text-align: right; color: #bee3f8; font-size: 0.9rem;">
@@ -217,16 +162,14 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    # Chargement direct du fichier local
+    # Chargement de la saison sélectionnée (lazy, partagé entre sessions)
     df = None
     
-    default_file = Path("Master_Data/DB - Achat Cacao - 2022021.xlsx")
-    if default_file.exists():
-        df = load_data(default_file, sheet_name='dB ACHAT')
-        df_export = load_data(default_file, sheet_name='dB EXPORT')
+    if selected_season:
+        df, df_export = load_season(selected_season)
         # Données chargées silencieusement
     else:
-        st.error("Fichier de données non trouvé: Master_Data/DB - Achat Cacao - 2022021.xlsx")
+        st.error("Aucun classeur de données trouvé dans Master_Data/")
         df_export = None
     
     if df is not None:
@@ -241,6 +184,8 @@ def main():
                 st.write("**Dimensions:**", df.shape)
                 st.write("**Nombre d'exportateurs:**", df['EXPORTATEUR SIMPLE'].nunique())
                 st.write("**Nombre de fournisseurs:**", df['Nom fournisseur'].nunique())
+                if 'Fournisseur canonique' in df.columns:
+                    st.write("**Fournisseurs après regroupement des variantes:**", df['Fournisseur canonique'].nunique())
             
             with col2:
                 st.write("**Volume total:**", f"{format_number(df['Volume livré (kg)'].sum())} kg")
@@ -251,41 +196,54 @@ def main():
                 st.write("**Types de données:**", df.dtypes.to_dict())
                 st.write("**Premières lignes:**")
                 st.dataframe(df.head(3), use_container_width=True)
+                
+                # Gain mémoire du schéma typé (catégories, volumes en entiers ajustés)
+                rapport_memoire, memoire, memoire_brute, ratio = memory_report(df)
+                st.write(
+                    "**Mémoire:**",
+                    f"{format_number(memoire / 1024)} Ko au lieu de {format_number(memoire_brute / 1024)} Ko "
+                    f"sans typage (÷{ratio:.1f})"
+                )
+                st.dataframe(rapport_memoire, use_container_width=True, hide_index=True)
         
-        # Navigation par onglets
-        tab1, tab2, tab3, tab4, tab5 = st.tabs([
-            "Vue Achats",
-            "Fournisseurs", 
-            "Écarts Achats/Exports",
-            "ABJ vs SP",
-            "Données Brutes"
-        ])
+        # Navigation par vues : seule la vue sélectionnée est calculée et affichée à
+        # chaque interaction (st.tabs exécute le contenu de tous les onglets) ; les
+        # résultats des vues déjà visitées restent mémorisés (analytics, figures)
+        vue = st.radio("Vue", VUES, horizontal=True, key="vue_active", label_visibility="collapsed")
         
-        with tab1:
+        if vue == "Vue Achats":
             st.header("Vue d'Ensemble des Achats")
             analyse_achats_exports(df)
         
-        with tab2:
+        elif vue == "Fournisseurs":
             st.header("Plus Grands Fournisseurs par Exportateur")
             analyse_fournisseurs(df)
         
-        with tab3:
+        elif vue == "Écarts Achats/Exports":
             st.header("Différences de Poids Achat/Export")
             if df_export is not None:
-                analyse_differences_poids(df, df_export)
+                analyse_differences_poids(df, df_export, selected_season)
             else:
                 st.error("Données d'export non disponibles")
         
-        with tab4:
+        elif vue == "ABJ vs SP":
             st.header("Comparaison Tendances ABJ vs SP")
             if df_export is not None:
                 analyse_abj_vs_sp(df_export)
             else:
                 st.error("Données d'export non disponibles")
         
-        with tab5:
+        elif vue == "Comparaison Saisons":
+            st.header("Comparaison entre Saisons")
+            comparaison_saisons()
+        
+        elif vue == "Évolution Temporelle":
+            st.header("Évolution Temporelle des Expéditions")
+            evolution_temporelle(selected_season)
+        
+        elif vue == "Données Brutes":
             st.header("Données Brutes")
-            st.dataframe(df, use_container_width=True)
+            explorer_donnees_brutes(df)
     
     else:
         st.info("Veuillez charger un fichier de données pour commencer l'analyse")
@@ -306,10 +264,10 @@ def main():
 def analyse_achats_exports(df):
     """Vue d'ensemble des ACHATS uniquement (les exports viennent d'une autre base)"""
     
-    # Focus sur les données d'achats
-    
-    # Calculs ACHATS uniquement
-    total_achete_global = df['Volume livré (kg)'].sum()
+    # Calculs mémorisés par version du jeu de données (module analytics)
+    resultat = consolidation_achats(df)
+    total_achete_global = resultat.total_volume
+    consolidation_achats_df = resultat.exportateurs
     
     # Métriques principales - ACHATS SEULEMENT
     col1, col2, col3 = st.columns(3)
@@ -322,71 +280,51 @@ def analyse_achats_exports(df):
         )
     
     with col2:
-        nb_fournisseurs = df['Nom fournisseur'].nunique()
         st.metric(
             "Nombre de Fournisseurs",
-            f"{format_number(nb_fournisseurs)}",
+            f"{format_number(resultat.nb_fournisseurs)}",
             "fournisseurs uniques"
         )
     
     with col3:
-        nb_exportateurs = df['EXPORTATEUR SIMPLE'].nunique()
         st.metric(
             "Nombre d'Exportateurs",
-            f"{format_number(nb_exportateurs)}",
+            f"{format_number(resultat.nb_exportateurs)}",
             "exportateurs actifs"
         )
     
     # Consolidation ACHATS par EXPORTATEUR
     st.subheader("Achats par Exportateur")
     
-    consolidation_achats = df.groupby('EXPORTATEUR SIMPLE').agg({
-        'Volume livré (kg)': 'sum',        # Ce qu'ils ont acheté aux fournisseurs
-        'Nom fournisseur': 'nunique'       # Nombre de fournisseurs différents
-    }).round(0)
-    
-    # Renommer colonnes
-    consolidation_achats.rename(columns={
-        'Nom fournisseur': 'Nb Fournisseurs'
-    }, inplace=True)
-    
-    # Calculer pourcentages
-    consolidation_achats['% du Total'] = (consolidation_achats['Volume livré (kg)'] / total_achete_global * 100).round(1)
-    
-    # Trier par volume acheté
-    consolidation_achats = consolidation_achats.sort_values('Volume livré (kg)', ascending=False)
-    
     # Graphiques des achats
     col1, col2 = st.columns(2)
     
     with col1:
         # Top 10 exportateurs par achats
-        top_10_achats = consolidation_achats.head(10)
+        top_10_achats = consolidation_achats_df.head(10)
         
-        fig = px.bar(
+        fig = cached_figure((resultat.version, "top_10_achats"), lambda: px.bar(
             x=top_10_achats.index,
             y=top_10_achats['Volume livré (kg)'],
             title="Top 10 Exportateurs par Achats",
             labels={'x': 'Exportateur', 'y': 'Volume Acheté (kg)'},
             color_discrete_sequence=[BON_PLEIN_COLORS['primary']]
-        )
-        fig.update_xaxes(tickangle=45)
-        fig = apply_bon_plein_theme(fig)
+        ).update_xaxes(tickangle=45))
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
-        # Diversification des fournisseurs
-        fig = px.scatter(
-            consolidation_achats,
+        # Diversification des fournisseurs (nuage décimé au-delà de MAX_POINTS exportateurs)
+        points = decimate(consolidation_achats_df, colonne='Volume livré (kg)')
+        fig = cached_figure((resultat.version, "volume_fournisseurs"), lambda: px.scatter(
+            points,
             x='Nb Fournisseurs',
             y='Volume livré (kg)',
             size='% du Total',
-            hover_name=consolidation_achats.index,
+            hover_name=points.index,
             title="Volume vs Nombre de Fournisseurs",
             labels={'x': 'Nombre de Fournisseurs', 'y': 'Volume Acheté (kg)'},
             color_discrete_sequence=[BON_PLEIN_COLORS['secondary']]
-        )
-        fig = apply_bon_plein_theme(fig)
+        ))
         st.plotly_chart(fig, use_container_width=True)
     
     # Statistiques sur la concentration
@@ -395,60 +333,43 @@ def analyse_achats_exports(df):
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        top_5_pct = consolidation_achats.head(5)['% du Total'].sum()
-        st.metric("Top 5 Exportateurs", f"{top_5_pct:.1f}%", "du marché")
+        st.metric("Top 5 Exportateurs", f"{resultat.top_5_pct:.1f}%", "du marché")
     
     with col2:
-        volume_moyen = consolidation_achats['Volume livré (kg)'].mean()
-        st.metric("Volume moyen", f"{format_number(volume_moyen/1000)} tonnes", "par exportateur")
+        st.metric("Volume moyen", f"{format_number(resultat.volume_moyen/1000)} tonnes", "par exportateur")
     
     with col3:
-        fournisseurs_moyen = consolidation_achats['Nb Fournisseurs'].mean()
-        st.metric("Fournisseurs moyen", f"{format_number(fournisseurs_moyen)}", "par exportateur")
+        st.metric("Fournisseurs moyen", f"{format_number(resultat.fournisseurs_moyen)}", "par exportateur")
     
     # Tableau de consolidation ACHATS
     st.subheader("Tableau des Achats par Exportateur")
     
-    # Formatage pour affichage
-    consolidation_display = consolidation_achats.copy()
-    consolidation_display['Volume livré (kg)'] = consolidation_display['Volume livré (kg)'].apply(lambda x: format_number(x))
-    consolidation_display['% du Total'] = consolidation_display['% du Total'].apply(lambda x: f"{x}%")
-    
-    st.dataframe(consolidation_display, use_container_width=True)
+    st.dataframe(resultat.tableau, use_container_width=True)
 
 def analyse_fournisseurs(df):
     """1. Plus grands fournisseurs par EXPORTATEUR + 2. Plus grands fournisseurs du pays"""
     
-    # Analyse des principaux fournisseurs
+    # Calculs mémorisés par version du jeu de données (module analytics)
+    classement = classement_fournisseurs(df)
     
     # PARTIE 1: Fournisseurs par EXPORTATEUR
     st.subheader("1. Plus Grands Fournisseurs par Exportateur")
     
     # Sélecteur d'exportateur
-    unique_exportateurs = df['EXPORTATEUR SIMPLE'].dropna().unique()
-    exportateurs = sorted([str(x) for x in unique_exportateurs if str(x) != 'nan' and str(x) != 'Non renseigné'])
-    selected_exportateur = st.selectbox("Sélectionner un exportateur:", exportateurs)
+    selected_exportateur = st.selectbox("Sélectionner un exportateur:", classement.exportateurs)
     
     if selected_exportateur:
-        # Filtrer pour l'exportateur sélectionné
-        df_exp = df[df['EXPORTATEUR SIMPLE'] == selected_exportateur]
+        # Fournisseurs et ports de l'exportateur sélectionné (mémorisés par exportateur)
+        detail = fournisseurs_exportateur(df, selected_exportateur)
+        fournisseurs_exp = detail.fournisseurs
         
         col1, col2 = st.columns(2)
         
         with col1:
             st.write(f"### Fournisseurs de **{selected_exportateur}**")
             
-            # Top fournisseurs pour cet exportateur
-            fournisseurs_exp = df_exp.groupby('Nom fournisseur').agg({
-                'Volume livré (kg)': 'sum',
-                'Region activité': lambda x: x.mode().iloc[0] if len(x.mode()) > 0 else 'Non spécifié'
-            }).sort_values('Volume livré (kg)', ascending=False)
-            
-            # Volume total de l'exportateur
-            total_exp = int(fournisseurs_exp['Volume livré (kg)'].sum())
-            fournisseurs_exp['% du total'] = (fournisseurs_exp['Volume livré (kg)'] / total_exp * 100).round(1)
-            
             # Affichage des métriques avec séparateurs de milliers
+            total_exp = detail.total
             total_exp_str = f"{total_exp:,}".replace(",", " ")
             total_tonnes_str = f"{int(total_exp/1000):,}".replace(",", " ")
             st.metric("Total acheté", f"{total_exp_str} kg", f"{total_tonnes_str} tonnes")
@@ -462,24 +383,18 @@ def analyse_fournisseurs(df):
         with col2:
             st.write(f"### Répartition par Port - **{selected_exportateur}**")
             
-            # Volumes exportés par port pour cet exportateur
-            ports_exp = df_exp.groupby('EXPORTATEUR SIMPLE').agg({
-                'ABIDJAN': 'sum',
-                'INTERIEUR': 'sum', 
-                'SAN PEDRO': 'sum'
-            }).iloc[0]
-            
-            total_exp_export = ports_exp.sum()
+            # Volumes par port pour cet exportateur
+            ports_exp = detail.ports
+            total_exp_export = detail.total_ports
             
             if total_exp_export > 0:
                 # Graphique en secteurs
-                fig = px.pie(
+                fig = cached_figure((classement.version, "ports_exportateur", selected_exportateur), lambda: px.pie(
                     values=[ports_exp['ABIDJAN'], ports_exp['INTERIEUR'], ports_exp['SAN PEDRO']],
                     names=['ABIDJAN', 'INTÉRIEUR', 'SAN PEDRO'],
                     title=f"Exports de {selected_exportateur} par Port",
                     color_discrete_sequence=BON_PLEIN_COLORS['palette']
-                )
-                fig = apply_bon_plein_theme(fig)
+                ))
                 st.plotly_chart(fig, use_container_width=True)
                 
                 # Métriques par port
@@ -489,22 +404,16 @@ def analyse_fournisseurs(df):
                 st.write(f"- SAN PEDRO: {format_number(ports_exp['SAN PEDRO'])} kg ({ports_exp['SAN PEDRO']/total_exp_export*100:.1f}%)")
             else:
                 st.warning("Aucun volume d'export trouvé pour cet exportateur")
+        
+        # Lignes d'achat de l'exportateur via l'index par exportateur (pas de balayage de toute la table)
+        with st.expander(f"Lignes d'achat de {selected_exportateur}"):
+            lignes_exp = get_achats_index(df).lignes_exportateur(df, selected_exportateur)
+            st.dataframe(lignes_exp, use_container_width=True, hide_index=True)
     
     # PARTIE 2: Plus grands fournisseurs du pays
     st.subheader("2. Plus Grands Fournisseurs du Pays")
     
-    # Analyse globale des fournisseurs
-    fournisseurs_pays = df.groupby('Nom fournisseur').agg({
-        'Volume livré (kg)': 'sum',
-        'EXPORTATEUR SIMPLE': 'nunique',  # Nombre d'exportateurs différents
-        'Region activité': lambda x: x.mode().iloc[0] if len(x.mode()) > 0 else 'Non spécifié'
-    }).sort_values('Volume livré (kg)', ascending=False)
-    
-    fournisseurs_pays.rename(columns={'EXPORTATEUR SIMPLE': 'Nb Exportateurs'}, inplace=True)
-    
-    # Volume total pays
-    total_pays = fournisseurs_pays['Volume livré (kg)'].sum()
-    fournisseurs_pays['% du total pays'] = (fournisseurs_pays['Volume livré (kg)'] / total_pays * 100).round(1)
+    fournisseurs_pays = classement.fournisseurs
     
     col1, col2 = st.columns(2)
     
@@ -512,15 +421,14 @@ def analyse_fournisseurs(df):
         # Top 15 fournisseurs
         top_15_pays = fournisseurs_pays.head(15)
         
-        fig = px.bar(
+        fig = cached_figure((classement.version, "top_15_pays"), lambda: px.bar(
             x=top_15_pays['Volume livré (kg)'],
             y=top_15_pays.index,
             orientation='h',
             title="Top 15 Fournisseurs du Pays",
             labels={'x': 'Volume (kg)', 'y': 'Fournisseur'},
             color_discrete_sequence=[BON_PLEIN_COLORS['primary']]
-        )
-        fig = apply_bon_plein_theme(fig)
+        ))
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
@@ -528,83 +436,125 @@ def analyse_fournisseurs(df):
         st.write("### Analyse de Diversification")
         
         # Fournisseurs par nombre d'exportateurs
-        diversification = fournisseurs_pays['Nb Exportateurs'].value_counts().sort_index()
+        diversification = classement.diversification
         
-        fig = px.bar(
+        fig = cached_figure((classement.version, "diversification"), lambda: px.bar(
             x=diversification.index,
             y=diversification.values,
             title="Fournisseurs par Nb d'Exportateurs",
             labels={'x': 'Nombre d\'Exportateurs', 'y': 'Nombre de Fournisseurs'},
             color_discrete_sequence=[BON_PLEIN_COLORS['secondary']]
-        )
-        fig = apply_bon_plein_theme(fig)
+        ))
         st.plotly_chart(fig, use_container_width=True)
         
         # Métriques de diversification
-        mono_exportateur = len(fournisseurs_pays[fournisseurs_pays['Nb Exportateurs'] == 1])
-        multi_exportateurs = len(fournisseurs_pays[fournisseurs_pays['Nb Exportateurs'] > 1])
-        
-        st.metric("Fournisseurs exclusifs (1 exportateur)", mono_exportateur)
-        st.metric("Fournisseurs diversifiés (2+ exportateurs)", multi_exportateurs)
+        st.metric("Fournisseurs exclusifs (1 exportateur)", classement.exclusifs)
+        st.metric("Fournisseurs diversifiés (2+ exportateurs)", classement.diversifies)
     
     # Tableau détaillé des top fournisseurs
     st.subheader("Top 20 Fournisseurs du Pays - Détail")
     
-    top_20_display = fournisseurs_pays.head(20).copy()
-    top_20_display['Volume livré (kg)'] = top_20_display['Volume livré (kg)'].apply(lambda x: format_number(x))
-    top_20_display['% du total pays'] = top_20_display['% du total pays'].apply(lambda x: f"{x}%")
+    st.dataframe(classement.tableau_top_20, use_container_width=True)
     
-    st.dataframe(top_20_display, use_container_width=True)
-
-def analyse_differences_poids(df_achats, df_exports):
-    """Comparaison Achats (dB ACHAT) vs Exports (dB EXPORT) par EXPORTATEUR"""
+    # PARTIE 3: Concentration et matrice fournisseurs × exportateurs (matrice creuse)
+    st.subheader("3. Concentration et Matrice Fournisseurs × Exportateurs")
     
-    # Comparaison achats vs exports
-    
-    # Consolidation ACHATS par exportateur (depuis dB ACHAT)
-    achats_data = df_achats.groupby('EXPORTATEUR SIMPLE').agg({
-        'Volume livré (kg)': 'sum'  # Ce qui a été acheté aux fournisseurs
-    }).round(0)
-    
-    # Consolidation EXPORTS par exportateur (depuis dB EXPORT)
-    # Utiliser les colonnes ABIDJAN, INTERIEUR, SAN PEDRO ou Total Exporté
-    export_cols = []
-    if 'Total Exporté' in df_exports.columns:
-        export_cols.append('Total Exporté')
-    if all(col in df_exports.columns for col in ['ABIDJAN', 'INTERIEUR', 'SAN PEDRO']):
-        export_cols.extend(['ABIDJAN', 'INTERIEUR', 'SAN PEDRO'])
-    
-    if export_cols:
-        exports_data = df_exports.groupby('EXPORTATEUR SIMPLE').agg({
-            col: 'sum' for col in export_cols if col in df_exports.columns
-        }).round(0)
-    else:
-        st.error("Colonnes d'export non trouvées dans la feuille dB EXPORT")
-        return
+    col1, col2 = st.columns(2)
     
-    # Fusionner achats et exports
-    ecarts_data = achats_data.join(exports_data, how='outer').fillna(0)
+    with col1:
+        top_n = st.slider("Nombre de premiers fournisseurs (part du top N)", min_value=1, max_value=20, value=5)
     
-    # Calculs des totaux et écarts
-    if 'Total Exporté' not in ecarts_data.columns:
-        if all(col in ecarts_data.columns for col in ['ABIDJAN', 'INTERIEUR', 'SAN PEDRO']):
-            ecarts_data['Total Exporté'] = ecarts_data['ABIDJAN'] + ecarts_data['INTERIEUR'] + ecarts_data['SAN PEDRO']
-        else:
-            st.error("Impossible de calculer le total exporté")
-            return
+    with col2:
+        taille_bloc = st.slider("Taille de la matrice affichée (K plus gros)", min_value=5, max_value=60, value=30, step=5)
     
-    ecarts_data['Écart (Acheté - Exporté)'] = ecarts_data['Volume livré (kg)'] - ecarts_data['Total Exporté']
+    concentration = concentration_fournisseurs(df, top_n)
     
-    # Éviter division par zéro
-    ecarts_data['% Écart'] = ecarts_data.apply(
-        lambda row: (row['Écart (Acheté - Exporté)'] / row['Volume livré (kg)'] * 100) if row['Volume livré (kg)'] > 0 else 0, 
-        axis=1
-    ).round(1)
+    col1, col2, col3 = st.columns(3)
     
-    # Filtrer les exportateurs avec activité significative
-    ecarts_data = ecarts_data[
-        (ecarts_data['Volume livré (kg)'] > 1000) | (ecarts_data['Total Exporté'] > 1000)
-    ].sort_values('Écart (Acheté - Exporté)', key=abs, ascending=False)
+    with col1:
+        st.metric("Relations fournisseur-exportateur", format_number(concentration.nb_relations),
+                  f"{concentration.densite:.1f}% de la matrice pleine")
+    
+    with col2:
+        st.metric("HHI moyen (pondéré par volume)", format_number(concentration.hhi_moyen), "0 à 10 000")
+    
+    with col3:
+        st.metric("Mémoire de la matrice", f"{format_number(concentration.memoire / 1024)} Ko")
+    
+    st.dataframe(concentration.tableau, use_container_width=True)
+    
+    # Bloc dense des plus gros fournisseurs et exportateurs, extrait à la demande
+    matrice = get_supplier_matrix(df)
+    fig = cached_figure((matrice.version, "matrice", taille_bloc), lambda: px.imshow(
+        matrice.bloc(taille_bloc, taille_bloc),
+        aspect='auto',
+        title=f"Volumes (kg) - {taille_bloc} plus gros fournisseurs × {taille_bloc} plus gros exportateurs",
+        labels={'x': 'Exportateur', 'y': 'Fournisseur', 'color': 'Volume (kg)'},
+        color_continuous_scale=[[0, 'white'], [0.2, BON_PLEIN_COLORS['accent']], [1, BON_PLEIN_COLORS['primary']]]
+    ).update_xaxes(tickangle=45))
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # PARTIE 4: Concurrence entre exportateurs (fournisseurs partagés)
+    st.subheader("4. Concurrence entre Exportateurs - Fournisseurs Partagés")
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        ponderation = st.radio("Chevauchement", ["Volume", "Jaccard"], horizontal=True,
+                               help="Volume : part du volume de la paire achetée à des fournisseurs communs. "
+                                    "Jaccard : fournisseurs communs / fournisseurs de l'un ou l'autre.")
+    
+    with col2:
+        nb_concurrents = st.slider("Exportateurs affichés (K plus gros)", min_value=5, max_value=50, value=25, step=5)
+    
+    # Seuils proposés jusqu'au plus grand Jaccard observé : au-delà, aucun groupe ne se forme
+    graphe = get_competition_graph(df)
+    seuil_max = float(min(0.5, max(0.1, np.floor(graphe.jaccard_max() * 20) / 20)))
+    
+    with col3:
+        seuil = st.slider("Seuil de Jaccard des groupes", min_value=0.05, max_value=seuil_max,
+                          value=min(SEUIL_JACCARD, seuil_max), step=0.05)
+    
+    concurrence = concurrence_exportateurs(df, seuil)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.metric("Paires d'exportateurs en concurrence", format_number(concurrence.nb_paires),
+                  "au moins un fournisseur commun")
+    
+    with col2:
+        st.metric("Groupes de concurrence", concurrence.nb_groupes, f"Jaccard ≥ {seuil:.2f}")
+    
+    fig = cached_figure((graphe.version, "concurrence", nb_concurrents, ponderation), lambda: px.imshow(
+        graphe.bloc(nb_concurrents, ponderation.lower()) * 100,
+        aspect='auto',
+        title=f"Chevauchement des fournisseurs ({ponderation}, %) - {nb_concurrents} plus gros exportateurs",
+        labels={'x': 'Exportateur', 'y': 'Exportateur', 'color': '%'},
+        color_continuous_scale=[[0, 'white'], [0.2, BON_PLEIN_COLORS['accent']], [1, BON_PLEIN_COLORS['primary']]]
+    ).update_xaxes(tickangle=45))
+    st.plotly_chart(fig, use_container_width=True)
+    
+    st.write("### Principales paires concurrentes (volume partagé)")
+    st.dataframe(concurrence.tableau_paires, use_container_width=True, hide_index=True)
+    
+    st.write("### Groupes d'exportateurs et grappes de fournisseurs")
+    st.caption("Chaque fournisseur est rattaché au groupe qui lui achète le plus ; "
+               "les fournisseurs multi-groupes livrent aussi d'autres groupes.")
+    if concurrence.nb_groupes:
+        st.dataframe(concurrence.tableau_groupes, use_container_width=True)
+    else:
+        st.info(f"Aucun groupe d'au moins deux exportateurs avec un Jaccard ≥ {seuil:.2f}")
+
+def analyse_differences_poids(df_achats, df_exports, saison=None):
+    """Comparaison Achats (dB ACHAT) vs Exports (dB EXPORT) par EXPORTATEUR"""
+    
+    # Calculs mémorisés par versions des deux feuilles (module analytics)
+    resultat = ecarts_achats_exports(df_achats, df_exports)
+    if resultat.erreur:
+        st.error(resultat.erreur)
+        return
+    ecarts_data = resultat.ecarts
     
     # Vue d'ensemble des écarts
     st.subheader("Vue d'Ensemble des Écarts")
@@ -612,9 +562,9 @@ def analyse_differences_poids(df_achats, df_exports):
     col1, col2, col3 = st.columns(3)
     
     # Statistiques globales
-    total_achete_global = ecarts_data['Volume livré (kg)'].sum()
-    total_exporte_global = ecarts_data['Total Exporté'].sum()
-    ecart_global_total = total_achete_global - total_exporte_global
+    total_achete_global = resultat.total_achete
+    total_exporte_global = resultat.total_exporte
+    ecart_global_total = resultat.ecart_global
     
     with col1:
         st.metric("Total Acheté", f"{format_number(total_achete_global/1000)} tonnes", f"{format_number(total_achete_global)} kg")
@@ -623,7 +573,7 @@ def analyse_differences_poids(df_achats, df_exports):
         st.metric("Total Exporté", f"{format_number(total_exporte_global/1000)} tonnes", f"{format_number(total_exporte_global)} kg")
     
     with col3:
-        pourcentage_global = (ecart_global_total / total_achete_global * 100) if total_achete_global > 0 else 0
+        pourcentage_global = resultat.pourcentage_global
         st.metric("Écart Global", f"{format_number(ecart_global_total/1000)} tonnes", f"{pourcentage_global:.1f}%")
         
         if pourcentage_global > 5:
@@ -642,41 +592,38 @@ def analyse_differences_poids(df_achats, df_exports):
         # Graphique des écarts par exportateur
         top_15_ecarts = ecarts_data.head(15)
         
-        fig = px.bar(
+        fig = cached_figure((resultat.version, "ecarts_top_15"), lambda: px.bar(
             x=top_15_ecarts.index,
             y=top_15_ecarts['% Écart'],
             title="Top 15 Exportateurs par % Écart",
             labels={'x': 'Exportateur', 'y': 'Écart (%)'},
             color=top_15_ecarts['% Écart'],
             color_continuous_scale=[[0, BON_PLEIN_COLORS['accent']], [0.5, 'white'], [1, BON_PLEIN_COLORS['primary']]]
-        )
-        fig.update_xaxes(tickangle=45)
-        fig = apply_bon_plein_theme(fig)
+        ).update_xaxes(tickangle=45))
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
-        # Distribution des écarts
-        fig = px.histogram(
-            ecarts_data,
-            x='% Écart',
+        # Distribution des écarts (classes calculées côté serveur)
+        fig = cached_figure((resultat.version, "distribution_ecarts"), lambda: histogram_figure(
+            ecarts_data['% Écart'],
             nbins=20,
             title="Distribution des Écarts par Exportateur",
-            labels={'% Écart': 'Écart (%)', 'count': 'Nombre d\'Exportateurs'},
-            color_discrete_sequence=[BON_PLEIN_COLORS['primary']]
-        )
-        fig = apply_bon_plein_theme(fig)
+            x_title='Écart (%)',
+            y_title='Nombre d\'Exportateurs',
+            color=BON_PLEIN_COLORS['primary']
+        ))
         st.plotly_chart(fig, use_container_width=True)
     
     # Analyse détaillée par port (si les colonnes existent)
-    if all(col in ecarts_data.columns for col in ['ABIDJAN', 'INTERIEUR', 'SAN PEDRO']):
+    if resultat.totaux_ports is not None:
         st.subheader("Écarts par Port")
         
         st.write("**Analyse des volumes exportés par port vs achats globaux:**")
         
         # Totaux par port
-        total_abj = ecarts_data['ABIDJAN'].sum()
-        total_int = ecarts_data['INTERIEUR'].sum()
-        total_sp = ecarts_data['SAN PEDRO'].sum()
+        total_abj = resultat.totaux_ports['ABIDJAN']
+        total_int = resultat.totaux_ports['INTERIEUR']
+        total_sp = resultat.totaux_ports['SAN PEDRO']
         
         col1, col2, col3 = st.columns(3)
         
@@ -694,35 +641,26 @@ def analyse_differences_poids(df_achats, df_exports):
         
         with col1:
             # Graphique en secteurs des exports
-            fig = px.pie(
+            fig = cached_figure((resultat.version, "ports_exports"), lambda: px.pie(
                 values=[total_abj, total_int, total_sp],
                 names=['ABIDJAN', 'INTÉRIEUR', 'SAN PEDRO'],
                 title="Répartition des Exports par Port",
                 color_discrete_sequence=BON_PLEIN_COLORS['palette']
-            )
-            fig = apply_bon_plein_theme(fig)
+            ))
             st.plotly_chart(fig, use_container_width=True)
         
         with col2:
             # Top exportateurs par port préféré
-            port_preferences = []
-            for idx, row in ecarts_data.iterrows():
-                if pd.notna(row['ABIDJAN']) and pd.notna(row['INTERIEUR']) and pd.notna(row['SAN PEDRO']):
-                    max_port = row[['ABIDJAN', 'INTERIEUR', 'SAN PEDRO']].idxmax()
-                    port_preferences.append({'Exportateur': idx, 'Port Principal': max_port, 'Volume': row[max_port]})
+            port_counts = resultat.ports_principaux
             
-            if port_preferences:
-                port_pref_df = pd.DataFrame(port_preferences)
-                port_counts = port_pref_df['Port Principal'].value_counts()
-                
-                fig = px.bar(
+            if port_counts is not None:
+                fig = cached_figure((resultat.version, "ports_principaux"), lambda: px.bar(
                     x=port_counts.index,
                     y=port_counts.values,
                     title="Nombre d'Exportateurs par Port Principal",
                     labels={'x': 'Port Principal', 'y': 'Nombre d\'Exportateurs'},
                     color_discrete_sequence=[BON_PLEIN_COLORS['secondary']]
-                )
-                fig = apply_bon_plein_theme(fig)
+                ))
                 st.plotly_chart(fig, use_container_width=True)
     
     # Analyses détaillées des plus gros écarts
@@ -733,36 +671,32 @@ def analyse_differences_poids(df_achats, df_exports):
     
     with col1:
         st.write("### Top 10 Excédents (Stock)")
-        excedents = ecarts_data[ecarts_data['Écart (Acheté - Exporté)'] > 0].nlargest(10, 'Écart (Acheté - Exporté)')
+        excedents = resultat.excedents
         
         if len(excedents) > 0:
-            fig = px.bar(
+            fig = cached_figure((resultat.version, "excedents"), lambda: px.bar(
                 x=excedents.index,
                 y=excedents['Écart (Acheté - Exporté)'],
                 title="Exportateurs avec le Plus de Stock",
                 labels={'x': 'Exportateur', 'y': 'Excédent (kg)'},
                 color_discrete_sequence=[BON_PLEIN_COLORS['primary']]
-            )
-            fig.update_xaxes(tickangle=45)
-            fig = apply_bon_plein_theme(fig)
+            ).update_xaxes(tickangle=45))
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.write("Aucun excédent détecté")
     
     with col2:
         st.write("### Top 10 Déficits") 
-        deficits = ecarts_data[ecarts_data['Écart (Acheté - Exporté)'] < 0].nsmallest(10, 'Écart (Acheté - Exporté)')
+        deficits = resultat.deficits
         
         if len(deficits) > 0:
-            fig = px.bar(
+            fig = cached_figure((resultat.version, "deficits"), lambda: px.bar(
                 x=deficits.index,
                 y=abs(deficits['Écart (Acheté - Exporté)']),  # Valeur absolue pour affichage
                 title="Exportateurs en Déficit",
                 labels={'x': 'Exportateur', 'y': 'Déficit (kg)'},
                 color_discrete_sequence=['#ff4444']
-            )
-            fig.update_xaxes(tickangle=45)
-            fig = apply_bon_plein_theme(fig)
+            ).update_xaxes(tickangle=45))
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.write("Aucun déficit détecté")
@@ -770,31 +704,43 @@ def analyse_differences_poids(df_achats, df_exports):
     # Tableau récapitulatif complet
     st.subheader("Tableau Complet des Écarts par Exportateur")
     
-    # Formatage pour affichage
-    ecart_display = ecarts_data.copy()
-    cols_to_format = ['Volume livré (kg)', 'Total Exporté', 'Écart (Acheté - Exporté)']
-    if 'ABIDJAN' in ecart_display.columns:
-        cols_to_format.extend(['ABIDJAN', 'INTERIEUR', 'SAN PEDRO'])
-    for col in cols_to_format:
-        if col in ecart_display.columns:
-            ecart_display[col] = ecart_display[col].apply(lambda x: format_number(x))
-    ecart_display['% Écart'] = ecart_display['% Écart'].apply(lambda x: f"{x}%")
-    
-    # Ajouter une colonne de couleur pour le statut
-    def get_status(row):
-        pct = float(row['% Écart'].replace('%', ''))
-        if pct > 5:
-            return "Excédent Important"
-        elif pct > 0:
-            return "Excédent Normal"
-        elif pct > -5:
-            return "Déficit Modéré"
-        else:
-            return "Déficit Important"
+    st.dataframe(resultat.tableau, use_container_width=True)
+    
+    # Détection d'anomalies (z-scores robustes, une passe sur tous les couples saison × exportateur)
+    st.subheader("Détection d'Anomalies")
     
-    ecart_display['Statut'] = ecart_display.apply(get_status, axis=1)
+    autres_saisons = [season.label for season in get_catalog().seasons() if season.label != saison] if saison else []
+    comparer = bool(autres_saisons) and st.checkbox(
+        "Comparer avec les autres saisons (dérive d'une saison à l'autre)", value=False,
+        help="Agrège les autres saisons du catalogue (sans les charger) pour mesurer la dérive de chaque exportateur")
+    if comparer:
+        # Agrégats compacts par exportateur (noms canoniques), saisons en ordre chronologique
+        anomalies = anomalies_saisons(get_catalog(), [saison] + autres_saisons)
+    else:
+        anomalies = anomalies_ecarts([(saison or "Saison", df_achats, df_exports)])
+    
+    col1, col2, col3 = st.columns(3)
     
-    st.dataframe(ecart_display, use_container_width=True)
+    with col1:
+        st.metric("Couples saison × exportateur notés", format_number(len(anomalies.scores)))
+    
+    with col2:
+        st.metric("Anomalies", anomalies.nb_anomalies, f"|z| robuste ≥ {SEUIL_Z}")
+    
+    with col3:
+        st.metric("Saisons comparées", len(anomalies.saisons))
+    
+    st.caption("Score = plus grand |z| robuste (médiane et écart absolu médian de la saison) parmi le % écart, "
+               "l'écart de mix portuaire (part d'Abidjan exportée moins achetée) et, entre deux saisons, "
+               "leurs dérives.")
+    
+    anomalies_seules = st.checkbox("Anomalies uniquement", value=True)
+    tableau = anomalies.tableau
+    if anomalies_seules and len(tableau) > 0:
+        tableau = tableau[tableau['Anomalie']]
+    st.dataframe(tableau.head(TOP_ANOMALIES), use_container_width=True, hide_index=True)
+    if len(tableau) > TOP_ANOMALIES:
+        st.caption(f"{TOP_ANOMALIES} premiers couples affichés sur {format_number(len(tableau))}")
 
 def analyse_abj_vs_sp(df):
     """Comparaison des tendances entre ABJ et SP"""
@@ -806,12 +752,15 @@ def analyse_abj_vs_sp(df):
         st.error("Les colonnes ABIDJAN, SAN PEDRO et INTERIEUR ne sont pas présentes dans les données d'export")
         return
     
+    # Calculs mémorisés par version de dB EXPORT (module analytics)
+    resultat = preferences_ports(df)
+    
     # Métriques de base
     col1, col2, col3 = st.columns(3)
     
-    total_abj = df['ABIDJAN'].sum()
-    total_sp = df['SAN PEDRO'].sum() 
-    total_interieur = df['INTERIEUR'].sum()
+    total_abj = resultat.total_abidjan
+    total_sp = resultat.total_san_pedro
+    total_interieur = resultat.total_interieur
     
     with col1:
         st.metric("ABIDJAN", f"{format_number(total_abj)} kg", f"{format_number(total_abj/1000)} tonnes")
@@ -834,153 +783,301 @@ def analyse_abj_vs_sp(df):
             'Volume (kg)': [total_abj, total_sp, total_interieur]
         }
         
-        fig = px.bar(
+        fig = cached_figure((resultat.version, "volumes_ports"), lambda: px.bar(
             ports_comparison, 
             x='Port', 
             y='Volume (kg)',
             title="Volume par Port",
             color='Port',
             color_discrete_sequence=BON_PLEIN_COLORS['palette']
-        )
-        fig = apply_bon_plein_theme(fig)
+        ))
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         # Graphique en secteurs
-        fig = px.pie(
+        fig = cached_figure((resultat.version, "repartition_ports"), lambda: px.pie(
             values=[total_abj, total_sp, total_interieur],
             names=['ABIDJAN', 'SAN PEDRO', 'INTÉRIEUR'],
             title="Répartition par Port (%)",
             color_discrete_sequence=BON_PLEIN_COLORS['palette']
-        )
-        fig = apply_bon_plein_theme(fig)
+        ))
         st.plotly_chart(fig, use_container_width=True)
     
     # Analyse par exportateur  
     st.subheader("Préférences par Exportateur")
     
-    # Créer un ratio ABJ/SP pour chaque exportateur
-    export_ports = df.groupby('EXPORTATEUR SIMPLE').agg({
-        'ABIDJAN': 'sum',
-        'SAN PEDRO': 'sum',
-        'INTERIEUR': 'sum'
-    }).copy()
-    
-    # Ajouter le total exporté comme référence
-    export_ports['Total Exporté'] = export_ports['ABIDJAN'] + export_ports['SAN PEDRO'] + export_ports['INTERIEUR']
-    
-    # Calculer les ratios et préférences
-    export_ports['Total Ports'] = export_ports['ABIDJAN'] + export_ports['SAN PEDRO']
-    export_ports['% ABJ'] = (export_ports['ABIDJAN'] / export_ports['Total Ports'] * 100).fillna(0)
-    export_ports['% SP'] = (export_ports['SAN PEDRO'] / export_ports['Total Ports'] * 100).fillna(0)
-    export_ports['% INT'] = (export_ports['INTERIEUR'] / export_ports['Total Exporté'] * 100).fillna(0)
-    
-    # Identifier la préférence principale
-    def get_preference(row):
-        if row['ABIDJAN'] > row['SAN PEDRO'] and row['ABIDJAN'] > row['INTERIEUR']:
-            return 'ABIDJAN'
-        elif row['SAN PEDRO'] > row['ABIDJAN'] and row['SAN PEDRO'] > row['INTERIEUR']:
-            return 'SAN PEDRO'
-        elif row['INTERIEUR'] > row['ABIDJAN'] and row['INTERIEUR'] > row['SAN PEDRO']:
-            return 'INTÉRIEUR'
-        else:
-            return 'MIXTE'
-    
-    export_ports['Préférence'] = export_ports.apply(get_preference, axis=1)
+    export_ports = resultat.exportateurs
     
-    # Graphique scatter ABJ vs SP
-    fig = px.scatter(
-        export_ports, 
+    # Graphique scatter ABJ vs SP avec lignes de référence (décimé au-delà de MAX_POINTS exportateurs)
+    points = decimate(export_ports, colonne='Total Exporté')
+    fig = cached_figure((resultat.version, "abj_vs_sp"), lambda: px.scatter(
+        points, 
         x='% ABJ', 
         y='% SP',
         size='Total Exporté',
         color='Préférence',
-        hover_name=export_ports.index,
+        hover_name=points.index,
         title="Position des Exportateurs: % Abidjan vs % San Pedro",
         labels={'% ABJ': '% Volume via Abidjan', '% SP': '% Volume via San Pedro'},
         color_discrete_sequence=BON_PLEIN_COLORS['palette']
-    )
-    
-    # Ajouter des lignes de référence
-    fig.add_hline(y=50, line_dash="dash", line_color=BON_PLEIN_COLORS['text_secondary'], annotation_text="50% San Pedro")
-    fig.add_vline(x=50, line_dash="dash", line_color=BON_PLEIN_COLORS['text_secondary'], annotation_text="50% Abidjan")
-    
-    fig = apply_bon_plein_theme(fig)
+    ).add_hline(y=50, line_dash="dash", line_color=BON_PLEIN_COLORS['text_secondary'], annotation_text="50% San Pedro"
+    ).add_vline(x=50, line_dash="dash", line_color=BON_PLEIN_COLORS['text_secondary'], annotation_text="50% Abidjan"))
     st.plotly_chart(fig, use_container_width=True)
     
     # Graphique en barres empilées
     st.subheader("Répartition Détaillée par Exportateur")
     
-    # Prendre les top exportateurs pour la lisibilité
-    top_exportateurs = export_ports.nlargest(15, 'Total Exporté')
-    
-    fig = go.Figure()
+    # Prendre les top exportateurs pour la lisibilité (les autres regroupés)
+    top_exportateurs = resultat.top_exportateurs
     
-    fig.add_trace(go.Bar(
-        name='ABIDJAN',
-        x=top_exportateurs.index,
-        y=top_exportateurs['ABIDJAN'],
-        marker_color=BON_PLEIN_COLORS['primary']
-    ))
-    
-    fig.add_trace(go.Bar(
-        name='SAN PEDRO', 
-        x=top_exportateurs.index,
-        y=top_exportateurs['SAN PEDRO'],
-        marker_color=BON_PLEIN_COLORS['secondary']
-    ))
-    
-    fig.add_trace(go.Bar(
-        name='INTÉRIEUR',
-        x=top_exportateurs.index,
-        y=top_exportateurs['INTERIEUR'],
-        marker_color=BON_PLEIN_COLORS['accent']
-    ))
-    
-    fig.update_layout(
+    fig = cached_figure((resultat.version, "repartition_exportateurs"), lambda: go.Figure([
+        go.Bar(
+            name='ABIDJAN',
+            x=top_exportateurs.index,
+            y=top_exportateurs['ABIDJAN'],
+            marker_color=BON_PLEIN_COLORS['primary']
+        ),
+        go.Bar(
+            name='SAN PEDRO', 
+            x=top_exportateurs.index,
+            y=top_exportateurs['SAN PEDRO'],
+            marker_color=BON_PLEIN_COLORS['secondary']
+        ),
+        go.Bar(
+            name='INTÉRIEUR',
+            x=top_exportateurs.index,
+            y=top_exportateurs['INTERIEUR'],
+            marker_color=BON_PLEIN_COLORS['accent']
+        ),
+    ]).update_layout(
         barmode='stack',
-        title='Répartition des Volumes par Port - Top 15 Exportateurs',
+        title='Répartition des Volumes par Port - Top 15 Exportateurs et Autres',
         xaxis_title='Exportateur',
         yaxis_title='Volume (kg)',
         xaxis_tickangle=45
-    )
-    
-    fig = apply_bon_plein_theme(fig)
+    ))
     st.plotly_chart(fig, use_container_width=True)
     
     # Statistiques détaillées
     st.subheader("Statistiques par Port")
     
-    preference_counts = export_ports['Préférence'].value_counts()
-    
     col1, col2 = st.columns(2)
     
     with col1:
         st.write("**Répartition des préférences:**")
-        for pref, count in preference_counts.items():
+        for pref, count in resultat.preferences.items():
             percentage = (count / len(export_ports)) * 100
             st.write(f"- {pref}: {count} exportateurs ({percentage:.1f}%)")
     
     with col2:
         st.write("**Moyennes par port:**")
-        avg_abj = export_ports['% ABJ'].mean() if not export_ports['% ABJ'].empty else 0
-        avg_sp = export_ports['% SP'].mean() if not export_ports['% SP'].empty else 0
-        avg_int = export_ports['% INT'].mean() if not export_ports['% INT'].empty else 0
-        st.write(f"- Moyenne ABIDJAN: {avg_abj:.1f}%")
-        st.write(f"- Moyenne SAN PEDRO: {avg_sp:.1f}%")
-        st.write(f"- Moyenne INTÉRIEUR: {avg_int:.1f}%")
+        st.write(f"- Moyenne ABIDJAN: {resultat.moyennes['% ABJ']:.1f}%")
+        st.write(f"- Moyenne SAN PEDRO: {resultat.moyennes['% SP']:.1f}%")
+        st.write(f"- Moyenne INTÉRIEUR: {resultat.moyennes['% INT']:.1f}%")
     
     # Tableau détaillé
     st.subheader("Détail par Exportateur")
-    ports_display = export_ports[['ABIDJAN', 'SAN PEDRO', 'INTERIEUR', '% ABJ', '% SP', '% INT', 'Préférence']].copy()
     
-    for col in ['ABIDJAN', 'SAN PEDRO', 'INTERIEUR']:
-        ports_display[col] = ports_display[col].apply(lambda x: format_number(x))
+    st.dataframe(resultat.tableau, use_container_width=True)
+
+def comparaison_saisons():
+    """Comparaison des saisons du catalogue : volumes, ports et rotation des fournisseurs"""
+    
+    labels = [season.label for season in get_catalog().seasons()]
+    if len(labels) < 2:
+        st.info("La comparaison nécessite au moins deux saisons dans Master_Data/")
+        return
+    
+    choix = st.multiselect("Saisons comparées", labels, default=labels[:MAX_SAISONS], max_selections=MAX_SAISONS)
+    if len(choix) < 2:
+        st.info("Sélectionner au moins deux saisons")
+        return
+    
+    # Saisons non chargées : lues et agrégées en parallèle (module comparison)
+    with st.spinner("Chargement et agrégation des saisons..."):
+        comparaison = compare_seasons(get_catalog(), choix)
+    precedente, derniere = comparaison.saisons[-2], comparaison.saisons[-1]
+    volumes = comparaison.volumes
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        total, total_precedent = volumes[derniere].sum(), volumes[precedente].sum()
+        st.metric(f"Volume acheté {derniere}", format_tonnage(total),
+                  f"{(total - total_precedent) / total_precedent * 100:+.1f}% vs {precedente}" if total_precedent > 0 else None)
     
-    for col in ['% ABJ', '% SP', '% INT']:
-        ports_display[col] = ports_display[col].apply(lambda x: f"{x:.1f}%")
+    with col2:
+        part_sp = comparaison.marche_ports[COL_PART_SP]
+        if pd.notna(part_sp[derniere]):
+            st.metric("Part SAN PEDRO des exports", f"{part_sp[derniere]:.1f}%",
+                      f"{part_sp[derniere] - part_sp[precedente]:+.1f} points" if pd.notna(part_sp[precedente]) else None)
+    
+    with col3:
+        rotation = comparaison.rotation_globale.loc[derniere]
+        st.metric("Fournisseurs nouveaux / perdus", f"{rotation['Nouveaux']} / {rotation['Perdus']}",
+                  f"{format_number(rotation['Fournisseurs'])} fournisseurs actifs", delta_color="off")
+    
+    # Volumes par exportateur
+    st.subheader("Volume Acheté par Exportateur")
+    
+    top_10 = volumes.head(10)[comparaison.saisons]
+    fig = cached_figure((comparaison.version, "volumes_saisons"), lambda: px.bar(
+        top_10.reset_index().melt(id_vars=top_10.index.name, var_name='Saison', value_name='Volume (kg)'),
+        x=top_10.index.name,
+        y='Volume (kg)',
+        color='Saison',
+        barmode='group',
+        title="Top 10 Exportateurs de la Dernière Saison",
+        color_discrete_sequence=BON_PLEIN_COLORS['palette']
+    ).update_xaxes(tickangle=45))
+    st.plotly_chart(fig, use_container_width=True)
+    
+    st.dataframe(comparaison.tableau_volumes, use_container_width=True)
+    
+    # Glissement ABIDJAN -> SAN PEDRO
+    st.subheader("Part de SAN PEDRO dans les Exports")
+    
+    marche = comparaison.marche_ports
+    fig = cached_figure((comparaison.version, "ports_saisons"), lambda: px.line(
+        x=marche.index,
+        y=marche[COL_PART_SP],
+        markers=True,
+        title="Part de SAN PEDRO (ABIDJAN + SAN PEDRO = 100%)",
+        labels={'x': 'Saison', 'y': '% SAN PEDRO'},
+        color_discrete_sequence=[BON_PLEIN_COLORS['secondary']]
+    ))
+    st.plotly_chart(fig, use_container_width=True)
+    
+    st.dataframe(comparaison.tableau_ports, use_container_width=True)
+    
+    # Rotation des fournisseurs
+    st.subheader("Rotation des Fournisseurs")
+    
+    st.dataframe(comparaison.rotation_globale, use_container_width=True)
+    st.caption("% Rotation : fournisseurs perdus / fournisseurs de la saison précédente ; "
+               "% Volume nouveaux : part du volume achetée à des fournisseurs nouveaux pour l'exportateur.")
+    st.dataframe(comparaison.tableau_rotation, use_container_width=True)
+
+def evolution_temporelle(saison):
+    """Expéditions datées (feuilles IMPORT) : cumul de campagne, séries et volumes sur une plage de dates"""
+    
+    labels = [season.label for season in get_catalog().seasons()]
+    choix = st.multiselect("Campagnes", labels, default=[saison] if saison in labels else labels[:1],
+                           max_selections=MAX_SAISONS)
+    
+    # Agrégats jour × exportateur × port de chaque saison (module timeseries)
+    rollups = [season_rollups(get_catalog(), label) for label in choix]
+    rollups = [rollup for rollup in rollups if rollup is not None and len(rollup.jours)]
+    if not rollups:
+        st.info("Aucune feuille « IMPORT » datée exploitable (DATENR, PORT, PDSNET) dans les saisons sélectionnées")
+        return
+    
+    hors_campagne = sum(rollup.hors_campagne for rollup in rollups)
+    if hors_campagne:
+        st.warning(f"{format_number(hors_campagne)} déclarations datées hors de leur campagne "
+                   "(date probablement mal saisie) sont exclues des courbes et des volumes")
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        noms = sorted(set().union(*(rollup.exportateurs for rollup in rollups)))
+        exportateurs = st.multiselect("Exportateurs (tous si vide)", noms)
+    
+    with col2:
+        ports = st.multiselect("Ports (tous si vide)", sorted(set().union(*(rollup.ports for rollup in rollups))))
+    
+    with col3:
+        frequence = st.radio("Période", list(FREQUENCES), index=1, horizontal=True)
+    
+    version = "|".join(rollup.version for rollup in rollups)
+    selection = (tuple(exportateurs), tuple(ports))
+    
+    # Cumul depuis le 1er octobre, une courbe par campagne
+    st.subheader("Cumul de Campagne")
+    
+    courbes = courbes_campagne(rollups, exportateurs, ports)
+    fig = cached_figure((version, "cumul_campagne", selection), lambda: px.line(
+        courbes / 1000,
+        title="Volume Expédié Cumulé depuis le 1er Octobre (tonnes)",
+        labels={'value': 'Volume cumulé (tonnes)', 'variable': 'Campagne'},
+        color_discrete_sequence=BON_PLEIN_COLORS['palette']
+    ))
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Volumes par période, par port
+    st.subheader("Volumes Expédiés par Période")
+    
+    series = pd.concat([rollup.serie(FREQUENCES[frequence], exportateurs, ports, par_port=True) for rollup in rollups])
+    series = series.groupby(level=0).sum()
+    fig = cached_figure((version, "series", frequence, selection), lambda: px.bar(
+        series / 1000,
+        title=f"Volumes Expédiés par {frequence} (tonnes)",
+        labels={'index': 'Période', 'value': 'Volume (tonnes)', 'variable': 'Port'},
+        color_discrete_sequence=[BON_PLEIN_COLORS['primary'], BON_PLEIN_COLORS['secondary']]
+    ).update_layout(barmode='stack'))
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Requête sur une plage de dates (différences de cumuls)
+    st.subheader("Volumes sur une Plage de Dates")
+    
+    premier = min(rollup.jours[0] for rollup in rollups).date()
+    dernier = max(rollup.jours[-1] for rollup in rollups).date()
+    plage = st.date_input("Plage de dates", value=(premier, dernier), min_value=premier, max_value=dernier)
+    debut, fin = (plage[0], plage[-1]) if isinstance(plage, (tuple, list)) and plage else (premier, dernier)
+    
+    total = sum(rollup.total(debut, fin, exportateurs, ports) for rollup in rollups)
+    nb_jours = (fin - debut).days + 1
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.metric("Volume expédié sur la plage", format_tonnage(total), f"{nb_jours} jours")
+    
+    with col2:
+        st.metric("Moyenne journalière", format_tonnage(total / nb_jours))
+    
+    st.dataframe(tableau_plage(rollups, debut, fin, exportateurs, ports), use_container_width=True)
+
+def explorer_donnees_brutes(df):
+    """Lignes brutes filtrées, triées et paginées côté serveur : seule la page affichée est envoyée"""
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        recherche = st.text_input("Rechercher un fournisseur ou un exportateur")
+    
+    with col2:
+        exportateurs = st.multiselect("Filtrer par exportateur", get_explorer_index(df).valeurs('EXPORTATEUR SIMPLE'))
+    
+    colonnes = st.multiselect("Colonnes affichées", list(df.columns), default=list(df.columns))
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        tri = st.selectbox("Trier par", ["(ordre du fichier)"] + list(df.columns))
+    
+    with col2:
+        ordre = st.radio("Ordre", ["Croissant", "Décroissant"], horizontal=True)
+    
+    with col3:
+        taille_page = st.selectbox("Lignes par page", PAGE_SIZES, index=PAGE_SIZES.index(PAGE_SIZE))
+    
+    # Pagination côté serveur : seule la page demandée est extraite
+    page_count = nb_pages(df, recherche, exportateurs, taille_page)
+    page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+    resultat = page_donnees(
+        df,
+        recherche=recherche,
+        exportateurs=exportateurs,
+        colonnes=colonnes,
+        tri=None if tri == "(ordre du fichier)" else tri,
+        croissant=ordre == "Croissant",
+        page=page,
+        taille_page=taille_page
+    )
     
-    st.dataframe(ports_display, use_container_width=True)
+    st.dataframe(resultat.lignes, use_container_width=True)
+    st.caption(f"{format_number(resultat.total)} lignes - page {resultat.page} / {resultat.nb_pages}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,493 @@
+"""
+Calculs des onglets, indépendants de Streamlit
+
+Chaque analyse renvoie un objet résultat (dataclass) contenant les tableaux,
+indicateurs et tableaux formatés affichés par l'onglet correspondant. Les
+résultats sont mémorisés par version du jeu de données : une interaction
+(changement de widget) qui relance le script ne refait aucun calcul pandas,
+seul l'affichage est reconstruit.
+
+Ces fonctions s'utilisent aussi hors de l'application (rapports, mesures).
+"""
+from dataclasses import dataclass
+
+import pandas as pd
+
+from aggregations import COL_REGION, COL_TOTAL_EXPORTE, COL_VOLUME, PORT_COLS, _VersionCache, get_achats_cube, get_exports_cube
+from anomalies import COL_ANOMALIE, COL_MOTIF, COL_SAISON, COL_SCORE, score_anomalies, table_saisons
+from calculs import (format_number_column, format_percent_column, port_principal,
+                     pourcentage_ecart, preference_port, statut_ecart)
+from comparison import load_aggregates
+from competition import (COL_CHEVAUCHEMENT, COL_JACCARD, SEUIL_JACCARD, get_competition_graph,
+                         resume_groupes)
+from data_cache import dataset_version
+from figures import top_n_autres
+from matrix import TOP_N, get_supplier_matrix
+
+COL_ECART = 'Écart (Acheté - Exporté)'
+COL_PCT_ECART = '% Écart'
+
+# Seuil d'activité (kg achetés ou exportés) pour figurer dans les écarts
+SEUIL_ACTIVITE = 1000
+
+# Paires d'exportateurs concurrents affichées
+TOP_PAIRES = 20
+
+
+@dataclass(frozen=True)
+class ConsolidationAchats:
+    """Vue Achats : achats consolidés par exportateur et concentration du marché"""
+    version: str
+    total_volume: float
+    nb_fournisseurs: int
+    nb_exportateurs: int
+    exportateurs: pd.DataFrame        # volume, nb fournisseurs, % du total (tri décroissant)
+    top_5_pct: float
+    volume_moyen: float
+    fournisseurs_moyen: float
+    tableau: pd.DataFrame             # exportateurs formatés pour l'affichage
+
+
+@dataclass(frozen=True)
+class FournisseursExportateur:
+    """Fournisseurs d'un exportateur et répartition de ses achats par port"""
+    exportateur: str
+    fournisseurs: pd.DataFrame        # volume, région, % du total (tri décroissant)
+    total: int
+    ports: pd.Series                  # ABIDJAN, INTERIEUR, SAN PEDRO
+    total_ports: float
+
+
+@dataclass(frozen=True)
+class ClassementFournisseurs:
+    """Onglet Fournisseurs : exportateurs sélectionnables et plus grands fournisseurs du pays"""
+    version: str
+    exportateurs: list
+    fournisseurs: pd.DataFrame        # volume, nb exportateurs, région, % du total pays
+    diversification: pd.Series        # nb exportateurs -> nb fournisseurs
+    exclusifs: int
+    diversifies: int
+    tableau_top_20: pd.DataFrame
+
+
+@dataclass(frozen=True)
+class EcartsAchatsExports:
+    """Onglet Écarts : achats (dB ACHAT) contre exports (dB EXPORT) par exportateur
+
+    erreur est renseignée (et les autres champs vides) si dB EXPORT n'a pas les colonnes attendues.
+    """
+    version: str
+    erreur: str = None
+    ecarts: pd.DataFrame = None       # exportateurs actifs, tri par écart absolu décroissant
+    total_achete: float = 0
+    total_exporte: float = 0
+    ecart_global: float = 0
+    pourcentage_global: float = 0
+    totaux_ports: pd.Series = None    # ABIDJAN, INTERIEUR, SAN PEDRO ; None sans colonnes de port
+    ports_principaux: pd.Series = None
+    excedents: pd.DataFrame = None
+    deficits: pd.DataFrame = None
+    tableau: pd.DataFrame = None
+
+
+@dataclass(frozen=True)
+class PreferencesPorts:
+    """Onglet ABJ vs SP : volumes par port et préférence portuaire de chaque exportateur"""
+    version: str
+    total_abidjan: float
+    total_san_pedro: float
+    total_interieur: float
+    exportateurs: pd.DataFrame        # volumes, % ABJ / SP / INT, préférence
+    top_exportateurs: pd.DataFrame    # 15 plus gros exportateurs puis « Autres »
+    preferences: pd.Series
+    moyennes: dict
+    tableau: pd.DataFrame
+
+
+@dataclass(frozen=True)
+class ConcentrationFournisseurs:
+    """Concentration des achats de chaque exportateur sur ses fournisseurs (matrice creuse)"""
+    version: str
+    top_n: int
+    exportateurs: pd.DataFrame        # volume, nb fournisseurs, HHI, % top N, exclusifs (tri par volume)
+    hhi_moyen: float                  # HHI des exportateurs pondéré par leur volume
+    nb_relations: int
+    densite: float                    # relations / (fournisseurs × exportateurs), en %
+    memoire: int                      # octets de la matrice creuse
+    tableau: pd.DataFrame
+
+
+@dataclass(frozen=True)
+class ConcurrenceExportateurs:
+    """Exportateurs en concurrence pour les mêmes fournisseurs (graphe de chevauchement)"""
+    version: str
+    seuil: float
+    paires: pd.DataFrame              # paires ayant des fournisseurs communs (tri par volume partagé)
+    nb_paires: int
+    groupes: pd.DataFrame             # groupes d'exportateurs reliés par Jaccard ≥ seuil (tri par volume)
+    nb_groupes: int                   # groupes d'au moins deux exportateurs
+    tableau_paires: pd.DataFrame      # TOP_PAIRES premières paires formatées
+    tableau_groupes: pd.DataFrame
+
+
+@dataclass(frozen=True)
+class AnomaliesEcarts:
+    """Couples saison × exportateur notés par z-scores robustes (anomalies.score_anomalies)"""
+    version: str
+    saisons: list
+    scores: pd.DataFrame              # critères, z, score, motif, anomalie (tri par score décroissant)
+    nb_anomalies: int
+    tableau: pd.DataFrame             # scores formatés, même ordre
+
+
+_consolidations = _VersionCache()
+_classements = _VersionCache()
+_fournisseurs_exportateur = _VersionCache(size=64)
+_ecarts = _VersionCache()
+_preferences = _VersionCache()
+_concentrations = _VersionCache()
+_concurrences = _VersionCache()
+_anomalies = _VersionCache()
+
+
+def consolidation_achats(df):
+    """Achats par exportateur, mémorisés par version du jeu de données"""
+    version = dataset_version(df)
+    return _consolidations.get_or_build(version, lambda: _consolidation_achats(df, version))
+
+
+def _consolidation_achats(df, version):
+    cube = get_achats_cube(df)
+    total = cube.total_volume
+
+    consolidation = cube.exportateurs[[COL_VOLUME, 'Nb Fournisseurs']].round(0)
+    consolidation['% du Total'] = (consolidation[COL_VOLUME] / total * 100).round(1)
+    consolidation = consolidation.sort_values(COL_VOLUME, ascending=False)
+
+    tableau = consolidation.copy()
+    tableau[COL_VOLUME] = format_number_column(tableau[COL_VOLUME])
+    tableau['% du Total'] = format_percent_column(tableau['% du Total'])
+
+    return ConsolidationAchats(
+        version=version,
+        total_volume=total,
+        nb_fournisseurs=len(cube.fournisseurs),
+        nb_exportateurs=len(cube.exportateurs),
+        exportateurs=consolidation,
+        top_5_pct=consolidation.head(5)['% du Total'].sum(),
+        volume_moyen=consolidation[COL_VOLUME].mean(),
+        fournisseurs_moyen=consolidation['Nb Fournisseurs'].mean(),
+        tableau=tableau,
+    )
+
+
+def classement_fournisseurs(df):
+    """Plus grands fournisseurs du pays et liste des exportateurs, mémorisés par version"""
+    version = dataset_version(df)
+    return _classements.get_or_build(version, lambda: _classement_fournisseurs(df, version))
+
+
+def _classement_fournisseurs(df, version):
+    cube = get_achats_cube(df)
+    exportateurs = sorted([str(x) for x in cube.exportateurs.index if str(x) != 'nan' and str(x) != 'Non renseigné'])
+
+    fournisseurs = cube.fournisseurs[[COL_VOLUME, 'Nb Exportateurs', COL_REGION]].sort_values(COL_VOLUME, ascending=False)
+    total_pays = fournisseurs[COL_VOLUME].sum()
+    fournisseurs['% du total pays'] = (fournisseurs[COL_VOLUME] / total_pays * 100).round(1)
+
+    tableau = fournisseurs.head(20).copy()
+    tableau[COL_VOLUME] = format_number_column(tableau[COL_VOLUME])
+    tableau['% du total pays'] = format_percent_column(tableau['% du total pays'])
+
+    return ClassementFournisseurs(
+        version=version,
+        exportateurs=exportateurs,
+        fournisseurs=fournisseurs,
+        diversification=fournisseurs['Nb Exportateurs'].value_counts().sort_index(),
+        exclusifs=int((fournisseurs['Nb Exportateurs'] == 1).sum()),
+        diversifies=int((fournisseurs['Nb Exportateurs'] > 1).sum()),
+        tableau_top_20=tableau,
+    )
+
+
+def fournisseurs_exportateur(df, exportateur):
+    """Fournisseurs d'un exportateur, mémorisés par (version, exportateur)"""
+    key = (dataset_version(df), exportateur)
+    return _fournisseurs_exportateur.get_or_build(key, lambda: _fournisseurs_exportateur_calc(df, exportateur))
+
+
+def _fournisseurs_exportateur_calc(df, exportateur):
+    cube = get_achats_cube(df)
+    fournisseurs = cube.fournisseurs_exportateur(exportateur)
+    fournisseurs = fournisseurs[[COL_VOLUME, COL_REGION]].sort_values(COL_VOLUME, ascending=False)
+    total = int(fournisseurs[COL_VOLUME].sum())
+    fournisseurs['% du total'] = (fournisseurs[COL_VOLUME] / total * 100).round(1)
+
+    ports = cube.exportateurs.loc[exportateur, PORT_COLS]
+    return FournisseursExportateur(exportateur, fournisseurs, total, ports, ports.sum())
+
+
+def ecarts_achats_exports(df_achats, df_exports):
+    """Écarts achats / exports par exportateur, mémorisés par versions des deux feuilles"""
+    version = f"{dataset_version(df_achats)}|{dataset_version(df_exports)}"
+    return _ecarts.get_or_build(version, lambda: _ecarts_achats_exports(df_achats, df_exports, version))
+
+
+def _ecarts_achats_exports(df_achats, df_exports, version):
+    # Consolidation ACHATS par exportateur (depuis dB ACHAT)
+    achats = get_achats_cube(df_achats).exportateurs[[COL_VOLUME]].round(0)
+
+    # Consolidation EXPORTS par exportateur : Total Exporté et/ou ABIDJAN, INTERIEUR, SAN PEDRO
+    export_cols = []
+    if COL_TOTAL_EXPORTE in df_exports.columns:
+        export_cols.append(COL_TOTAL_EXPORTE)
+    if all(col in df_exports.columns for col in PORT_COLS):
+        export_cols.extend(PORT_COLS)
+    if not export_cols:
+        return EcartsAchatsExports(version, erreur="Colonnes d'export non trouvées dans la feuille dB EXPORT")
+    exports = get_exports_cube(df_exports).exportateurs[export_cols].round(0)
+
+    ecarts = achats.join(exports, how='outer').fillna(0)
+    if COL_TOTAL_EXPORTE not in ecarts.columns:
+        if all(col in ecarts.columns for col in PORT_COLS):
+            ecarts[COL_TOTAL_EXPORTE] = ecarts['ABIDJAN'] + ecarts['INTERIEUR'] + ecarts['SAN PEDRO']
+        else:
+            return EcartsAchatsExports(version, erreur="Impossible de calculer le total exporté")
+
+    ecarts[COL_ECART] = ecarts[COL_VOLUME] - ecarts[COL_TOTAL_EXPORTE]
+    ecarts[COL_PCT_ECART] = pourcentage_ecart(ecarts[COL_ECART], ecarts[COL_VOLUME]).round(1)
+
+    # Exportateurs avec une activité significative, plus gros écarts d'abord
+    ecarts = ecarts[
+        (ecarts[COL_VOLUME] > SEUIL_ACTIVITE) | (ecarts[COL_TOTAL_EXPORTE] > SEUIL_ACTIVITE)
+    ].sort_values(COL_ECART, key=abs, ascending=False)
+
+    total_achete = ecarts[COL_VOLUME].sum()
+    total_exporte = ecarts[COL_TOTAL_EXPORTE].sum()
+    ecart_global = total_achete - total_exporte
+    pourcentage_global = (ecart_global / total_achete * 100) if total_achete > 0 else 0
+
+    totaux_ports = None
+    ports_principaux = None
+    if all(col in ecarts.columns for col in PORT_COLS):
+        totaux_ports = ecarts[PORT_COLS].sum()
+        ports_renseignes = ecarts[PORT_COLS].dropna()
+        if len(ports_renseignes) > 0:
+            ports_principaux = port_principal(ports_renseignes)['Port Principal'].value_counts()
+
+    tableau = ecarts.copy()
+    cols_to_format = [COL_VOLUME, COL_TOTAL_EXPORTE, COL_ECART]
+    if 'ABIDJAN' in tableau.columns:
+        cols_to_format.extend(PORT_COLS)
+    for col in cols_to_format:
+        if col in tableau.columns:
+            tableau[col] = format_number_column(tableau[col])
+    tableau[COL_PCT_ECART] = format_percent_column(tableau[COL_PCT_ECART])
+    tableau['Statut'] = statut_ecart(ecarts[COL_PCT_ECART])
+
+    return EcartsAchatsExports(
+        version=version,
+        ecarts=ecarts,
+        total_achete=total_achete,
+        total_exporte=total_exporte,
+        ecart_global=ecart_global,
+        pourcentage_global=pourcentage_global,
+        totaux_ports=totaux_ports,
+        ports_principaux=ports_principaux,
+        excedents=ecarts[ecarts[COL_ECART] > 0].nlargest(10, COL_ECART),
+        deficits=ecarts[ecarts[COL_ECART] < 0].nsmallest(10, COL_ECART),
+        tableau=tableau,
+    )
+
+
+def preferences_ports(df_exports):
+    """Volumes par port et préférences des exportateurs, mémorisés par version de dB EXPORT"""
+    version = dataset_version(df_exports)
+    return _preferences.get_or_build(version, lambda: _preferences_ports(df_exports, version))
+
+
+def _preferences_ports(df, version):
+    export_ports = get_exports_cube(df).exportateurs[['ABIDJAN', 'SAN PEDRO', 'INTERIEUR']].copy()
+
+    export_ports['Total Exporté'] = export_ports['ABIDJAN'] + export_ports['SAN PEDRO'] + export_ports['INTERIEUR']
+    export_ports['Total Ports'] = export_ports['ABIDJAN'] + export_ports['SAN PEDRO']
+    export_ports['% ABJ'] = (export_ports['ABIDJAN'] / export_ports['Total Ports'] * 100).fillna(0)
+    export_ports['% SP'] = (export_ports['SAN PEDRO'] / export_ports['Total Ports'] * 100).fillna(0)
+    export_ports['% INT'] = (export_ports['INTERIEUR'] / export_ports['Total Exporté'] * 100).fillna(0)
+    export_ports['Préférence'] = preference_port(
+        export_ports['ABIDJAN'],
+        export_ports['SAN PEDRO'],
+        export_ports['INTERIEUR']
+    )
+
+    moyennes = {
+        col: (export_ports[col].mean() if not export_ports[col].empty else 0)
+        for col in ['% ABJ', '% SP', '% INT']
+    }
+
+    tableau = export_ports[['ABIDJAN', 'SAN PEDRO', 'INTERIEUR', '% ABJ', '% SP', '% INT', 'Préférence']].copy()
+    for col in ['ABIDJAN', 'SAN PEDRO', 'INTERIEUR']:
+        tableau[col] = format_number_column(tableau[col])
+    for col in ['% ABJ', '% SP', '% INT']:
+        tableau[col] = format_percent_column(tableau[col], decimals=1)
+
+    return PreferencesPorts(
+        version=version,
+        total_abidjan=df['ABIDJAN'].sum(),
+        total_san_pedro=df['SAN PEDRO'].sum(),
+        total_interieur=df['INTERIEUR'].sum(),
+        exportateurs=export_ports,
+        top_exportateurs=top_n_autres(export_ports[['ABIDJAN', 'SAN PEDRO', 'INTERIEUR', 'Total Exporté']], 'Total Exporté', 15),
+        preferences=export_ports['Préférence'].value_counts(),
+        moyennes=moyennes,
+        tableau=tableau,
+    )
+
+
+def concentration_fournisseurs(df, top_n=TOP_N):
+    """HHI, part des top_n fournisseurs et exclusivité par exportateur, mémorisés par (version, top_n)"""
+    key = (dataset_version(df), top_n)
+    return _concentrations.get_or_build(key, lambda: _concentration_fournisseurs(df, key[0], top_n))
+
+
+def _concentration_fournisseurs(df, version, top_n):
+    matrice = get_supplier_matrix(df)
+    exportateurs = matrice.concentration(top_n)
+    cellules = len(matrice.fournisseurs) * len(matrice.exportateurs)
+    volume_total = exportateurs[COL_VOLUME].sum()
+
+    tableau = exportateurs.copy()
+    tableau[COL_VOLUME] = format_number_column(tableau[COL_VOLUME])
+    tableau['HHI'] = format_number_column(tableau['HHI'])
+    for col in [f'% Top {top_n} fournisseurs', '% Volume exclusif']:
+        tableau[col] = format_percent_column(tableau[col], decimals=1)
+
+    return ConcentrationFournisseurs(
+        version=version,
+        top_n=top_n,
+        exportateurs=exportateurs,
+        hhi_moyen=(exportateurs['HHI'] * exportateurs[COL_VOLUME]).sum() / volume_total if volume_total > 0 else 0,
+        nb_relations=matrice.nb_relations,
+        densite=matrice.nb_relations / cellules * 100 if cellules else 0,
+        memoire=matrice.nbytes(),
+        tableau=tableau,
+    )
+
+
+def concurrence_exportateurs(df, seuil=SEUIL_JACCARD):
+    """Paires d'exportateurs concurrents et groupes de concurrence, mémorisés par (version, seuil)"""
+    key = (dataset_version(df), seuil)
+    return _concurrences.get_or_build(key, lambda: _concurrence_exportateurs(df, key[0], seuil))
+
+
+def _concurrence_exportateurs(df, version, seuil):
+    graphe = get_competition_graph(df)
+    paires = graphe.paires()
+    groupes = resume_groupes(graphe, get_supplier_matrix(df), seuil)
+
+    tableau_paires = paires.head(TOP_PAIRES).copy()
+    for col in [COL_JACCARD, COL_CHEVAUCHEMENT]:
+        tableau_paires[col] = format_percent_column(tableau_paires[col] * 100, decimals=1)
+    for col in ['% volume A partagé', '% volume B partagé']:
+        tableau_paires[col] = format_percent_column(tableau_paires[col], decimals=1)
+    tableau_paires['Volume partagé (kg)'] = format_number_column(tableau_paires['Volume partagé (kg)'])
+
+    # Aucun groupe de plus d'un exportateur quand le seuil dépasse le Jaccard de toutes les paires
+    tableau_groupes = groupes[groupes['Nb Exportateurs'] > 1].copy()
+    if len(tableau_groupes):
+        tableau_groupes[COL_VOLUME] = format_number_column(tableau_groupes[COL_VOLUME])
+
+    return ConcurrenceExportateurs(
+        version=version,
+        seuil=seuil,
+        paires=paires,
+        nb_paires=graphe.nb_paires,
+        groupes=groupes,
+        nb_groupes=int((groupes['Nb Exportateurs'] > 1).sum()),
+        tableau_paires=tableau_paires,
+        tableau_groupes=tableau_groupes,
+    )
+
+
+def anomalies_ecarts(saisons):
+    """Scores d'anomalie des écarts de plusieurs saisons, mémorisés par versions des saisons
+
+    saisons : liste de (libellé, achats, exports) dans l'ordre chronologique.
+    Les saisons dont dB EXPORT est inexploitable sont ignorées.
+    """
+    ecarts = [(label, ecarts_achats_exports(achats, exports), achats) for label, achats, exports in saisons]
+    ecarts = [(label, resultat, achats) for label, resultat, achats in ecarts if not resultat.erreur]
+    version = "||".join(f"{label}={resultat.version}" for label, resultat, _ in ecarts)
+    return _anomalies.get_or_build(version, lambda: _anomalies_ecarts(
+        [(label, resultat.ecarts, get_achats_cube(achats).exportateurs[PORT_COLS]) for label, resultat, achats in ecarts],
+        version))
+
+
+def _ecarts_agregats(agregats):
+    """(libellé, écarts, ports des achats) depuis les agrégats compacts d'une saison, ou None sans exports"""
+    exportateurs = agregats.exportateurs
+    if exportateurs[COL_TOTAL_EXPORTE].isna().all():
+        return None
+    ecarts = pd.DataFrame({
+        COL_VOLUME: exportateurs[COL_VOLUME].round(0),
+        COL_TOTAL_EXPORTE: exportateurs[COL_TOTAL_EXPORTE].fillna(0).round(0),
+        'ABIDJAN': exportateurs['Export ABIDJAN'].fillna(0).round(0),
+        'SAN PEDRO': exportateurs['Export SAN PEDRO'].fillna(0).round(0),
+    })
+    ecarts[COL_ECART] = ecarts[COL_VOLUME] - ecarts[COL_TOTAL_EXPORTE]
+    ecarts[COL_PCT_ECART] = pourcentage_ecart(ecarts[COL_ECART], ecarts[COL_VOLUME]).round(1)
+    ecarts = ecarts[(ecarts[COL_VOLUME] > SEUIL_ACTIVITE) | (ecarts[COL_TOTAL_EXPORTE] > SEUIL_ACTIVITE)]
+    return agregats.label, ecarts, exportateurs[PORT_COLS]
+
+
+def anomalies_saisons(catalog, labels, workers=None):
+    """Scores d'anomalie des écarts de plusieurs saisons du catalogue, mémorisés par sources
+
+    Calculés sur les agrégats compacts par exportateur de chaque saison
+    (comparison.load_aggregates, noms canoniques) : les saisons non encore
+    chargées ne sont ni gardées en mémoire ni ajoutées au catalogue.
+    """
+    labels = sorted(labels)
+    seasons = [catalog.season(label) for label in labels]
+    version = "||".join(f"{label}={catalog.signature(season) if season else None}" for label, season in zip(labels, seasons))
+    return _anomalies.get_or_build(version, lambda: _anomalies_ecarts(
+        [ecarts for ecarts in map(_ecarts_agregats, load_aggregates(catalog, labels, workers)) if ecarts is not None],
+        version))
+
+
+def _anomalies_ecarts(ecarts, version):
+    """ecarts : liste de (libellé, écarts par exportateur, ports des achats par exportateur)"""
+    labels = [label for label, _, _ in ecarts]
+    if not ecarts:
+        return AnomaliesEcarts(version, labels, pd.DataFrame(), 0, pd.DataFrame())
+    table = table_saisons(ecarts)
+    scores = score_anomalies(table, labels)
+
+    # Score et motif en tête ; sans saison précédente, ni saison ni dérives
+    tableau = scores.reset_index()
+    tableau = tableau[[*tableau.columns[:2], COL_SCORE, COL_MOTIF, COL_ANOMALIE,
+                       *[col for col in tableau.columns[2:] if col not in (COL_SCORE, COL_MOTIF, COL_ANOMALIE)]]]
+    if len(labels) == 1:
+        tableau = tableau.drop(columns=[col for col in tableau.columns if col == COL_SAISON or 'Dérive' in col])
+    for col in [COL_VOLUME, COL_TOTAL_EXPORTE]:
+        tableau[col] = format_number_column(tableau[col])
+    for col in tableau.columns:
+        if col.startswith('%') or col.startswith('Écart mix') or col.startswith('Dérive'):
+            tableau[col] = tableau[col].round(1)
+        elif col.startswith('z ') or col == COL_SCORE:
+            tableau[col] = tableau[col].round(2)
+
+    return AnomaliesEcarts(
+        version=version,
+        saisons=labels,
+        scores=scores,
+        nb_anomalies=int(scores[COL_ANOMALIE].sum()),
+        tableau=tableau,
+    )
+
+
+def clear_caches():
+    """Vide les résultats mémorisés (mesures de performance à froid)"""
+    for cache in (_consolidations, _classements, _fournisseurs_exportateur, _ecarts, _preferences, _concentrations,
+                  _concurrences, _anomalies):
+        cache.clear()
@@ -0,0 +1,125 @@
+"""
+Détection d'anomalies sur les écarts achats / exports (z-scores robustes)
+
+Les écarts par exportateur de une ou plusieurs saisons (analytics.
+ecarts_achats_exports) sont empilés en une seule table (saison ×
+exportateur), puis notés en une passe vectorisée sur quatre critères :
+
+- % Écart de la saison ;
+- écart de mix portuaire : part d'ABIDJAN dans les exports moins sa part
+  dans les achats (en points, sur ABIDJAN + SAN PEDRO : les achats
+  INTERIEUR sortent par l'un des deux ports) ;
+- dérive du % Écart depuis la saison précédente de l'exportateur ;
+- dérive de la part d'ABIDJAN dans ses exports depuis la saison précédente.
+
+Chaque critère est réduit en z-score robuste au sein de sa saison
+(médiane et écart absolu médian, Iglewicz et Hoaglin) : quelques écarts
+extrêmes ne masquent pas les autres comme avec la moyenne et l'écart-type.
+Le score d'un couple saison × exportateur est le plus grand |z| de ses
+critères ; au-delà de SEUIL_Z il est signalé comme anomalie.
+"""
+import numpy as np
+import pandas as pd
+
+from aggregations import COL_EXPORTATEUR, COL_TOTAL_EXPORTE, COL_VOLUME
+
+COL_SAISON = 'Saison'
+COL_ABJ_ACHATS = '% ABJ achats'
+COL_ABJ_EXPORTS = '% ABJ exports'
+COL_PCT_ECART = '% Écart'
+COL_MIX = 'Écart mix port'
+COL_DERIVE_ECART = 'Dérive % Écart'
+COL_DERIVE_MIX = 'Dérive mix port'
+COL_SCORE = 'Score'
+COL_MOTIF = 'Motif'
+COL_ANOMALIE = 'Anomalie'
+
+# |z| robuste à partir duquel un couple saison × exportateur est signalé
+SEUIL_Z = 3.5
+
+# z modifié = 0,6745 (x - médiane) / MAD ; repli sur l'écart absolu moyen quand MAD = 0
+_FACTEUR_MAD = 0.6745
+_FACTEUR_MEANAD = 0.7979
+
+
+def robust_zscore(values, groupes=None):
+    """z-scores robustes (médiane / écart absolu médian), par groupe si groupes est donné
+
+    Les valeurs manquantes restent manquantes ; un groupe sans dispersion a des z nuls.
+    """
+    values = pd.Series(values, dtype=float)
+    cles = groupes if groupes is not None else np.zeros(len(values), dtype=np.int8)
+    centre = values - values.groupby(cles, observed=True, sort=False).transform('median')
+    ecarts = centre.abs().groupby(cles, observed=True, sort=False)
+    mad = ecarts.transform('median').to_numpy()
+    meanad = ecarts.transform('mean').to_numpy()
+    centre = centre.to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(mad > 0, _FACTEUR_MAD * centre / mad,
+                     np.where(meanad > 0, _FACTEUR_MEANAD * centre / meanad, 0.0))
+    z[np.isnan(centre)] = np.nan
+    return pd.Series(z, index=values.index)
+
+
+def _part_abidjan(ports):
+    """Part (%) d'ABIDJAN dans ABIDJAN + SAN PEDRO ; NaN sans volume sur ces ports"""
+    abidjan = ports['ABIDJAN'].to_numpy(dtype=float)
+    total = abidjan + ports['SAN PEDRO'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(total > 0, abidjan / total * 100, np.nan)
+
+
+def table_saisons(saisons):
+    """Empile les écarts par exportateur de chaque saison : index (saison, exportateur)
+
+    saisons : liste de (libellé, écarts, ports des achats) dans l'ordre
+    chronologique ; écarts = EcartsAchatsExports.ecarts, ports des achats =
+    volumes achetés par port et par exportateur (cube des achats), ou None.
+    Le mix portuaire n'est calculé que si toutes les saisons ont les ports.
+    """
+    avec_ports = all(achats is not None and 'ABIDJAN' in ecarts.columns for _, ecarts, achats in saisons)
+    frames = {}
+    for label, ecarts, achats in saisons:
+        frame = ecarts[[COL_VOLUME, COL_TOTAL_EXPORTE, COL_PCT_ECART]].copy()
+        if avec_ports:
+            frame[COL_ABJ_ACHATS] = _part_abidjan(achats.reindex(ecarts.index, fill_value=0))
+            frame[COL_ABJ_EXPORTS] = _part_abidjan(ecarts)
+        frames[label] = frame
+    table = pd.concat(frames, names=[COL_SAISON, COL_EXPORTATEUR])
+    if avec_ports:
+        table[COL_MIX] = table[COL_ABJ_EXPORTS] - table[COL_ABJ_ACHATS]
+    return table
+
+
+def score_anomalies(table, ordre_saisons):
+    """Scores d'anomalie de chaque couple saison × exportateur, tri par score décroissant
+
+    Une passe vectorisée sur toute la table : dérives par décalage d'une saison
+    au sein de chaque exportateur, z-scores robustes par saison, score = max |z|.
+    """
+    rang = pd.Index(ordre_saisons).get_indexer(table.index.get_level_values(COL_SAISON))
+    table = table.iloc[np.lexsort((rang, table.index.get_level_values(COL_EXPORTATEUR).astype(str)))].copy()
+    exportateurs = table.index.get_level_values(COL_EXPORTATEUR)
+    saison = table.index.get_level_values(COL_SAISON)
+
+    # Saison précédente de l'exportateur (lignes consécutives après tri par exportateur puis saison)
+    meme_exportateur = np.zeros(len(table), dtype=bool)
+    meme_exportateur[1:] = exportateurs[1:] == exportateurs[:-1]
+    precedent = np.roll(np.arange(len(table)), 1)
+
+    pct = table[COL_PCT_ECART].to_numpy(dtype=float)
+    table[COL_DERIVE_ECART] = np.where(meme_exportateur, pct - pct[precedent], np.nan)
+    criteres = [COL_PCT_ECART, COL_DERIVE_ECART]
+    if COL_MIX in table.columns:
+        abidjan = table[COL_ABJ_EXPORTS].to_numpy(dtype=float)
+        table[COL_DERIVE_MIX] = np.where(meme_exportateur, abidjan - abidjan[precedent], np.nan)
+        criteres += [COL_MIX, COL_DERIVE_MIX]
+
+    z = np.column_stack([robust_zscore(table[critere], saison).to_numpy() for critere in criteres])
+    absolus = np.where(np.isnan(z), -1.0, np.abs(z))
+    for i, critere in enumerate(criteres):
+        table[f'z {critere}'] = z[:, i]
+    table[COL_SCORE] = np.maximum(absolus.max(axis=1), 0.0)
+    table[COL_MOTIF] = np.asarray(criteres, dtype=object)[absolus.argmax(axis=1)]
+    table[COL_ANOMALIE] = table[COL_SCORE] >= SEUIL_Z
+    return table.sort_values(COL_SCORE, ascending=False, kind='stable')
@@ -4,9 +4,13 @@ Système d'authentification et de logging pour le dashboard
 import streamlit as st
 import hashlib
 import datetime
-import json
 import os
-from pathlib import Path
+
+from access_log import LOG_DIR, get_sink
+from log_index import AccessLogIndex
+
+# Nombre d'entrées par page dans la consultation des logs
+LOG_PAGE_SIZE = 50
 
 # Configuration des utilisateurs (dans un vrai système, utiliser une base de données)
 # Les mots de passe sont hashés pour la sécurité
@@ -30,29 +34,8 @@ def create_log_entry(username, action, details=""):
         "ip": st.session_state.get("client_ip", "Unknown")
     }
     
-    # Créer le dossier logs s'il n'existe pas
-    log_dir = Path("logs")
-    log_dir.mkdir(exist_ok=True)
-    
-    # Nom du fichier de log du jour
-    log_file = log_dir / f"access_{datetime.datetime.now().strftime('%Y%m%d')}.json"
-    
-    # Lire les logs existants ou créer une liste vide
-    if log_file.exists():
-        with open(log_file, 'r') as f:
-            try:
-                logs = json.load(f)
-            except:
-                logs = []
-    else:
-        logs = []
-    
-    # Ajouter la nouvelle entrée
-    logs.append(log_entry)
-    
-    # Sauvegarder
-    with open(log_file, 'w') as f:
-        json.dump(logs, f, indent=2)
+    # Ajout d'une ligne au journal du jour, écrite en arrière-plan
+    get_sink().write(log_entry)
     
     return log_entry
 
@@ -191,51 +174,63 @@ def show_access_logs():
     """Affiche les logs d'accès pour les administrateurs"""
     if st.session_state.get("username") == "Julien":  # Admin uniquement
         with st.expander("📋 Logs d'accès (Admin)"):
-            log_dir = Path("logs")
+            log_dir = LOG_DIR
             if log_dir.exists():
-                log_files = sorted(log_dir.glob("access_*.json"), reverse=True)
+                # Index SQLite de tous les jours, complété avec les entrées récentes
+                get_sink().flush()
+                index = AccessLogIndex(log_dir)
+                index.sync()
+                first, last = index.time_range()
                 
-                if log_files:
-                    # Sélectionner le fichier de log
-                    selected_file = st.selectbox(
-                        "Fichier de log",
-                        log_files,
-                        format_func=lambda x: x.stem.replace("access_", "")
-                    )
-                    
-                    # Charger et afficher les logs
-                    with open(selected_file, 'r') as f:
-                        logs = json.load(f)
+                if first:
+                    first_day = datetime.date.fromisoformat(first[:10])
+                    last_day = datetime.date.fromisoformat(last[:10])
                     
-                    # Convertir en DataFrame pour un meilleur affichage
-                    import pandas as pd
-                    df_logs = pd.DataFrame(logs)
+                    # Période, actions et utilisateurs
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        period = st.date_input(
+                            "Période",
+                            value=(max(first_day, last_day - datetime.timedelta(days=6)), last_day),
+                            min_value=first_day,
+                            max_value=last_day
+                        )
+                    with col2:
+                        user_filter = st.multiselect("Filtrer par utilisateur", index.users())
                     
-                    # Filtrer par type d'action
                     action_filter = st.multiselect(
                         "Filtrer par action",
                         ["LOGIN_SUCCESS", "LOGIN_FAILED", "LOGOUT"],
                         default=["LOGIN_SUCCESS", "LOGIN_FAILED", "LOGOUT"]
                     )
                     
-                    if action_filter:
-                        df_logs = df_logs[df_logs['action'].isin(action_filter)]
+                    start_day, end_day = period if len(period) == 2 else (period[0], period[0])
+                    filters = {
+                        "start": start_day.isoformat(),
+                        "end": (end_day + datetime.timedelta(days=1)).isoformat(),
+                        "users": user_filter,
+                        "actions": action_filter or None,
+                    }
+                    stats = index.stats(**filters)
+                    
+                    # Pagination côté SQLite
+                    page_count = max(1, -(-stats["total"] // LOG_PAGE_SIZE))
+                    page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+                    df_logs = index.query(**filters, limit=LOG_PAGE_SIZE, offset=(page - 1) * LOG_PAGE_SIZE)
                     
                     # Afficher le tableau
-                    st.dataframe(
-                        df_logs[['timestamp', 'username', 'action', 'details']],
-                        use_container_width=True
-                    )
+                    st.dataframe(df_logs, use_container_width=True)
+                    st.caption(f"{stats['total']} entrées - page {page} / {page_count}")
                     
                     # Statistiques
                     col1, col2, col3 = st.columns(3)
                     with col1:
-                        st.metric("Total connexions", len(df_logs[df_logs['action'] == 'LOGIN_SUCCESS']))
+                        st.metric("Total connexions", stats["success"])
                     with col2:
-                        st.metric("Échecs connexion", len(df_logs[df_logs['action'] == 'LOGIN_FAILED']))
+                        st.metric("Échecs connexion", stats["failed"])
                     with col3:
-                        st.metric("Utilisateurs uniques", df_logs['username'].nunique())
+                        st.metric("Utilisateurs uniques", stats["unique_users"])
                 else:
                     st.info("Aucun log disponible")
             else:
-                st.info("Dossier de logs non trouvé")
\ No newline at end of file
+                st.info("Dossier de logs non trouvé")
@@ -0,0 +1,294 @@
+"""
+Rapports par exportateur générés hors de Streamlit
+
+Le jeu de données d'une saison est chargé une seule fois ; les analyses des
+onglets Fournisseurs et Écarts (module analytics) sont extraites pour chaque
+exportateur, puis les pages HTML (et en option les graphiques PNG) sont
+produites en parallèle par un pool de processus. Les processus ne reçoivent
+que les quelques lignes utiles à leur exportateur, jamais le jeu complet.
+
+    python batch_report.py --season 2021-2022 --output rapports/2021-2022 --png
+"""
+import argparse
+import html
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.offline import get_plotlyjs
+
+from aggregations import COL_REGION, COL_TOTAL_EXPORTE, COL_VOLUME, PORT_COLS
+from analytics import COL_ECART, COL_PCT_ECART, classement_fournisseurs, ecarts_achats_exports, fournisseurs_exportateur
+from data_cache import _slug
+from theme import BON_PLEIN_COLORS, apply_bon_plein_theme, format_number
+
+REPORTS_DIR = Path("rapports")
+PLOTLY_JS = "plotly.min.js"
+
+# Nombre de fournisseurs détaillés par rapport
+DEFAULT_TOP = 15
+
+PORT_LABELS = {'ABIDJAN': 'ABIDJAN', 'INTERIEUR': 'INTÉRIEUR', 'SAN PEDRO': 'SAN PEDRO'}
+
+_PAGE = """<!DOCTYPE html>
+<html lang="fr">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="{plotly_js}"></script>
+<style>
+  body {{ font-family: Arial, sans-serif; color: {text}; margin: 2rem; }}
+  h1 {{ color: {primary}; }}
+  h2 {{ color: {secondary}; border-bottom: 2px solid {accent}; }}
+  .metrics {{ display: flex; gap: 2rem; flex-wrap: wrap; }}
+  .metric {{ border-left: 4px solid {primary}; padding: 0.5rem 1rem; }}
+  .metric span {{ display: block; color: {text_secondary}; font-size: 0.9rem; }}
+  table {{ border-collapse: collapse; }}
+  th, td {{ padding: 0.3rem 0.8rem; border-bottom: 1px solid {accent}; text-align: right; }}
+  th:first-child, td:first-child {{ text-align: left; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+{body}
+</body>
+</html>
+"""
+
+
+def _page(title, body):
+    colors = {key: value for key, value in BON_PLEIN_COLORS.items() if key != 'palette'}
+    return _PAGE.format(title=html.escape(title), body=body, plotly_js=PLOTLY_JS, **colors)
+
+
+def _metric(label, value, detail=""):
+    return (f'<div class="metric"><span>{html.escape(label)}</span><b>{html.escape(value)}</b>'
+            f'<span>{html.escape(detail)}</span></div>')
+
+
+def exporter_payloads(df_achats, df_exports, exportateurs=None, top=DEFAULT_TOP):
+    """Données de rapport de chaque exportateur (petits tableaux, transmissibles aux processus)"""
+    classement = classement_fournisseurs(df_achats)
+    # Saison sans feuille dB EXPORT : rapports sans la partie écarts
+    ecarts = ecarts_achats_exports(df_achats, df_exports) if df_exports is not None else None
+    if exportateurs is None:
+        exportateurs = classement.exportateurs
+    inconnus = [e for e in exportateurs if e not in set(classement.exportateurs)]
+    if inconnus:
+        raise KeyError(f"Exportateurs inconnus: {', '.join(map(str, inconnus))}")
+
+    payloads = []
+    slugs = set()
+    for exportateur in exportateurs:
+        # Noms de fichiers uniques même si deux exportateurs ne diffèrent que par les accents
+        slug = base = _slug(exportateur)
+        n = 1
+        while slug in slugs:
+            n += 1
+            slug = f"{base}_{n}"
+        slugs.add(slug)
+
+        detail = fournisseurs_exportateur(df_achats, exportateur)
+        ecart = None
+        if ecarts is not None and ecarts.erreur is None and exportateur in ecarts.ecarts.index:
+            row = ecarts.ecarts.loc[exportateur]
+            ecart = {
+                'achete': float(row[COL_VOLUME]),
+                'exporte': float(row[COL_TOTAL_EXPORTE]),
+                'ecart': float(row[COL_ECART]),
+                'pct': float(row[COL_PCT_ECART]),
+                'statut': str(ecarts.tableau.loc[exportateur, 'Statut']),
+            }
+        payloads.append({
+            'exportateur': str(exportateur),
+            'slug': slug,
+            'fournisseurs': detail.fournisseurs.head(top),
+            'nb_fournisseurs': len(detail.fournisseurs),
+            'total': detail.total,
+            'ports': {col: float(detail.ports[col]) for col in PORT_COLS},
+            'ecart': ecart,
+        })
+    return payloads
+
+
+def _figures(payload):
+    """(nom, figure) des graphiques d'un exportateur"""
+    exportateur = payload['exportateur']
+    fournisseurs = payload['fournisseurs']
+    figures = []
+
+    fig = px.bar(
+        x=fournisseurs[COL_VOLUME][::-1],
+        y=fournisseurs.index.astype(str)[::-1],
+        orientation='h',
+        title=f"Top {len(fournisseurs)} Fournisseurs de {exportateur}",
+        labels={'x': 'Volume (kg)', 'y': 'Fournisseur'},
+        color_discrete_sequence=[BON_PLEIN_COLORS['primary']]
+    )
+    figures.append(("fournisseurs", apply_bon_plein_theme(fig)))
+
+    ports = payload['ports']
+    if sum(ports.values()) > 0:
+        fig = px.pie(
+            values=list(ports.values()),
+            names=[PORT_LABELS[col] for col in ports],
+            title=f"Exports de {exportateur} par Port",
+            color_discrete_sequence=BON_PLEIN_COLORS['palette']
+        )
+        figures.append(("ports", apply_bon_plein_theme(fig)))
+
+    ecart = payload['ecart']
+    if ecart is not None:
+        fig = go.Figure([
+            go.Bar(name='Acheté', x=['Volume'], y=[ecart['achete']], marker_color=BON_PLEIN_COLORS['primary']),
+            go.Bar(name='Exporté', x=['Volume'], y=[ecart['exporte']], marker_color=BON_PLEIN_COLORS['secondary']),
+        ])
+        fig.update_layout(barmode='group', title=f"Achats vs Exports - {exportateur}", yaxis_title='Volume (kg)')
+        figures.append(("ecart", apply_bon_plein_theme(fig)))
+    return figures
+
+
+def _body(payload, figures):
+    total = payload['total']
+    parts = ['<div class="metrics">',
+             _metric("Total acheté", f"{format_number(total)} kg", f"{format_number(total / 1000)} tonnes"),
+             _metric("Nombre de fournisseurs", format_number(payload['nb_fournisseurs']))]
+    ecart = payload['ecart']
+    if ecart is not None:
+        parts += [_metric("Total exporté", f"{format_number(ecart['exporte'])} kg"),
+                  _metric("Écart (Acheté - Exporté)", f"{format_number(ecart['ecart'])} kg",
+                          f"{ecart['pct']:.1f}% - {ecart['statut']}")]
+    parts.append('</div>')
+
+    graphs = dict(figures)
+    parts.append("<h2>Plus Grands Fournisseurs</h2>")
+    parts.append(graphs['fournisseurs'].to_html(full_html=False, include_plotlyjs=False))
+    tableau = payload['fournisseurs'][[COL_VOLUME, COL_REGION, '% du total']].copy()
+    tableau[COL_VOLUME] = tableau[COL_VOLUME].map(format_number)
+    parts.append(tableau.to_html(escape=True))
+
+    parts.append("<h2>Répartition par Port</h2>")
+    if 'ports' in graphs:
+        parts.append(graphs['ports'].to_html(full_html=False, include_plotlyjs=False))
+    else:
+        parts.append("<p>Aucun volume par port pour cet exportateur.</p>")
+
+    parts.append("<h2>Écart Achats / Exports</h2>")
+    if 'ecart' in graphs:
+        parts.append(graphs['ecart'].to_html(full_html=False, include_plotlyjs=False))
+    else:
+        parts.append("<p>Activité inférieure au seuil ou exports absents de dB EXPORT.</p>")
+    return "\n".join(parts)
+
+
+def render_exporter(payload, output_dir, png=False):
+    """Écrit le rapport HTML (et les PNG) d'un exportateur ; renvoie sa ligne de synthèse"""
+    output_dir = Path(output_dir)
+    slug = payload['slug']
+    figures = _figures(payload)
+    page = output_dir / f"{slug}.html"
+    page.write_text(_page(payload['exportateur'], _body(payload, figures)), encoding="utf-8")
+    if png:
+        for name, fig in figures:
+            fig.write_image(output_dir / "png" / f"{slug}_{name}.png", width=1000, height=600)
+
+    ecart = payload['ecart']
+    return {
+        'exportateur': payload['exportateur'],
+        'fichier': page.name,
+        'total': payload['total'],
+        'nb_fournisseurs': payload['nb_fournisseurs'],
+        'ecart_pct': ecart['pct'] if ecart else None,
+    }
+
+
+def _render_chunk(args):
+    payloads, output_dir, png = args
+    return [render_exporter(payload, output_dir, png) for payload in payloads]
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def write_index(output_dir, title, summaries):
+    """Page d'accueil : un lien par exportateur, du plus gros acheteur au plus petit"""
+    rows = []
+    for s in sorted(summaries, key=lambda s: s['total'], reverse=True):
+        pct = f"{s['ecart_pct']:.1f}%" if s['ecart_pct'] is not None else "-"
+        rows.append(f"<tr><td><a href=\"{html.escape(s['fichier'])}\">{html.escape(s['exportateur'])}</a></td>"
+                    f"<td>{format_number(s['total'])}</td><td>{format_number(s['nb_fournisseurs'])}</td><td>{pct}</td></tr>")
+    body = ("<table><tr><th>Exportateur</th><th>Volume acheté (kg)</th><th>Fournisseurs</th><th>% Écart</th></tr>"
+            + "\n".join(rows) + "</table>")
+    (Path(output_dir) / "index.html").write_text(_page(title, body), encoding="utf-8")
+
+
+def generate_reports(df_achats, df_exports, output_dir, exportateurs=None, top=DEFAULT_TOP, workers=None, png=False,
+                     title="Rapports par exportateur"):
+    """Génère les rapports de tous les exportateurs (ou de la liste donnée) ; renvoie les lignes de synthèse"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if png:
+        (output_dir / "png").mkdir(exist_ok=True)
+    # Bibliothèque Plotly écrite une fois, partagée par toutes les pages
+    (output_dir / PLOTLY_JS).write_text(get_plotlyjs(), encoding="utf-8")
+
+    payloads = exporter_payloads(df_achats, df_exports, exportateurs, top)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(payloads) <= 1:
+        summaries = _render_chunk((payloads, output_dir, png))
+    else:
+        # Lots de quelques exportateurs : moins d'allers-retours entre processus
+        size = max(1, len(payloads) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            tasks = [(chunk, output_dir, png) for chunk in _chunks(payloads, size)]
+            summaries = [s for chunk in pool.map(_render_chunk, tasks) for s in chunk]
+
+    write_index(output_dir, title, summaries)
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rapports HTML / PNG par exportateur, générés en parallèle")
+    parser.add_argument("--season", help="Saison du catalogue (défaut : la plus récente)")
+    parser.add_argument("--output", default=None, help="Dossier des rapports (défaut : rapports/<saison>)")
+    parser.add_argument("--exportateur", action="append", help="Exportateur à traiter (répétable) ; défaut : tous")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="Nombre de fournisseurs détaillés par rapport")
+    parser.add_argument("--workers", type=int, default=None, help="Nombre de processus (défaut : nombre de cœurs)")
+    parser.add_argument("--png", action="store_true", help="Exporte aussi les graphiques en PNG (nécessite kaleido)")
+    args = parser.parse_args()
+
+    if args.png:
+        try:
+            import kaleido  # noqa: F401
+        except ImportError:
+            parser.error("--png nécessite le paquet kaleido (pip install kaleido)")
+
+    from catalog import DatasetCatalog
+    catalog = DatasetCatalog()
+    seasons = catalog.seasons()
+    if not seasons:
+        parser.error("Aucune saison trouvée dans Master_Data/")
+    label = args.season or seasons[0].label
+    if catalog.season(label) is None:
+        parser.error(f"Saison inconnue: {label} (disponibles : {', '.join(s.label for s in seasons)})")
+
+    start = time.time()
+    df_achats, df_exports = catalog.get(label)
+    print(f"Saison {label} chargée en {time.time() - start:.1f} s")
+
+    output_dir = Path(args.output) if args.output else REPORTS_DIR / _slug(label)
+    start = time.time()
+    try:
+        summaries = generate_reports(df_achats, df_exports, output_dir, args.exportateur, args.top, args.workers, args.png,
+                                     title=f"Rapports par exportateur - {label}")
+    except KeyError as e:
+        parser.error(e.args[0])
+    print(f"{len(summaries)} rapports écrits dans {output_dir} en {time.time() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+"""
+Banc de mesure du chargement et des calculs du dashboard
+
+Génère des classeurs synthétiques au format exact des feuilles « dB ACHAT »
+et « dB EXPORT » (ligne de titre, ligne d'en-têtes, données), puis mesure
+pour chaque étape (chargement, cubes, chaque onglet) le temps écoulé et le
+pic mémoire (tracemalloc). Streamlit est remplacé par un module factice :
+seuls les calculs et la construction des graphiques sont mesurés.
+
+Au-delà de la limite d'Excel (1 048 576 lignes), le jeu est écrit en CSV et
+chargé par l'ingestion par blocs (ingestion.py).
+
+Usage:
+    python benchmark.py --rows 1000 100000 1000000 --output benchmark_report.json
+    python benchmark.py --rows 10000000 --exporters 120 --suppliers 50000
+    python benchmark.py --compare ancien_rapport.json --output nouveau_rapport.json
+"""
+import argparse
+import datetime
+import gc
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Nombre maximal de lignes de données d'une feuille .xlsx (titre + en-têtes déduits)
+XLSX_MAX_ROWS = 1_048_576 - 2
+
+REGIONS = ['ABOISSO', 'ADZOPE', 'AGBOVILLE', 'BONDOUKOU', 'BOUAFLE', 'DALOA', 'DANANE', 'DIVO', 'DUEKOUE',
+           'GAGNOA', 'GUIGLO', 'ISSIA', 'LAKOTA', 'MAN', 'MEAGUI', 'OUME', 'SAN PEDRO', 'SASSANDRA',
+           'SOUBRE', 'TABOU', 'TIASSALE', 'VAVOUA', 'YAMOUSSOUKRO', 'ZOUKOUGBEU']
+
+DEFAULT_ROWS = [1_000, 10_000, 100_000]
+DEFAULT_EXPORTERS = [60]
+DEFAULT_SUPPLIERS = [2_000]
+
+
+# --- Données synthétiques ----------------------------------------------------
+
+def generate_frames(n_rows, n_exporters, n_suppliers, seed=0):
+    """(achats, exports) synthétiques, colonnes comme dans le classeur (avant nettoyage)
+
+    La popularité des exportateurs et des fournisseurs suit une loi de Zipf,
+    chaque fournisseur a une région principale et chaque ligne part par un port.
+    """
+    rng = np.random.default_rng(seed)
+    n_suppliers = max(1, min(n_suppliers, n_rows))
+
+    exp_weights = 1 / np.arange(1, n_exporters + 1)
+    exporters = rng.choice(n_exporters, size=n_rows, p=exp_weights / exp_weights.sum())
+    sup_weights = 1 / np.arange(1, n_suppliers + 1) ** 0.8
+    suppliers = rng.choice(n_suppliers, size=n_rows, p=sup_weights / sup_weights.sum())
+
+    # Région principale par fournisseur, parfois une autre région pour la ligne
+    home_region = rng.integers(0, len(REGIONS), size=n_suppliers)
+    regions = np.where(rng.random(n_rows) < 0.9, home_region[suppliers], rng.integers(0, len(REGIONS), size=n_rows))
+
+    volumes = np.round(rng.lognormal(mean=11, sigma=1.5, size=n_rows)).astype(np.int64)
+    ports = rng.choice(3, size=n_rows, p=[0.5, 0.05, 0.45])
+
+    exporter_names = np.array([f"EXPORTATEUR {i:03d}" for i in range(n_exporters)], dtype=object)
+    # Libellé « Exportateurs » : une ou deux entités juridiques par exportateur simplifié
+    legal_suffix = np.where(rng.random(n_rows) < 0.8, " CI", " TRADING")
+    achats = pd.DataFrame({
+        'Code fournisseur': np.char.add("A", np.char.zfill(suppliers.astype(str), 8)).astype(object),
+        'Nom fournisseur': np.char.add("SCOOPS ", np.char.zfill(suppliers.astype(str), 6)).astype(object),
+        'Exportateurs': exporter_names[exporters] + legal_suffix,
+        'EXPORTATEUR SIMPLE': exporter_names[exporters],
+        'Region activité': np.array(REGIONS, dtype=object)[regions],
+        'Volume livré (kg)': volumes,
+        'ABIDJAN': np.where(ports == 0, volumes, 0),
+        'INTERIEUR': np.where(ports == 1, volumes, 0),
+        'SAN PEDRO': np.where(ports == 2, volumes, 0),
+    })
+
+    # Exports : achats par exportateur à ±10 % près, répartis entre Abidjan et San Pedro
+    bought = np.bincount(exporters, weights=volumes, minlength=n_exporters)
+    exported = np.round(bought * rng.uniform(0.85, 1.05, size=n_exporters)).astype(np.int64)
+    share_abj = rng.uniform(0.2, 0.8, size=n_exporters)
+    abj = np.round(exported * share_abj).astype(np.int64)
+    exports = pd.DataFrame({
+        'EXPORTATEUR SIMPLE': exporter_names,
+        'ABJ': abj,
+        'SP': exported - abj,
+        'Total général': exported,
+    })
+    return achats, exports
+
+
+def _sheet_rows(df, title):
+    """Lignes d'une feuille : titre (ou ligne vide), en-têtes, données"""
+    yield [title]
+    yield list(df.columns)
+    columns = [df[col].tolist() for col in df.columns]
+    yield from zip(*columns)
+
+
+def write_workbook(path, achats, exports, season="2020/2021"):
+    """Classeur .xlsx avec les feuilles dB ACHAT et dB EXPORT (écriture en flux)"""
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    for name, df, title in (("dB ACHAT", achats, season), ("dB EXPORT", exports, None)):
+        ws = wb.create_sheet(name)
+        for row in _sheet_rows(df, title):
+            ws.append(list(row))
+    wb.save(path)
+
+
+def write_csv(path, df, title=""):
+    """CSV au même format que la feuille (ligne de titre puis en-têtes), lisible par ingestion.py"""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(f"{title}\n")
+        df.to_csv(f, index=False, sep=";")
+
+
+# --- Streamlit factice -------------------------------------------------------
+
+class _Element:
+    """Élément Streamlit factice : appelable, utilisable en contexte, attributs factices"""
+
+    def __call__(self, *args, **kwargs):
+        return _Element()
+
+    def __getattr__(self, name):
+        return _Element()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _SessionState(dict):
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+class _StopRun(Exception):
+    pass
+
+
+def _cache_decorator(func=None, **kwargs):
+    """@st.cache_data / @st.cache_data(...) : pas de cache, pour mesurer le calcul lui-même"""
+    if func is None:
+        return lambda f: f
+    return func
+
+
+def _first(options, index=0, **kwargs):
+    options = list(options)
+    return options[index] if options else None
+
+
+def make_streamlit_stub():
+    """Module remplaçant streamlit : les widgets renvoient leur valeur par défaut, l'affichage ne fait rien"""
+    stub = types.ModuleType("streamlit")
+    element = _Element()
+
+    def module_getattr(name):
+        return element
+
+    stub.__getattr__ = module_getattr
+    stub.session_state = _SessionState()
+    stub.sidebar = element
+    stub.cache_data = _cache_decorator
+    stub.cache_resource = _cache_decorator
+    stub.columns = lambda spec, **kwargs: [_Element() for _ in range(spec if isinstance(spec, int) else len(spec))]
+    stub.tabs = lambda labels, **kwargs: [_Element() for _ in labels]
+    stub.selectbox = lambda label, options, index=0, **kwargs: _first(options, index)
+    stub.radio = lambda label, options, index=0, **kwargs: _first(options, index)
+    stub.multiselect = lambda label, options, default=None, **kwargs: list(default or [])
+    stub.slider = lambda label, min_value=None, max_value=None, value=None, **kwargs: value if value is not None else min_value
+    stub.number_input = lambda label, min_value=None, max_value=None, value=None, **kwargs: value if value is not None else min_value
+    stub.text_input = lambda label, value="", **kwargs: value
+    stub.checkbox = lambda label, value=False, **kwargs: value
+    stub.toggle = stub.checkbox
+    stub.button = lambda *args, **kwargs: False
+
+    def stop():
+        raise _StopRun()
+
+    stub.stop = stop
+    stub.rerun = stop
+    return stub
+
+
+# --- Mesures -----------------------------------------------------------------
+
+def measure(func, memory=True, before=None, repeat=1):
+    """(secondes, pic mémoire en Mo) ; meilleur temps sur `repeat` exécutions sans tracemalloc,
+    pic mémoire lors d'une exécution supplémentaire"""
+    seconds = None
+    for _ in range(repeat):
+        if before:
+            before()
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    if not memory:
+        return seconds, None
+
+    if before:
+        before()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak / (1024 * 1024)
+
+
+def _clear_caches():
+    from aggregations import clear_caches
+    from competition import clear_caches as clear_competition_caches
+    from matrix import clear_caches as clear_matrix_caches
+    clear_caches()
+    clear_matrix_caches()
+    clear_competition_caches()
+
+
+def _clear_tab_caches():
+    # Les cubes restent construits ; seuls les résultats des onglets sont recalculés
+    from analytics import clear_caches
+    from explorer import clear_caches as clear_explorer_caches
+    from figures import clear_caches as clear_figure_caches
+    clear_caches()
+    clear_explorer_caches()
+    clear_figure_caches()
+
+
+def _stages(app, source, store_dir):
+    """Étapes mesurées : (nom, fonction, préparation avant chaque exécution ou None)
+
+    Les cubes et l'index sont mesurés à froid ; les onglets réutilisent ensuite
+    les cubes déjà construits, comme dans l'application, mais recalculent leurs
+    résultats (module analytics) à chaque exécution.
+    """
+    from aggregations import get_achats_cube, get_achats_index, get_exports_cube
+    from data_cache import SNAPSHOT_DIR
+    from data_loader import SHEET_ACHAT, SHEET_EXPORT, load_sheets
+
+    state = {}
+
+    def cold_load():
+        for old in SNAPSHOT_DIR.glob("*"):
+            old.unlink()
+        sheets = load_sheets(source, [SHEET_ACHAT, SHEET_EXPORT])
+        return sheets[SHEET_ACHAT], sheets[SHEET_EXPORT]
+
+    def warm_load():
+        sheets = load_sheets(source, [SHEET_ACHAT, SHEET_EXPORT])
+        state['achats'], state['exports'] = sheets[SHEET_ACHAT], sheets[SHEET_EXPORT]
+        return state['achats'], state['exports']
+
+    def store_ingest():
+        import shutil
+        from ingestion import ColumnStore, ingest
+        shutil.rmtree(store_dir, ignore_errors=True)
+        store = ColumnStore(store_dir)
+        ingest(source['achats'], "bench", [SHEET_ACHAT], store)
+        ingest(source['exports'], "bench", [SHEET_EXPORT], store)
+        return store
+
+    def store_read():
+        from ingestion import ColumnStore
+        store = ColumnStore(store_dir)
+        state['achats'] = store.read("bench", SHEET_ACHAT)
+        state['exports'] = store.read("bench", SHEET_EXPORT)
+        return state['achats'], state['exports']
+
+    if isinstance(source, dict):
+        stages = [("ingestion CSV", store_ingest, None), ("lecture stock", store_read, None)]
+    else:
+        stages = [("chargement classeur", cold_load, None), ("chargement instantané", warm_load, None)]
+
+    stages += [
+        ("cube achats", lambda: get_achats_cube(state['achats']), _clear_caches),
+        ("cube exports", lambda: get_exports_cube(state['exports']), _clear_caches),
+        ("index lignes", lambda: get_achats_index(state['achats']), _clear_caches),
+        ("onglet Vue Achats", lambda: app.analyse_achats_exports(state['achats']), _clear_tab_caches),
+        ("onglet Fournisseurs", lambda: app.analyse_fournisseurs(state['achats']), _clear_tab_caches),
+        ("onglet Écarts", lambda: app.analyse_differences_poids(state['achats'], state['exports']), _clear_tab_caches),
+        ("onglet ABJ vs SP", lambda: app.analyse_abj_vs_sp(state['exports']), _clear_tab_caches),
+        ("onglet Données Brutes", lambda: app.explorer_donnees_brutes(state['achats']), _clear_tab_caches),
+    ]
+    return stages
+
+
+def run_case(app, workdir, n_rows, n_exporters, n_suppliers, fmt, memory=True, seed=0, repeat=1):
+    """Génère un jeu, enchaîne les étapes et renvoie le résultat du cas"""
+    case_dir = Path(workdir) / f"{n_rows}_{n_exporters}_{n_suppliers}_{fmt}"
+    case_dir.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    achats, exports = generate_frames(n_rows, n_exporters, n_suppliers, seed)
+    if fmt == "xlsx":
+        source = case_dir / "bench.xlsx"
+        write_workbook(source, achats, exports)
+    else:
+        source = {"achats": case_dir / "achats.csv", "exports": case_dir / "exports.csv"}
+        write_csv(source["achats"], achats, "2020/2021")
+        write_csv(source["exports"], exports)
+    del achats, exports
+    generation = time.perf_counter() - start
+
+    results = []
+    for name, func, before in _stages(app, source, case_dir / "store"):
+        seconds, peak_mb = measure(func, memory, before, repeat)
+        results.append({"stage": name, "seconds": round(seconds, 4),
+                        "peak_mb": round(peak_mb, 2) if peak_mb is not None else None})
+        print(f"  {name:<24} {seconds:9.3f} s" + (f"  {peak_mb:9.1f} Mo" if peak_mb is not None else ""))
+    _clear_caches()
+    return {"rows": n_rows, "exporters": n_exporters, "suppliers": n_suppliers, "format": fmt,
+            "generation_seconds": round(generation, 2), "stages": results}
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _metadata(memory, repeat):
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "tracemalloc": memory,
+        "repeat": repeat,
+    }
+
+
+def compare_reports(previous, current):
+    """Ratios de temps (actuel / précédent) pour les étapes communes aux deux rapports"""
+    def index(report):
+        return {(run["rows"], run["exporters"], run["suppliers"], run["format"], stage["stage"]): stage
+                for run in report["runs"] for stage in run["stages"]}
+
+    before, after = index(previous), index(current)
+    rows = []
+    for key in after:
+        if key in before and before[key]["seconds"]:
+            rows.append({
+                "rows": key[0], "exporters": key[1], "suppliers": key[2], "format": key[3], "stage": key[4],
+                "before_s": before[key]["seconds"], "after_s": after[key]["seconds"],
+                "ratio": round(after[key]["seconds"] / before[key]["seconds"], 3),
+            })
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesure du chargement et des calculs sur des classeurs synthétiques")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="Nombres de lignes d'achat (10^3 à 10^7)")
+    parser.add_argument("--exporters", type=int, nargs="+", default=DEFAULT_EXPORTERS, help="Nombres d'exportateurs")
+    parser.add_argument("--suppliers", type=int, nargs="+", default=DEFAULT_SUPPLIERS, help="Nombres de fournisseurs")
+    parser.add_argument("--format", choices=["auto", "xlsx", "csv"], default="auto",
+                        help="Format des données générées (auto : xlsx sous la limite d'Excel, csv au-delà)")
+    parser.add_argument("--repeat", type=int, default=1, help="Exécutions par étape (le meilleur temps est retenu)")
+    parser.add_argument("--no-memory", action="store_true", help="Ne pas mesurer le pic mémoire (deux fois plus rapide)")
+    parser.add_argument("--workdir", default=None, help="Dossier des fichiers générés (temporaire par défaut)")
+    parser.add_argument("--output", default="benchmark_report.json", help="Rapport JSON")
+    parser.add_argument("--compare", default=None, help="Rapport précédent à comparer")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="cacao_bench_"))
+    # Caches et stock dans le dossier de travail, jamais dans ceux de l'application
+    os.environ["CACAO_CACHE_DIR"] = str(workdir / "cache")
+    os.environ["CACAO_LOG_DIR"] = str(workdir / "logs")
+    sys.modules["streamlit"] = make_streamlit_stub()
+    import analyse_cacao as app
+
+    memory = not args.no_memory
+    report = {"meta": _metadata(memory, args.repeat), "runs": []}
+    for n_rows, n_exporters, n_suppliers in itertools.product(args.rows, args.exporters, args.suppliers):
+        fmt = args.format
+        if fmt == "auto":
+            fmt = "xlsx" if n_rows <= XLSX_MAX_ROWS else "csv"
+        elif fmt == "xlsx" and n_rows > XLSX_MAX_ROWS:
+            parser.error(f"{n_rows} lignes dépassent la limite d'une feuille Excel ({XLSX_MAX_ROWS})")
+        print(f"{n_rows} lignes, {n_exporters} exportateurs, {n_suppliers} fournisseurs ({fmt})")
+        report["runs"].append(run_case(app, workdir, n_rows, n_exporters, n_suppliers, fmt, memory,
+                                        args.seed, args.repeat))
+
+    Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"Rapport écrit dans {args.output}")
+
+    if args.compare:
+        comparison = compare_reports(json.loads(Path(args.compare).read_text()), report)
+        if len(comparison):
+            print(comparison.to_string(index=False))
+        else:
+            print("Aucune étape commune avec le rapport précédent")
+
+
+if __name__ == "__main__":
+    main()
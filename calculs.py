@@ -0,0 +1,113 @@
+"""
+Calculs vectorisés (NumPy) pour les onglets d'analyse
+
+Remplace les apply(axis=1) / iterrows ligne à ligne : écarts en %, statut
+des écarts, port principal, préférence portuaire, et mise en forme des
+colonnes affichées (séparateur de milliers, pourcentages) colonne entière.
+"""
+import numpy as np
+import pandas as pd
+
+# Seuils de statut des écarts (en % du volume acheté)
+SEUIL_ECART_IMPORTANT = 5
+
+STATUTS_ECART = ["Excédent Important", "Excédent Normal", "Déficit Modéré"]
+STATUT_ECART_DEFAUT = "Déficit Important"
+
+
+def _as_series(values, index=None):
+    if isinstance(values, pd.Series):
+        return values
+    return pd.Series(values, index=index)
+
+
+def pourcentage_ecart(ecart, volume):
+    """Écart en % du volume acheté ; 0 quand le volume acheté est nul"""
+    ecart = _as_series(ecart)
+    volume = np.asarray(volume, dtype=float)
+    ecart_values = np.asarray(ecart, dtype=float)
+    pct = np.zeros(len(ecart_values))
+    np.divide(ecart_values * 100, volume, out=pct, where=volume > 0)
+    return pd.Series(pct, index=ecart.index)
+
+
+def statut_ecart(pct):
+    """Statut d'un écart : excédent important / normal, déficit modéré / important"""
+    pct = _as_series(pct)
+    values = np.asarray(pct, dtype=float)
+    conditions = [
+        values > SEUIL_ECART_IMPORTANT,
+        values > 0,
+        values > -SEUIL_ECART_IMPORTANT,
+    ]
+    return pd.Series(np.select(conditions, STATUTS_ECART, STATUT_ECART_DEFAUT), index=pct.index)
+
+
+def port_principal(ports):
+    """Port de plus gros volume par ligne (premier en cas d'égalité, comme idxmax)"""
+    values = ports.to_numpy(dtype=float)
+    positions = values.argmax(axis=1)
+    return pd.DataFrame({
+        'Port Principal': np.asarray(ports.columns)[positions],
+        'Volume': values[np.arange(len(values)), positions],
+    }, index=ports.index)
+
+
+def preference_port(abidjan, san_pedro, interieur):
+    """Port strictement majoritaire parmi ABIDJAN / SAN PEDRO / INTÉRIEUR, sinon MIXTE"""
+    abidjan = _as_series(abidjan)
+    abj = np.asarray(abidjan, dtype=float)
+    sp = np.asarray(san_pedro, dtype=float)
+    interieur = np.asarray(interieur, dtype=float)
+    conditions = [
+        (abj > sp) & (abj > interieur),
+        (sp > abj) & (sp > interieur),
+        (interieur > abj) & (interieur > sp),
+    ]
+    return pd.Series(np.select(conditions, ['ABIDJAN', 'SAN PEDRO', 'INTÉRIEUR'], 'MIXTE'), index=abidjan.index)
+
+
+def format_number_column(values):
+    """Version colonne de format_number : partie entière avec espace comme séparateur de milliers
+
+    Les groupes de 3 chiffres sont construits par passes NumPy successives
+    (une passe par groupe) plutôt qu'un formatage Python cellule par cellule.
+    """
+    values = _as_series(values)
+    if len(values) == 0:
+        # np.char.zfill échoue sur un tableau vide
+        return pd.Series([], index=values.index, dtype=object)
+    numbers = np.asarray(values, dtype=float)
+    finite = np.isfinite(numbers)
+    ints = np.trunc(np.where(finite, numbers, 0)).astype(np.int64)
+
+    remaining = np.abs(ints)
+    formatted = None
+    active = np.ones(len(ints), dtype=bool)
+    while True:
+        group = (remaining % 1000).astype(str)
+        remaining = remaining // 1000
+        more = remaining > 0
+        group = np.where(more, np.char.zfill(group, 3), group)
+        if formatted is None:
+            formatted = group
+        else:
+            formatted = np.where(active, np.char.add(np.char.add(group, " "), formatted), formatted)
+        active = more
+        if not active.any():
+            break
+
+    formatted = np.where(ints < 0, np.char.add("-", formatted), formatted)
+    formatted = np.where(finite, formatted, numbers.astype(str))
+    return pd.Series(formatted, index=values.index, dtype=object)
+
+
+def format_percent_column(values, decimals=None):
+    """Pourcentages d'une colonne : f"{x}%" par défaut, f"{x:.{decimals}f}%" si decimals est donné"""
+    values = _as_series(values)
+    numbers = np.asarray(values, dtype=float)
+    if decimals is None:
+        text = numbers.astype(str)
+    else:
+        text = np.char.mod(f"%.{decimals}f", numbers)
+    return pd.Series(np.char.add(text, "%"), index=values.index, dtype=object)
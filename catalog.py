@@ -0,0 +1,260 @@
+"""
+Catalogue des saisons disponibles dans Master_Data/
+
+Chaque classeur contenant une feuille « dB ACHAT » est une saison. Les
+saisons sont découvertes sans être chargées, à nouveau dès qu'un classeur
+est ajouté, renommé ou supprimé dans Master_Data/ ; une saison n'est lue qu'à sa
+première demande, et les saisons les moins récemment utilisées sont
+évincées dès que la mémoire occupée dépasse le budget configuré.
+
+Le catalogue est partagé par toutes les sessions (st.cache_resource) : une
+saison n'existe qu'en un exemplaire par processus. Un classeur est lu hors
+du verrou du catalogue, sous un verrou propre à sa saison : sa lecture ne
+bloque pas les sessions qui consultent d'autres saisons. Chaque appel reçoit une
+vue (copie superficielle) des frames résidentes ; avec le copy-on-write de
+pandas, une modification faite sur une vue ne touche jamais l'exemplaire
+partagé.
+"""
+import json
+import os
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from xml.etree import ElementTree
+
+import openpyxl
+
+from data_cache import SNAPSHOT_DIR
+from data_loader import SHEET_ACHAT, SHEET_EXPORT, load_sheets
+from entity_resolution import MAPPING_FILE, add_canonical_columns, get_resolver
+from incremental import IncrementalDataset
+from ingestion import ColumnStore
+
+DATA_DIR = Path("Master_Data")
+
+# Budget mémoire des saisons chargées (Mo), configurable par variable d'environnement
+DEFAULT_MEMORY_BUDGET_MB = int(os.environ.get("CACAO_MEMORY_BUDGET_MB", "1024"))
+
+_LABELS_FILE = SNAPSHOT_DIR / "seasons.json"
+_SEASON_IN_NAME = re.compile(r"(20\d{2})\D?(20\d{2})")
+_SPREADSHEET_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+
+@dataclass(frozen=True)
+class Season:
+    """Une saison = un classeur d'achats, ou un jeu de données du stock colonnaire (source='store')"""
+    label: str
+    path: Path
+    source: str = "xlsx"
+
+
+def _file_signature(path):
+    stat = path.stat()
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _sheet_names(path):
+    """Noms des feuilles lus dans xl/workbook.xml, sans charger le classeur"""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            root = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    except (zipfile.BadZipFile, KeyError, OSError, ElementTree.ParseError):
+        return []
+    return [sheet.get("name") for sheet in root.iter(f"{_SPREADSHEET_NS}sheet")]
+
+
+def _label_from_workbook(path):
+    """Libellé de saison : années du nom de fichier, sinon cellule A1 de dB ACHAT (ex. « 2020/2021 »)"""
+    match = _SEASON_IN_NAME.search(path.stem)
+    if match:
+        return f"{match.group(1)}-{match.group(2)}"
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        first_row = next(wb[SHEET_ACHAT].iter_rows(min_row=1, max_row=1, values_only=True), ())
+    finally:
+        wb.close()
+    label = first_row[0] if first_row else None
+    return str(label).replace("/", "-") if label else path.stem
+
+
+def _load_labels():
+    try:
+        return json.loads(_LABELS_FILE.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_labels(labels):
+    try:
+        _LABELS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        _LABELS_FILE.write_text(json.dumps(labels, ensure_ascii=False, indent=2))
+    except OSError:
+        pass
+
+
+def discover_seasons(data_dir=DATA_DIR):
+    """Liste les saisons (plus récente d'abord) ; les libellés sont mémorisés par (mtime, taille)"""
+    labels = _load_labels()
+    changed = False
+    seasons = []
+    used = set()
+    for path in sorted(Path(data_dir).glob("*.xlsx")):
+        if path.name.startswith("~$"):
+            continue
+        signature = _file_signature(path)
+        cached = labels.get(str(path))
+        if cached and cached.get("signature") == signature:
+            label = cached.get("label")
+        else:
+            label = _label_from_workbook(path) if SHEET_ACHAT in _sheet_names(path) else None
+            labels[str(path)] = {"signature": signature, "label": label}
+            changed = True
+        if label:
+            # Deux classeurs de même libellé : le second est distingué par son nom de fichier
+            if label in used:
+                label = f"{label} ({path.stem})"
+            used.add(label)
+            seasons.append(Season(label, path))
+    if changed:
+        _save_labels(labels)
+    return sorted(seasons, key=lambda season: season.label, reverse=True)
+
+
+def _views(frames):
+    """Vues sans copie des frames résidentes (les écritures éventuelles copient la colonne touchée)"""
+    return tuple(df.copy(deep=False) if df is not None else None for df in frames)
+
+
+def _frames_memory(frames):
+    return sum(int(df.memory_usage(index=True, deep=True).sum()) for df in frames if df is not None)
+
+
+class DatasetCatalog:
+    """Saisons chargées à la demande, avec éviction LRU sous un budget mémoire"""
+
+    def __init__(self, data_dir=DATA_DIR, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, store=None):
+        self.data_dir = Path(data_dir)
+        self.store = store or ColumnStore()
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self._seasons = None
+        self._seasons_signature = None
+        self._loaded = OrderedDict()
+        self._lock = threading.RLock()
+        self._season_locks = {}
+
+    def _sources_signature(self):
+        """mtime de Master_Data/ et du stock : change dès qu'un classeur ou un jeu est ajouté, renommé ou supprimé"""
+        return tuple(path.stat().st_mtime_ns if path.exists() else None for path in (self.data_dir, self.store.root))
+
+    def seasons(self, refresh=False):
+        """Saisons disponibles (redécouvertes si Master_Data/ ou le stock a changé, ou si refresh)"""
+        with self._lock:
+            signature = self._sources_signature()
+            if self._seasons is None or refresh or signature != self._seasons_signature:
+                seasons = {season.label: season for season in discover_seasons(self.data_dir)}
+                # Jeux ingérés par blocs (ingestion.py) ; suffixe en cas d'homonymie avec un classeur
+                for dataset in self.store.datasets():
+                    label = dataset if dataset not in seasons else f"{dataset} (stock)"
+                    seasons[label] = Season(label, self.store.root / dataset, source="store")
+                previous = self._seasons or {}
+                self._seasons = dict(sorted(seasons.items(), reverse=True))
+                self._seasons_signature = signature
+                # Saisons disparues, ou dont le libellé désigne désormais une autre source
+                for label in list(self._loaded):
+                    if self._seasons.get(label) != previous.get(label):
+                        del self._loaded[label]
+            return list(self._seasons.values())
+
+    def season(self, label):
+        """Saison correspondant à un libellé, ou None"""
+        with self._lock:
+            self.seasons()
+            return self._seasons.get(label)
+
+    def get(self, label):
+        """(achats, exports) d'une saison, chargés au premier appel ; vues de l'exemplaire partagé
+
+        exports vaut None quand la saison n'a pas de feuille dB EXPORT. La
+        lecture se fait hors du verrou du catalogue, sous un verrou propre à
+        la saison : les autres sessions continuent d'obtenir les saisons
+        résidentes pendant qu'un classeur est lu.
+        """
+        with self._lock:
+            season, signature, frames = self._resident(label)
+            if frames is not None:
+                return frames
+            season_lock = self._season_locks.setdefault(label, threading.Lock())
+
+        with season_lock:
+            # Une autre session a pu charger la saison pendant l'attente du verrou
+            with self._lock:
+                season, signature, frames = self._resident(label)
+                if frames is not None:
+                    return frames
+                previous = self._loaded[label][0] if label in self._loaded else None
+
+            frames = self.load_frames(season, previous)
+
+            with self._lock:
+                # Saison retirée ou remplacée pendant la lecture : les frames ne sont pas conservées
+                if self._seasons.get(label) == season:
+                    self._loaded[label] = (frames, _frames_memory(frames), signature)
+                    self._loaded.move_to_end(label)
+                    self._evict(keep=label)
+            return _views(frames)
+
+    def _resident(self, label):
+        """(saison, signature, vues des frames résidentes à jour ou None) ; appelé sous self._lock"""
+        season = self.season(label)
+        if season is None:
+            raise KeyError(f"Saison inconnue: {label}")
+        # Un classeur (ou un stock) modifié sur disque est rechargé
+        signature = self.signature(season)
+        if label in self._loaded and self._loaded[label][2] == signature:
+            self._loaded.move_to_end(label)
+            return season, signature, _views(self._loaded[label][0])
+        return season, signature, None
+
+    def signature(self, season):
+        """Signature de la source d'une saison : change dès que le classeur ou le stock est modifié"""
+        if season.source == "store":
+            return "|".join(self.store.version(season.path.name, sheet) for sheet in (SHEET_ACHAT, SHEET_EXPORT))
+        return _file_signature(season.path)
+
+    def load_frames(self, season, previous=None):
+        """Lit (achats, exports) d'une saison sans passer par le cache du catalogue
+
+        previous : frames déjà lues de la saison (un stock ne relit alors que ses nouvelles parties).
+        """
+        if season.source == "store":
+            # Stock alimenté par ajouts : seules les nouvelles parties sont relues et agrégées
+            achats, exports = IncrementalDataset(season.path.name, self.store).load(previous)
+        else:
+            # dB EXPORT est facultative : sans elle, les vues d'écarts et de ports l'indiquent
+            sheet_names = [name for name in (SHEET_ACHAT, SHEET_EXPORT)
+                           if name == SHEET_ACHAT or name in _sheet_names(season.path)]
+            sheets = load_sheets(season.path, sheet_names)
+            achats, exports = sheets[SHEET_ACHAT], sheets.get(SHEET_EXPORT)
+        # Fournisseurs / exportateurs canoniques (Coops_Entity_Mappings.xlsx)
+        resolver = get_resolver(self.data_dir / MAPPING_FILE.name)
+        return add_canonical_columns(achats, resolver), add_canonical_columns(exports, resolver)
+
+    def loaded(self):
+        """Saisons actuellement en mémoire (de la moins à la plus récemment utilisée)"""
+        with self._lock:
+            return list(self._loaded)
+
+    def memory_used(self):
+        with self._lock:
+            return sum(size for _, size, _ in self._loaded.values())
+
+    def _evict(self, keep):
+        """Évince les saisons les moins récemment utilisées jusqu'à repasser sous le budget"""
+        while self.memory_used() > self.memory_budget and len(self._loaded) > 1:
+            oldest = next(iter(self._loaded))
+            if oldest == keep:
+                break
+            del self._loaded[oldest]
@@ -0,0 +1,251 @@
+"""
+Comparaison de plusieurs saisons : volumes, ports et rotation des fournisseurs
+
+Chaque saison est réduite à des agrégats compacts (par exportateur et par
+paire exportateur × fournisseur) sur les noms canoniques (entity_resolution)
+quand ils existent : un même exportateur ou fournisseur écrit différemment
+d'une saison à l'autre tombe sur la même clé.
+
+Les saisons déjà en mémoire dans le catalogue sont agrégées sur place. Les
+autres sont lues et agrégées en parallèle dans un pool de processus : le
+décodage openpyxl d'un classeur n'occupe qu'un cœur, et seuls les agrégats
+(quelques milliers de lignes) reviennent au processus principal. Avec un
+cœur par saison, comparer cinq saisons coûte à peu près la lecture de la
+plus grosse. Les processus écrivent au passage les instantanés Arrow des
+classeurs lus (data_cache) : ouvrir ensuite une de ces saisons est immédiat.
+
+Les agrégats sont mémorisés par (saison, signature de sa source).
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from aggregations import COL_EXPORTATEUR, COL_FOURNISSEUR, COL_TOTAL_EXPORTE, COL_VOLUME, PORT_COLS, _VersionCache
+from calculs import format_number_column, format_percent_column
+from entity_resolution import CANONICAL_COLS
+
+COL_SAISON = 'Saison'
+COL_EXPORTATEUR_CANONIQUE = CANONICAL_COLS[COL_EXPORTATEUR][1]
+COL_FOURNISSEUR_CANONIQUE = CANONICAL_COLS[COL_FOURNISSEUR][1]
+COL_PART_SP = '% SAN PEDRO'
+
+# Nombre maximal de saisons comparées à la fois
+MAX_SAISONS = 5
+
+
+@dataclass(frozen=True)
+class SeasonAggregates:
+    """Agrégats d'une saison sur les clés canoniques
+
+    exportateurs : exportateur -> volume acheté, achats par port, nb fournisseurs,
+                   exports ABIDJAN / SAN PEDRO / total (NaN sans dB EXPORT exploitable)
+    paires       : (exportateur, fournisseur) -> volume acheté
+    """
+    label: str
+    exportateurs: pd.DataFrame
+    paires: pd.Series
+
+
+def _cle(df, canonique, brute):
+    """Colonne de regroupement : nom canonique si la feuille en a un, sinon nom brut (en chaînes)"""
+    return df[canonique if canonique in df.columns else brute].astype(str)
+
+
+def aggregate_season(label, achats, exports=None):
+    """Agrégats comparables d'une saison chargée (achats, exports)"""
+    exportateurs_achats = _cle(achats, COL_EXPORTATEUR_CANONIQUE, COL_EXPORTATEUR).rename(COL_EXPORTATEUR)
+    fournisseurs = _cle(achats, COL_FOURNISSEUR_CANONIQUE, COL_FOURNISSEUR).rename(COL_FOURNISSEUR)
+    paires = achats[COL_VOLUME].astype(np.float64).groupby([exportateurs_achats, fournisseurs]).sum()
+
+    exportateurs = achats[[COL_VOLUME] + PORT_COLS].astype(np.float64).groupby(exportateurs_achats).sum()
+    exportateurs['Nb Fournisseurs'] = paires.groupby(level=COL_EXPORTATEUR).size()
+
+    colonnes_export = {'ABIDJAN': 'Export ABIDJAN', 'SAN PEDRO': 'Export SAN PEDRO', COL_TOTAL_EXPORTE: COL_TOTAL_EXPORTE}
+    if exports is not None and COL_EXPORTATEUR in exports.columns and set(colonnes_export) <= set(exports.columns):
+        cles = _cle(exports, COL_EXPORTATEUR_CANONIQUE, COL_EXPORTATEUR).rename(COL_EXPORTATEUR)
+        volumes_export = exports[list(colonnes_export)].astype(np.float64).groupby(cles).sum()
+        exportateurs = exportateurs.join(volumes_export.rename(columns=colonnes_export), how='outer')
+        exportateurs[[COL_VOLUME, 'Nb Fournisseurs'] + PORT_COLS] = \
+            exportateurs[[COL_VOLUME, 'Nb Fournisseurs'] + PORT_COLS].fillna(0)
+    else:
+        exportateurs = exportateurs.assign(**{col: np.nan for col in colonnes_export.values()})
+    exportateurs['Nb Fournisseurs'] = exportateurs['Nb Fournisseurs'].fillna(0).astype(np.int64)
+    return SeasonAggregates(label, exportateurs, paires)
+
+
+def _aggregate_workbook(args):
+    """Tâche d'un processus du pool : charge une saison (classeur ou stock) et renvoie ses agrégats"""
+    from catalog import DatasetCatalog
+    from ingestion import ColumnStore
+
+    season, data_dir, store_root = args
+    achats, exports = DatasetCatalog(data_dir, store=ColumnStore(store_root)).load_frames(season)
+    return aggregate_season(season.label, achats, exports)
+
+
+_agregats = _VersionCache(size=16)
+
+
+def load_aggregates(catalog, labels, workers=None):
+    """Agrégats des saisons demandées, dans l'ordre de labels
+
+    Saisons en mémoire dans le catalogue : agrégées sur place ; autres saisons :
+    chargées et agrégées en parallèle (un processus par saison, au plus workers).
+    """
+    seasons = [catalog.season(label) for label in labels]
+    inconnues = [label for label, season in zip(labels, seasons) if season is None]
+    if inconnues:
+        raise KeyError(f"Saison inconnue: {', '.join(inconnues)}")
+    cles = {season.label: (season.label, catalog.signature(season)) for season in seasons}
+
+    resultats = {}
+    a_lire = []
+    charges = set(catalog.loaded())
+    for season in seasons:
+        resultats[season.label] = _agregats.get(cles[season.label])
+        if resultats[season.label] is not None:
+            continue
+        if season.label in charges:
+            achats, exports = catalog.get(season.label)
+            resultats[season.label] = _agregats.get_or_build(
+                cles[season.label], lambda: aggregate_season(season.label, achats, exports))
+        else:
+            a_lire.append(season)
+
+    taches = [(season, catalog.data_dir, catalog.store.root) for season in a_lire]
+    workers = min(workers or os.cpu_count() or 1, len(taches))
+    if workers <= 1:
+        lus = [_aggregate_workbook(tache) for tache in taches]
+    else:
+        # spawn : un fork du serveur Streamlit (multithreadé, verrous du catalogue) peut se bloquer
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            lus = list(pool.map(_aggregate_workbook, taches))
+    for agregats in lus:
+        resultats[agregats.label] = _agregats.get_or_build(cles[agregats.label], lambda: agregats)
+    return [resultats[label] for label in labels]
+
+
+@dataclass(frozen=True)
+class ComparaisonSaisons:
+    """Tables de comparaison de saisons (ordre chronologique) et leurs versions formatées
+
+    Les colonnes Δ comparent les deux dernières saisons ; la rotation compare
+    chaque saison à la précédente.
+    """
+    version: str
+    saisons: list
+    volumes: pd.DataFrame             # exportateur × saison (kg achetés), Δ kg, % Δ
+    ports: pd.DataFrame               # exportateur × saison (% SAN PEDRO des exports ABJ + SP), Δ points
+    marche_ports: pd.DataFrame        # saison -> exports ABIDJAN, SAN PEDRO, % SAN PEDRO
+    rotation: pd.DataFrame            # (saison, exportateur) -> fournisseurs avant / après, conservés, nouveaux, perdus
+    rotation_globale: pd.DataFrame    # saison -> fournisseurs, nouveaux, perdus (tous exportateurs confondus)
+    tableau_volumes: pd.DataFrame
+    tableau_ports: pd.DataFrame
+    tableau_rotation: pd.DataFrame
+
+
+def _part_san_pedro(abidjan, san_pedro):
+    total = abidjan + san_pedro
+    return (san_pedro / total * 100).where(total > 0)
+
+
+def _rotation(avant, apres, niveau=None):
+    """Fournisseurs conservés, nouveaux et perdus entre deux index de paires (par exportateur si niveau)"""
+    if niveau is None:
+        avant = avant.get_level_values(COL_FOURNISSEUR).unique()
+        apres = apres.get_level_values(COL_FOURNISSEUR).unique()
+    presence = pd.concat([pd.Series(True, index=avant, name='avant'), pd.Series(True, index=apres, name='apres')],
+                         axis=1).fillna(False).astype(bool)
+    indicateurs = pd.DataFrame({
+        'Fournisseurs N-1': presence['avant'],
+        'Fournisseurs': presence['apres'],
+        'Conservés': presence['avant'] & presence['apres'],
+        'Nouveaux': presence['apres'] & ~presence['avant'],
+        'Perdus': presence['avant'] & ~presence['apres'],
+    }).astype(np.int64)
+    return indicateurs.groupby(level=niveau).sum() if niveau is not None else indicateurs.sum()
+
+
+def compare_aggregates(agregats, version=""):
+    """Tables de comparaison depuis les agrégats de saisons donnés dans l'ordre chronologique"""
+    saisons = [a.label for a in agregats]
+
+    volumes = pd.concat({a.label: a.exportateurs[COL_VOLUME] for a in agregats}, axis=1).fillna(0)
+    ports = pd.concat({a.label: _part_san_pedro(a.exportateurs['Export ABIDJAN'], a.exportateurs['Export SAN PEDRO'])
+                       for a in agregats}, axis=1)
+    marche_ports = pd.DataFrame({
+        'ABIDJAN': [a.exportateurs['Export ABIDJAN'].sum(min_count=1) for a in agregats],
+        'SAN PEDRO': [a.exportateurs['Export SAN PEDRO'].sum(min_count=1) for a in agregats],
+    }, index=pd.Index(saisons, name=COL_SAISON))
+    marche_ports[COL_PART_SP] = _part_san_pedro(marche_ports['ABIDJAN'], marche_ports['SAN PEDRO'])
+
+    rotations = {}
+    globale = {}
+    if len(agregats) >= 2:
+        precedente, derniere = saisons[-2], saisons[-1]
+        delta = volumes[derniere] - volumes[precedente]
+        volumes['Δ (kg)'] = delta
+        volumes['% Δ'] = (delta / volumes[precedente] * 100).where(volumes[precedente] > 0)
+        ports['Δ (points)'] = ports[derniere] - ports[precedente]
+        for avant, apres in zip(agregats, agregats[1:]):
+            rotation = _rotation(avant.paires.index, apres.paires.index, niveau=COL_EXPORTATEUR)
+            # Part du volume de la saison achetée à des fournisseurs nouveaux pour l'exportateur
+            nouveaux = ~apres.paires.index.isin(avant.paires.index)
+            volume_nouveaux = apres.paires[nouveaux].groupby(level=COL_EXPORTATEUR).sum()
+            volume = apres.paires.groupby(level=COL_EXPORTATEUR).sum()
+            rotation['% Rotation'] = (rotation['Perdus'] / rotation['Fournisseurs N-1'] * 100).where(
+                rotation['Fournisseurs N-1'] > 0)
+            rotation['% Volume nouveaux'] = (volume_nouveaux.reindex(rotation.index, fill_value=0) /
+                                             volume.reindex(rotation.index) * 100).where(volume.reindex(rotation.index) > 0)
+            rotations[apres.label] = rotation
+            globale[apres.label] = _rotation(avant.paires.index, apres.paires.index)
+    volumes = volumes.sort_values(saisons[-1], ascending=False, kind='stable')
+    ports = ports.reindex(volumes.index).dropna(how='all')
+    rotation = (pd.concat(rotations, names=[COL_SAISON, COL_EXPORTATEUR]) if rotations
+                else pd.DataFrame(columns=['Fournisseurs N-1', 'Fournisseurs', 'Conservés', 'Nouveaux', 'Perdus',
+                                           '% Rotation', '% Volume nouveaux']))
+    rotation_globale = pd.DataFrame(globale).T.rename_axis(COL_SAISON) if globale else pd.DataFrame()
+
+    tableau_volumes = volumes.copy()
+    for col in tableau_volumes.columns:
+        tableau_volumes[col] = (format_percent_column(tableau_volumes[col].round(1)) if col == '% Δ'
+                                else format_number_column(tableau_volumes[col]))
+    tableau_ports = ports.round(1)
+    tableau_rotation = rotation.round(1)
+    if len(rotation):
+        tableau_rotation = tableau_rotation.sort_values([COL_SAISON, 'Perdus'], ascending=[False, False], kind='stable')
+
+    return ComparaisonSaisons(
+        version=version,
+        saisons=saisons,
+        volumes=volumes,
+        ports=ports,
+        marche_ports=marche_ports,
+        rotation=rotation,
+        rotation_globale=rotation_globale,
+        tableau_volumes=tableau_volumes,
+        tableau_ports=tableau_ports,
+        tableau_rotation=tableau_rotation,
+    )
+
+
+_comparaisons = _VersionCache()
+
+
+def compare_seasons(catalog, labels, workers=None):
+    """Comparaison des saisons demandées (ordre chronologique des libellés), mémorisée par sources"""
+    labels = sorted(labels)
+    seasons = [catalog.season(label) for label in labels]
+    version = "|".join(f"{label}={catalog.signature(season) if season else None}" for label, season in zip(labels, seasons))
+    return _comparaisons.get_or_build(
+        version, lambda: compare_aggregates(load_aggregates(catalog, labels, workers), version))
+
+
+def clear_caches():
+    """Vide les agrégats et comparaisons mémorisés (mesures de performance à froid)"""
+    for cache in (_agregats, _comparaisons):
+        cache.clear()
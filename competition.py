@@ -0,0 +1,196 @@
+"""
+Graphe de concurrence entre exportateurs (fournisseurs partagés)
+
+Deux exportateurs sont en concurrence lorsqu'ils achètent aux mêmes
+coopératives. Le chevauchement de toutes les paires d'exportateurs se calcule
+par produits de matrices creuses à partir de la matrice fournisseurs ×
+exportateurs (module matrix), sans boucle sur les paires :
+
+- L = matrice des relations (1 par relation, volume nul compris) :
+  Lᵀ L donne le nombre de fournisseurs communs, d'où l'indice de Jaccard
+  communs / (fournisseurs A + fournisseurs B - communs) ;
+- V = matrice des volumes : (Vᵀ L)[a, b] est le volume acheté par A à des
+  fournisseurs qui livrent aussi B. Le chevauchement pondéré par le volume
+  rapporte le volume partagé des deux côtés au volume total de la paire.
+
+Les groupes d'exportateurs en concurrence sont les composantes connexes du
+graphe des paires dont le Jaccard atteint un seuil ; chaque fournisseur est
+rattaché au groupe qui lui achète le plus (grappes de fournisseurs).
+
+Le graphe est construit une fois par version du jeu de données.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from aggregations import COL_EXPORTATEUR, COL_VOLUME, _VersionCache
+from matrix import get_supplier_matrix
+
+# Jaccard minimal pour relier deux exportateurs dans les groupes de concurrence
+SEUIL_JACCARD = 0.15
+TOP_K = 25
+
+COL_EXPORTATEUR_A = 'Exportateur A'
+COL_EXPORTATEUR_B = 'Exportateur B'
+COL_COMMUNS = 'Fournisseurs communs'
+COL_JACCARD = 'Jaccard'
+COL_CHEVAUCHEMENT = 'Chevauchement volume'
+COL_GROUPE = 'Groupe'
+
+
+def _sans_diagonale(matrice):
+    matrice = sparse.coo_matrix(matrice)
+    garde = matrice.row != matrice.col
+    return sparse.csr_matrix((matrice.data[garde], (matrice.row[garde], matrice.col[garde])), shape=matrice.shape)
+
+
+@dataclass(frozen=True)
+class CompetitionGraph:
+    """Chevauchement des fournisseurs entre exportateurs (matrices creuses exportateurs × exportateurs)
+
+    communs  : nombre de fournisseurs communs à chaque paire (diagonale exclue)
+    partages : partages[a, b] = volume acheté par a à des fournisseurs qui livrent aussi b
+    """
+    version: str
+    exportateurs: pd.Index
+    volumes: np.ndarray
+    nb_fournisseurs: np.ndarray
+    communs: sparse.csr_matrix
+    partages: sparse.csr_matrix
+
+    @property
+    def nb_paires(self):
+        """Paires d'exportateurs ayant au moins un fournisseur commun"""
+        return self.communs.nnz // 2
+
+    def jaccard(self):
+        """Indice de Jaccard des ensembles de fournisseurs (creux, symétrique)"""
+        communs = self.communs.tocoo()
+        union = self.nb_fournisseurs[communs.row] + self.nb_fournisseurs[communs.col] - communs.data
+        return sparse.csr_matrix((communs.data / union, (communs.row, communs.col)), shape=communs.shape)
+
+    def jaccard_max(self):
+        """Plus grand Jaccard entre deux exportateurs (0 sans fournisseur commun) : au-delà, aucun groupe"""
+        return float(self.jaccard().max()) if self.communs.nnz else 0.0
+
+    def chevauchement_volume(self):
+        """Part (0 à 1) du volume cumulé de la paire achetée à des fournisseurs communs (creux, symétrique)"""
+        partages = (self.partages + self.partages.T).tocoo()
+        totaux = self.volumes[partages.row] + self.volumes[partages.col]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            data = np.where(totaux > 0, partages.data / totaux, 0.0)
+        return sparse.csr_matrix((data, (partages.row, partages.col)), shape=partages.shape)
+
+    def paires(self):
+        """Paires d'exportateurs concurrents (A plus gros que B), tri par volume partagé décroissant"""
+        communs = sparse.triu(self.communs, k=1).tocoo()
+        a, b = communs.row, communs.col
+        # A est l'exportateur au plus gros volume de la paire
+        inverse = self.volumes[b] > self.volumes[a]
+        a, b = np.where(inverse, b, a), np.where(inverse, a, b)
+        partage_a = np.asarray(self.partages[a, b]).ravel()
+        partage_b = np.asarray(self.partages[b, a]).ravel()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct_a = np.where(self.volumes[a] > 0, partage_a / self.volumes[a] * 100, 0.0)
+            pct_b = np.where(self.volumes[b] > 0, partage_b / self.volumes[b] * 100, 0.0)
+            totaux = self.volumes[a] + self.volumes[b]
+            chevauchement = np.where(totaux > 0, (partage_a + partage_b) / totaux, 0.0)
+        df = pd.DataFrame({
+            COL_EXPORTATEUR_A: self.exportateurs[a],
+            COL_EXPORTATEUR_B: self.exportateurs[b],
+            COL_COMMUNS: communs.data.astype(np.int64),
+            COL_JACCARD: communs.data / (self.nb_fournisseurs[a] + self.nb_fournisseurs[b] - communs.data),
+            COL_CHEVAUCHEMENT: chevauchement,
+            'Volume partagé (kg)': partage_a + partage_b,
+            '% volume A partagé': pct_a,
+            '% volume B partagé': pct_b,
+        })
+        return df.sort_values(['Volume partagé (kg)', COL_JACCARD], ascending=False, kind='stable', ignore_index=True)
+
+    def bloc(self, k=TOP_K, ponderation='volume'):
+        """Chevauchement dense des k plus gros exportateurs (ponderation 'volume' ou 'jaccard')"""
+        valeurs = self.chevauchement_volume() if ponderation == 'volume' else self.jaccard()
+        ordre = np.argsort(-self.volumes, kind='stable')[:k]
+        noms = pd.Index(self.exportateurs[ordre])
+        return pd.DataFrame(valeurs[ordre][:, ordre].toarray(), index=noms.rename(COL_EXPORTATEUR_A),
+                            columns=noms.rename(COL_EXPORTATEUR_B))
+
+    def groupes(self, seuil=SEUIL_JACCARD):
+        """(nombre de groupes, numéro de groupe de chaque exportateur) : composantes connexes à Jaccard ≥ seuil"""
+        jaccard = self.jaccard()
+        jaccard.data[jaccard.data < seuil] = 0
+        jaccard.eliminate_zeros()
+        return connected_components(jaccard, directed=False)
+
+
+def build_competition_graph(matrice):
+    """Graphe de concurrence depuis la matrice fournisseurs × exportateurs"""
+    volumes = matrice.colonnes
+    liens = sparse.csc_matrix((np.ones(volumes.nnz), volumes.indices, volumes.indptr), shape=volumes.shape)
+    return CompetitionGraph(
+        version=matrice.version,
+        exportateurs=matrice.exportateurs,
+        volumes=matrice.volumes_exportateurs(),
+        nb_fournisseurs=matrice.nb_fournisseurs_par_exportateur().astype(np.float64),
+        communs=_sans_diagonale(liens.T @ liens),
+        partages=_sans_diagonale(volumes.T @ liens),
+    )
+
+
+def grappes_fournisseurs(matrice, labels):
+    """Rattachement des fournisseurs aux groupes d'exportateurs
+
+    Chaque fournisseur va au groupe qui lui achète le plus de volume (à défaut,
+    celui où il a le plus de relations). Renvoie (groupe de chaque fournisseur,
+    nombre de groupes auxquels il livre).
+    """
+    appartenance = sparse.csr_matrix((np.ones(len(labels)), (np.arange(len(labels)), labels)),
+                                     shape=(len(labels), labels.max() + 1))
+    lignes = matrice.lignes
+    liens = sparse.csr_matrix((np.ones(lignes.nnz), lignes.indices, lignes.indptr), shape=lignes.shape)
+    volumes = lignes @ appartenance
+    relations = liens @ appartenance
+    a_volume = matrice.volumes_fournisseurs() > 0
+    groupe = np.where(a_volume, np.asarray(volumes.argmax(axis=1)).ravel(), np.asarray(relations.argmax(axis=1)).ravel())
+    return groupe, np.diff(relations.indptr)
+
+
+def resume_groupes(graphe, matrice, seuil=SEUIL_JACCARD):
+    """Un groupe par ligne : exportateurs, fournisseurs rattachés, volume, fournisseurs livrant d'autres groupes"""
+    _, labels = graphe.groupes(seuil)
+    groupe_fournisseur, nb_groupes = grappes_fournisseurs(matrice, labels)
+    volumes_fournisseurs = matrice.volumes_fournisseurs()
+    ordre = np.argsort(-graphe.volumes, kind='stable')
+    exportateurs = pd.DataFrame({COL_GROUPE: labels[ordre], COL_EXPORTATEUR: graphe.exportateurs[ordre],
+                                 COL_VOLUME: graphe.volumes[ordre]})
+    fournisseurs = pd.DataFrame({COL_GROUPE: groupe_fournisseur, COL_VOLUME: volumes_fournisseurs,
+                                 'Multi-groupes': nb_groupes > 1})
+    par_exportateurs = exportateurs.groupby(COL_GROUPE).agg(
+        **{'Nb Exportateurs': (COL_EXPORTATEUR, 'size'),
+           'Principaux exportateurs': (COL_EXPORTATEUR, lambda noms: ", ".join(noms.iloc[:3]))})
+    par_fournisseurs = fournisseurs.groupby(COL_GROUPE).agg(
+        **{'Nb Fournisseurs': (COL_VOLUME, 'size'), COL_VOLUME: (COL_VOLUME, 'sum'),
+           'Fournisseurs multi-groupes': ('Multi-groupes', 'sum')})
+    resume = par_exportateurs.join(par_fournisseurs, how='left').fillna(0)
+    resume = resume.astype({'Nb Fournisseurs': np.int64, 'Fournisseurs multi-groupes': np.int64})
+    resume = resume.sort_values(COL_VOLUME, ascending=False, kind='stable')
+    # Groupes numérotés par volume décroissant
+    resume.index = pd.RangeIndex(1, len(resume) + 1, name=COL_GROUPE)
+    return resume
+
+
+_graphes = _VersionCache()
+
+
+def get_competition_graph(df):
+    """Graphe de concurrence, construit une fois par version du jeu de données"""
+    matrice = get_supplier_matrix(df)
+    return _graphes.get_or_build(matrice.version, lambda: build_competition_graph(matrice))
+
+
+def clear_caches():
+    """Vide les graphes mémorisés (mesures de performance à froid)"""
+    _graphes.clear()
@@ -0,0 +1,205 @@
+"""
+Cache disque des feuilles Excel au format colonnaire (Arrow IPC)
+
+Chaque feuille nettoyée est convertie une seule fois en fichier Arrow non
+compressé, lisible en mémoire projetée (memory-map). Le fichier est identifié
+par l'empreinte SHA256 du classeur source : toute modification du classeur
+produit une nouvelle clé et donc une reconstruction automatique.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Dossier des instantanés (relatif au répertoire de lancement, comme logs/)
+SNAPSHOT_DIR = Path(os.environ.get("CACAO_CACHE_DIR", ".cache")) / "snapshots"
+
+# A incrémenter dès que le nettoyage des feuilles change, pour invalider les instantanés
+SNAPSHOT_FORMAT_VERSION = 2
+
+_HASH_CHUNK = 1024 * 1024
+
+# Attribut DataFrame portant la version du jeu de données (clé des caches d'agrégats)
+DATASET_VERSION_ATTR = "dataset_version"
+
+
+def _slug(text):
+    """Nom de fichier sûr à partir d'un nom de feuille ou de classeur"""
+    return re.sub(r"[^0-9A-Za-z]+", "_", str(text)).strip("_") or "sheet"
+
+
+def _manifest_path(file_path):
+    return SNAPSHOT_DIR / f"{_slug(Path(file_path).name)}.manifest.json"
+
+
+def _hash_file(file_path):
+    """Empreinte SHA256 du contenu du fichier, lue par blocs"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_key(file_path):
+    """Clé du classeur source : SHA256 du contenu, recalculé seulement si mtime/taille changent"""
+    file_path = Path(file_path)
+    stat = file_path.stat()
+    manifest_file = _manifest_path(file_path)
+
+    if manifest_file.exists():
+        try:
+            manifest = json.loads(manifest_file.read_text())
+            if manifest.get("mtime_ns") == stat.st_mtime_ns and manifest.get("size") == stat.st_size:
+                return manifest["sha256"]
+        except (ValueError, KeyError):
+            pass
+
+    sha = _hash_file(file_path)
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    _atomic_write_bytes(manifest_file, json.dumps({
+        "source": str(file_path),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": sha,
+    }).encode())
+    return sha
+
+
+def _atomic_write_bytes(target, payload):
+    """Écrit dans un fichier temporaire puis renomme, pour ne jamais exposer un fichier partiel"""
+    fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def snapshot_path(file_path, sheet_name, key=None):
+    """Chemin de l'instantané Arrow d'une feuille pour une version donnée du classeur"""
+    key = key or source_key(file_path)
+    prefix = f"{_slug(Path(file_path).stem)}__{_slug(sheet_name)}"
+    return SNAPSHOT_DIR / f"{prefix}__v{SNAPSHOT_FORMAT_VERSION}_{key[:16]}.arrow"
+
+
+def read_snapshot(path):
+    """Lit un instantané Arrow en mémoire projetée et le convertit en DataFrame
+
+    Sans consolidation des blocs (split_blocks), les colonnes numériques sans
+    valeur manquante et les codes des catégories restent des vues en lecture
+    seule sur le fichier projeté : aucune copie, pages partagées par les
+    processus qui lisent le même instantané.
+    """
+    table = feather.read_table(path, memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+
+def write_snapshot(df, path):
+    """Écrit un DataFrame en Arrow IPC non compressé (projetable en mémoire)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        feather.write_feather(table, tmp, compression="uncompressed")
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _purge_old_snapshots(current):
+    """Supprime les instantanés périmés de la même feuille du même classeur"""
+    prefix = current.name.split("__v")[0]
+    for old in SNAPSHOT_DIR.glob(f"{prefix}__v*.arrow"):
+        if old != current:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+
+def dataset_version(df):
+    """Version d'un DataFrame chargé : clé du classeur source + feuille + nombre de lignes
+
+    Les frames qui ne viennent pas du chargeur (upload, données synthétiques)
+    sont versionnées par un hachage de leur contenu.
+    """
+    version = df.attrs.get(DATASET_VERSION_ATTR)
+    if version is None:
+        digest = pd.util.hash_pandas_object(df, index=True).to_numpy()
+        version = hashlib.sha256(digest.tobytes() + "|".join(map(str, df.columns)).encode()).hexdigest()[:16]
+    return format_dataset_version(version, len(df))
+
+
+def format_dataset_version(tag, n_rows):
+    """Chaîne de version à partir de l'étiquette d'une frame et de son nombre de lignes"""
+    return f"{tag}:{n_rows}"
+
+
+def _tag_version(df, key, sheet_name):
+    if df is None:
+        return None
+    df.attrs[DATASET_VERSION_ATTR] = f"{key[:16]}:{_slug(sheet_name)}"
+    return df
+
+
+def _try_read_snapshot(path):
+    """Lit un instantané existant, ou None s'il est absent ou corrompu (il sera reconstruit)"""
+    if not path.exists():
+        return None
+    try:
+        return read_snapshot(path)
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+
+def _store_snapshot(df, path):
+    """Met en cache une feuille construite ; le cache est une optimisation, un échec d'écriture est ignoré"""
+    if df is None:
+        return
+    try:
+        write_snapshot(df, path)
+        _purge_old_snapshots(path)
+    except (OSError, pa.ArrowException):
+        pass
+
+
+def load_snapshot(file_path, sheet_name, builder):
+    """Renvoie la feuille depuis l'instantané, ou la construit via builder() et la met en cache"""
+    frames = load_snapshots(file_path, [sheet_name], lambda missing: [(sheet_name, builder())])
+    return frames[sheet_name]
+
+
+def load_snapshots(file_path, sheet_names, builder):
+    """Version multi-feuilles : builder(feuilles_manquantes) produit des paires (nom, DataFrame)
+
+    Les feuilles absentes du cache sont construites ensemble, en un seul passage sur le classeur.
+    """
+    key = source_key(file_path)
+    frames = {}
+    missing = []
+    for name in sheet_names:
+        df = _try_read_snapshot(snapshot_path(file_path, name, key))
+        if df is None:
+            missing.append(name)
+        else:
+            frames[name] = _tag_version(df, key, name)
+
+    if missing:
+        for name, df in builder(missing):
+            _store_snapshot(df, snapshot_path(file_path, name, key))
+            frames[name] = _tag_version(df, key, name)
+
+    return {name: frames[name] for name in sheet_names}
@@ -0,0 +1,132 @@
+"""
+Lecture des classeurs d'achats cacao
+
+Le classeur est ouvert une seule fois en lecture seule (openpyxl read_only) :
+les chaînes partagées sont décodées une fois et chaque feuille demandée est
+parcourue ligne à ligne, puis nettoyée par clean_rows (promotion de la
+ligne d'en-tête, renommages, nettoyage numérique/texte).
+"""
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from data_cache import load_snapshots
+from schema import apply_schema
+
+SHEET_ACHAT = 'dB ACHAT'
+SHEET_EXPORT = 'dB EXPORT'
+
+NUMERIC_COLS = ['Volume livré (kg)', 'ABIDJAN', 'INTERIEUR', 'SAN PEDRO', 'Volume exporté (kg)', 'Total Exporté']
+TEXT_COLS = ['Code fournisseur', 'Nom fournisseur', 'Exportateurs', 'EXPORTATEUR SIMPLE', 'Region activité']
+EXPORT_RENAME_MAP = {
+    'ABJ': 'ABIDJAN',
+    'SP': 'SAN PEDRO',
+    'Total général': 'Total Exporté'
+}
+
+
+def _convert_cell(value):
+    """Même conversion que pandas.read_excel : flottants entiers -> int"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _sheet_rows(ws):
+    """Lignes d'une feuille sans cellules vides de fin de ligne ni lignes vides finales
+
+    Comme pd.read_excel, les lignes vides intermédiaires sont conservées.
+    """
+    rows = []
+    last_filled = 0
+    for row in ws.iter_rows(values_only=True):
+        values = list(row)
+        while values and values[-1] is None:
+            values.pop()
+        rows.append([_convert_cell(v) for v in values])
+        if values:
+            last_filled = len(rows)
+    return rows[:last_filled]
+
+
+def _raw_frame(rows):
+    """DataFrame brut équivalent à pd.read_excel(header=0)"""
+    if not rows:
+        return pd.DataFrame()
+    width = max(len(r) for r in rows) or 1
+    rows = [r + [None] * (width - len(r)) for r in rows]
+    header = [h if h is not None else f"Unnamed: {i}" for i, h in enumerate(rows[0])]
+    df = pd.DataFrame(rows[1:], columns=header)
+    # Les cellules vides deviennent NaN (et non None) comme avec read_excel
+    return df.infer_objects().fillna(np.nan)
+
+
+def clean_rows(df, sheet_name=SHEET_ACHAT):
+    """Nettoie des lignes dont les colonnes sont déjà nommées : renommages, numériques, texte, filtre
+
+    Chaque ligne est traitée indépendamment : la fonction s'applique aussi
+    bien à une feuille entière qu'à un bloc de lignes (ingestion par blocs).
+    """
+    # Pour dB EXPORT, renommer les colonnes pour cohérence
+    if sheet_name == SHEET_EXPORT:
+        df = df.rename(columns=EXPORT_RENAME_MAP)
+        # Ajouter colonne INTERIEUR si elle n'existe pas
+        if 'INTERIEUR' not in df.columns:
+            df['INTERIEUR'] = 0
+
+    # Nettoyer les colonnes numériques
+    for col in NUMERIC_COLS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+
+    # Nettoyer les colonnes texte
+    for col in TEXT_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype(str).replace('nan', 'Non renseigné').fillna('Non renseigné')
+
+    # Pour la feuille ACHAT uniquement: Filtrer les lignes "Non renseigné" (sans copie intermédiaire)
+    if sheet_name == SHEET_ACHAT:
+        df = df.loc[
+            (df['Nom fournisseur'] != 'Non renseigné') &
+            (df['EXPORTATEUR SIMPLE'] != 'Non renseigné')
+        ]
+
+    return df
+
+
+def clean_sheet(df, sheet_name=SHEET_ACHAT):
+    """Nettoie une feuille brute : en-têtes, renommages, colonnes numériques et texte"""
+    # Utiliser la première ligne comme en-têtes de colonnes
+    new_columns = df.iloc[0].astype(str).tolist()
+    df.columns = new_columns
+
+    # Supprimer la première ligne qui contenait les en-têtes
+    df = df.iloc[1:].reset_index(drop=True)
+
+    df = clean_rows(df, sheet_name)
+
+    # Schéma typé : catégories pour les dimensions texte, volumes en entiers ajustés
+    return apply_schema(df)
+
+
+def iter_sheets(file_path, sheet_names):
+    """Ouvre le classeur une fois et produit (nom, DataFrame nettoyé) pour chaque feuille demandée"""
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for name in sheet_names:
+            if name not in wb.sheetnames:
+                raise KeyError(f"Feuille '{name}' absente de {file_path}")
+            yield name, clean_sheet(_raw_frame(_sheet_rows(wb[name])), name)
+    finally:
+        wb.close()
+
+
+def read_sheet(file_path, sheet_name=SHEET_ACHAT):
+    """Lit et nettoie une seule feuille du classeur"""
+    for _, df in iter_sheets(file_path, [sheet_name]):
+        return df
+
+
+def load_sheets(file_path, sheet_names=(SHEET_ACHAT, SHEET_EXPORT)):
+    """Charge plusieurs feuilles : instantanés Arrow si à jour, sinon une seule passe sur le classeur"""
+    return load_snapshots(file_path, list(sheet_names), lambda missing: iter_sheets(file_path, missing))
@@ -0,0 +1,261 @@
+"""
+Résolution des entités (coopératives, exportateurs) à partir de Coops_Entity_Mappings.xlsx
+
+Le fichier de correspondances est lu une fois et compilé en dictionnaires
+indexés par nom normalisé (majuscules, sans accents ni ponctuation). Les noms
+absents des correspondances passent par un rapprochement approché : un index
+de trigrammes ne retient que quelques candidats par nom, départagés par
+difflib, au lieu de comparer toutes les paires. Les correspondances compilées
+et les rapprochements déjà calculés sont conservés dans le cache disque.
+"""
+import json
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from pathlib import Path
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from data_cache import SNAPSHOT_DIR, _atomic_write_bytes, source_key
+
+MAPPING_FILE = Path("Master_Data") / "Coops_Entity_Mappings.xlsx"
+
+SHEET_COOPS = "Coopératives"
+SHEET_EXPORTATEURS = "Exportateurs"
+
+FOURNISSEURS = "fournisseurs"
+EXPORTATEURS = "exportateurs"
+
+# Colonne brute -> (type d'entité, colonne canonique ajoutée)
+CANONICAL_COLS = {
+    'Nom fournisseur': (FOURNISSEURS, 'Fournisseur canonique'),
+    'Exportateurs': (EXPORTATEURS, 'Exportateur canonique'),
+    'EXPORTATEUR SIMPLE': (EXPORTATEURS, 'Exportateur canonique'),
+}
+
+# Similarité difflib minimale pour accepter un rapprochement approché
+FUZZY_THRESHOLD = 0.9
+NGRAM = 3
+MAX_CANDIDATES = 10
+
+# A incrémenter si la normalisation ou le rapprochement change, pour invalider le cache
+RESOLUTION_FORMAT_VERSION = 1
+
+
+def normalize_name(name):
+    """Clé de comparaison : majuscules, sans accents, ponctuation remplacée par des espaces"""
+    text = unicodedata.normalize("NFKD", str(name))
+    text = "".join(c for c in text if not unicodedata.combining(c)).upper()
+    text = "".join(c if c.isalnum() else " " for c in text)
+    return " ".join(text.split())
+
+
+def _ngrams(key, n=NGRAM):
+    padded = f" {key} "
+    return {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+
+
+class FuzzyMatcher:
+    """Rapprochement approché par blocage sur les trigrammes puis similarité difflib"""
+
+    def __init__(self, choices, threshold=FUZZY_THRESHOLD, max_candidates=MAX_CANDIDATES):
+        self.choices = list(choices)
+        self.keys = [normalize_name(choice) for choice in self.choices]
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self._postings = defaultdict(list)
+        for i, key in enumerate(self.keys):
+            for gram in _ngrams(key):
+                self._postings[gram].append(i)
+        # Trigrammes présents dans trop de noms (ex. « COO ») : peu discriminants, ignorés au blocage
+        self._max_postings = max(50, len(self.choices) // 10)
+
+    def candidates(self, key):
+        """Indices des noms partageant le plus de trigrammes avec la clé"""
+        counts = Counter()
+        for gram in _ngrams(key):
+            postings = self._postings.get(gram)
+            if postings and len(postings) <= self._max_postings:
+                counts.update(postings)
+        return [i for i, _ in counts.most_common(self.max_candidates)]
+
+    def match(self, name):
+        """(nom retenu, score) ; nom retenu None si aucun candidat n'atteint le seuil"""
+        key = normalize_name(name)
+        best, best_score = None, 0.0
+        matcher = SequenceMatcher(None, autojunk=False)
+        matcher.set_seq2(key)
+        for i in self.candidates(key):
+            matcher.set_seq1(self.keys[i])
+            # Bornes supérieures bon marché avant le calcul exact
+            if matcher.real_quick_ratio() <= best_score or matcher.quick_ratio() <= best_score:
+                continue
+            score = matcher.ratio()
+            if score > best_score:
+                best, best_score = i, score
+        if best is None or best_score < self.threshold:
+            return None, best_score
+        return self.choices[best], best_score
+
+
+@dataclass
+class EntityMapping:
+    """Correspondances compilées : {type d'entité: {nom normalisé: nom canonique}}"""
+    version: str
+    lookups: dict
+
+    def canonical_names(self, kind):
+        return sorted(set(self.lookups[kind].values()))
+
+
+def _read_mapping_sheet(ws):
+    """Paires (nom, nom simplifié) d'une feuille de correspondances (en-têtes en ligne 1)"""
+    rows = ws.iter_rows(min_row=2, max_col=2, values_only=True)
+    return [(raw, simple) for raw, simple in rows if raw is not None or simple is not None]
+
+
+def _compile(pairs):
+    lookup = {}
+    for raw, simple in pairs:
+        canonical = str(simple if simple is not None else raw).strip()
+        # Les noms simplifiés sont aussi leurs propres clés (ex. « EXPORTATEUR SIMPLE » de dB EXPORT)
+        lookup.setdefault(normalize_name(canonical), canonical)
+        if raw is not None:
+            lookup[normalize_name(raw)] = canonical
+    return lookup
+
+
+def _mapping_cache_path(key):
+    return SNAPSHOT_DIR / f"entity_mapping__v{RESOLUTION_FORMAT_VERSION}_{key[:16]}.json"
+
+
+def load_mapping(path=MAPPING_FILE):
+    """Correspondances compilées du fichier, relues depuis le cache tant que le fichier ne change pas"""
+    key = source_key(path)
+    cache_path = _mapping_cache_path(key)
+    try:
+        return EntityMapping(key, json.loads(cache_path.read_text(encoding="utf-8")))
+    except (OSError, ValueError):
+        pass
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        lookups = {
+            FOURNISSEURS: _compile(_read_mapping_sheet(wb[SHEET_COOPS])),
+            EXPORTATEURS: _compile(_read_mapping_sheet(wb[SHEET_EXPORTATEURS])),
+        }
+    finally:
+        wb.close()
+
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    for old in SNAPSHOT_DIR.glob("entity_mapping__v*.json"):
+        if old != cache_path:
+            old.unlink(missing_ok=True)
+    _atomic_write_bytes(cache_path, json.dumps(lookups, ensure_ascii=False).encode("utf-8"))
+    return EntityMapping(key, lookups)
+
+
+class EntityResolver:
+    """Résout des noms bruts en noms canoniques : correspondance exacte, puis rapprochement approché
+
+    Les noms sans correspondance ni rapprochement restent leur propre entité.
+    """
+
+    def __init__(self, mapping):
+        self.mapping = mapping
+        self._matchers = {}
+        self._lock = threading.Lock()
+        self._cache_path = SNAPSHOT_DIR / f"entity_matches__v{RESOLUTION_FORMAT_VERSION}_{mapping.version[:16]}.json"
+        try:
+            self._matches = json.loads(self._cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._matches = {}
+        self._dirty = False
+
+    def _matcher(self, kind):
+        if kind not in self._matchers:
+            self._matchers[kind] = FuzzyMatcher(self.mapping.canonical_names(kind))
+        return self._matchers[kind]
+
+    def resolve(self, names, kind):
+        """{nom brut: nom canonique} pour des noms distincts"""
+        lookup = self.mapping.lookups[kind]
+        resolved = {}
+        with self._lock:
+            matches = self._matches.setdefault(kind, {})
+            for name in names:
+                key = normalize_name(name)
+                canonical = lookup.get(key)
+                if canonical is None:
+                    if key not in matches:
+                        matches[key], _ = self._matcher(kind).match(name)
+                        self._dirty = True
+                    canonical = matches[key]
+                resolved[name] = canonical if canonical is not None else name
+        return resolved
+
+    def save(self):
+        """Conserve les rapprochements calculés pour les prochains lancements"""
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+                _atomic_write_bytes(self._cache_path, json.dumps(self._matches, ensure_ascii=False).encode("utf-8"))
+                self._dirty = False
+            except OSError:
+                pass
+
+    def canonical_column(self, series, kind):
+        """Colonne canonique catégorielle : seules les valeurs distinctes sont résolues"""
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categories = series.cat.categories
+            codes = series.cat.codes.to_numpy()
+        else:
+            codes, categories = pd.factorize(series)
+        names = [str(c) for c in categories]
+        resolved = self.resolve(names, kind)
+        canonical_categories, canonical_codes = np.unique(np.array([resolved[n] for n in names], dtype=object),
+                                                          return_inverse=True)
+        new_codes = np.full(len(codes), -1, dtype=np.int64)
+        valid = codes >= 0
+        new_codes[valid] = canonical_codes[codes[valid]]
+        return pd.Series(pd.Categorical.from_codes(new_codes, categories=canonical_categories),
+                         index=series.index, name=series.name)
+
+
+_resolvers = {}
+_resolvers_lock = threading.Lock()
+
+
+def get_resolver(path=MAPPING_FILE):
+    """Résolveur partagé pour une version du fichier de correspondances ; None si le fichier est absent"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    key = source_key(path)
+    with _resolvers_lock:
+        if key not in _resolvers:
+            _resolvers.clear()
+            _resolvers[key] = EntityResolver(load_mapping(path))
+        return _resolvers[key]
+
+
+def add_canonical_columns(df, resolver):
+    """Ajoute les colonnes canoniques (fournisseur, exportateur) d'une feuille chargée ; inchangée sans résolveur"""
+    if resolver is None or df is None:
+        return df
+    converted = {}
+    for col, (kind, target) in CANONICAL_COLS.items():
+        if col in df.columns and target not in converted:
+            converted[target] = resolver.canonical_column(df[col], kind)
+    if not converted:
+        return df
+    resolver.save()
+    out = df.assign(**converted)
+    out.attrs = dict(df.attrs)
+    return out
@@ -0,0 +1,182 @@
+"""
+Explorateur des données brutes : filtre, tri et pagination côté serveur
+
+L'onglet Données Brutes n'envoie au navigateur que la page affichée, réduite
+aux colonnes choisies. La recherche textuelle sur les noms de fournisseurs et
+d'exportateurs passe par un index de trigrammes des noms distincts, puis par
+l'index CSR des lignes (aggregations.build_row_index) : aucune comparaison de
+chaînes ligne par ligne. Les ordres de tri de chaque colonne sont calculés
+une fois par version du jeu de données ; une page triée d'un sous-ensemble
+coûte alors O(lignes retenues).
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from aggregations import COL_EXPORTATEUR, COL_FOURNISSEUR, _VersionCache, build_row_index
+from data_cache import dataset_version
+from entity_resolution import NGRAM, _ngrams, normalize_name
+
+# Colonnes couvertes par la recherche textuelle
+COLONNES_RECHERCHE = [COL_FOURNISSEUR, COL_EXPORTATEUR]
+
+PAGE_SIZE = 100
+PAGE_SIZES = [50, 100, 200, 500]
+
+
+class NameSearchIndex:
+    """Recherche par sous-chaîne dans les valeurs distinctes d'une colonne, puis lignes correspondantes"""
+
+    def __init__(self, column):
+        self.lignes = build_row_index(column)
+        self.keys = [normalize_name(valeur) for valeur in self.lignes.valeurs]
+        postings = defaultdict(list)
+        for i, key in enumerate(self.keys):
+            for gram in _ngrams(key):
+                postings[gram].append(i)
+        self._postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+    def valeurs(self, texte):
+        """Numéros des valeurs distinctes contenant le texte (comparaison sans accents ni casse)"""
+        key = normalize_name(texte)
+        if len(key) < NGRAM:
+            return np.array([i for i, k in enumerate(self.keys) if key in k], dtype=np.int64)
+        candidats = None
+        for gram in {key[i:i + NGRAM] for i in range(len(key) - NGRAM + 1)}:
+            ids = self._postings.get(gram)
+            if ids is None:
+                return np.array([], dtype=np.int64)
+            candidats = ids if candidats is None else np.intersect1d(candidats, ids, assume_unique=True)
+        # Les trigrammes communs ne garantissent pas la sous-chaîne : vérification sur les seuls candidats
+        return np.array([i for i in candidats if key in self.keys[i]], dtype=np.int64)
+
+    def positions_valeurs(self, ids):
+        """Positions (iloc, croissantes) des lignes portant ces valeurs"""
+        order, offsets = self.lignes.order, self.lignes.offsets
+        if len(ids) == 0:
+            return order[:0]
+        return np.sort(np.concatenate([order[offsets[i]:offsets[i + 1]] for i in ids]))
+
+    def positions(self, texte):
+        """Positions des lignes dont la valeur contient le texte"""
+        return self.positions_valeurs(self.valeurs(texte))
+
+
+@dataclass(frozen=True)
+class ExplorerIndex:
+    """Index de recherche par colonne d'un jeu de données"""
+    version: str
+    recherche: dict
+
+    def valeurs(self, colonne):
+        """Valeurs distinctes (triées) d'une colonne indexée ; liste vide si absente"""
+        search = self.recherche.get(colonne)
+        return list(search.lignes.valeurs) if search is not None else []
+
+
+@dataclass(frozen=True)
+class PageDonnees:
+    """Une page de lignes brutes et la taille du résultat filtré"""
+    lignes: pd.DataFrame
+    total: int
+    page: int
+    nb_pages: int
+
+
+_explorer_index = _VersionCache()
+_ordres_tri = _VersionCache(size=16)
+_filtres = _VersionCache(size=16)
+
+
+def get_explorer_index(df):
+    """Index de recherche des noms, construit une fois par version du jeu de données"""
+    version = dataset_version(df)
+    return _explorer_index.get_or_build(version, lambda: ExplorerIndex(
+        version, {col: NameSearchIndex(df[col]) for col in COLONNES_RECHERCHE if col in df.columns}))
+
+
+def _ordre_tri(series):
+    """Permutation triant la colonne (ordre alphabétique des catégories, valeurs manquantes en dernier)"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        rangs = np.empty(len(categories), dtype=np.int64)
+        rangs[np.argsort(categories.astype(str), kind='stable')] = np.arange(len(categories))
+        codes = series.cat.codes.to_numpy()
+        keys = np.where(codes >= 0, rangs[codes], len(categories))
+    else:
+        codes, valeurs = pd.factorize(series, sort=True)
+        keys = np.where(codes >= 0, codes, len(valeurs))
+    return np.argsort(keys, kind='stable')
+
+
+def ordre_tri(df, colonne):
+    """(ordre, rang) de tri d'une colonne, mémorisés par (version, colonne)"""
+    def build():
+        ordre = _ordre_tri(df[colonne])
+        rang = np.empty(len(ordre), dtype=np.int64)
+        rang[ordre] = np.arange(len(ordre))
+        return ordre, rang
+    return _ordres_tri.get_or_build((dataset_version(df), colonne), build)
+
+
+def filtrer_positions(df, recherche="", exportateurs=None):
+    """Positions des lignes retenues (croissantes), ou None si aucun filtre
+
+    Mémorisées par filtre : changer de page ou de tri ne refait pas la recherche.
+    """
+    key = (dataset_version(df), normalize_name(recherche or ""), tuple(exportateurs or ()))
+    return _filtres.get_or_build(key, lambda: _filtrer_positions(df, recherche, exportateurs))
+
+
+def _filtrer_positions(df, recherche, exportateurs):
+    index = get_explorer_index(df)
+    positions = None
+    if recherche and normalize_name(recherche):
+        trouvees = [search.positions(recherche) for search in index.recherche.values()]
+        positions = np.unique(np.concatenate(trouvees)) if trouvees else np.array([], dtype=np.int64)
+    if exportateurs and COL_EXPORTATEUR in index.recherche:
+        lignes = index.recherche[COL_EXPORTATEUR].lignes
+        ids = [i for i in lignes.valeurs.get_indexer(exportateurs) if i >= 0]
+        par_exportateur = index.recherche[COL_EXPORTATEUR].positions_valeurs(ids)
+        positions = par_exportateur if positions is None else np.intersect1d(positions, par_exportateur, assume_unique=True)
+    return positions
+
+
+def nb_pages(df, recherche="", exportateurs=None, taille_page=PAGE_SIZE):
+    """Nombre de pages du filtre (au moins 1)"""
+    positions = filtrer_positions(df, recherche, exportateurs)
+    total = len(df) if positions is None else len(positions)
+    return max(1, -(-total // taille_page))
+
+
+def page_donnees(df, recherche="", exportateurs=None, colonnes=None, tri=None, croissant=True,
+                 page=1, taille_page=PAGE_SIZE):
+    """Page de lignes filtrées et triées, limitée aux colonnes demandées (page ramenée dans [1, nb_pages])"""
+    positions = filtrer_positions(df, recherche, exportateurs)
+    total = len(df) if positions is None else len(positions)
+
+    if tri is not None:
+        ordre, rang = ordre_tri(df, tri)
+        if positions is None:
+            positions = ordre
+        else:
+            positions = positions[np.argsort(rang[positions], kind='stable')]
+    elif positions is None:
+        positions = np.arange(len(df))
+    if not croissant:
+        positions = positions[::-1]
+
+    nb_pages = max(1, -(-total // taille_page))
+    page = min(max(1, page), nb_pages)
+    debut = (page - 1) * taille_page
+    colonnes = list(colonnes) if colonnes else list(df.columns)
+    lignes = df.iloc[positions[debut:debut + taille_page]][colonnes]
+    return PageDonnees(lignes, total, page, nb_pages)
+
+
+def clear_caches():
+    """Vide les index et ordres de tri mémorisés (mesures de performance à froid)"""
+    for cache in (_explorer_index, _ordres_tri, _filtres):
+        cache.clear()
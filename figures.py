@@ -0,0 +1,98 @@
+"""
+Figures Plotly des onglets : cache et réduction des données envoyées au navigateur
+
+Les figures thémées sont mémorisées par (version du jeu de données, nom de la
+figure, état des widgets) : une relance du script ou un changement d'onglet
+réutilise la figure déjà construite au lieu de repasser par plotly.express et
+apply_bon_plein_theme. Les données tracées sont réduites côté serveur pour
+que le JSON transmis reste de taille bornée quel que soit le jeu :
+
+- histogrammes pré-calculés (quelques classes au lieu de toutes les valeurs),
+- top N suivi d'un regroupement « Autres »,
+- nuages de points décimés au-delà d'un nombre maximal de points.
+
+Les figures mémorisées sont partagées entre sessions : elles ne doivent pas
+être modifiées après leur construction.
+"""
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from aggregations import _VersionCache
+from theme import apply_bon_plein_theme
+
+NB_CLASSES = 20
+TOP_N = 15
+AUTRES = "Autres"
+
+# Nombre maximal de points d'un nuage avant décimation
+MAX_POINTS = 1000
+
+_figures = _VersionCache(size=128)
+
+
+def cached_figure(key, build):
+    """Figure thémée mémorisée ; key commence par la version du jeu de données"""
+    return _figures.get_or_build(key, lambda: apply_bon_plein_theme(build()))
+
+
+def histogram_classes(values, nbins=NB_CLASSES):
+    """Classes d'un histogramme : début, fin, centre et effectif (valeurs manquantes ignorées)"""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return pd.DataFrame({'début': [], 'fin': [], 'centre': [], 'effectif': []})
+    counts, edges = np.histogram(values, bins=nbins)
+    return pd.DataFrame({
+        'début': edges[:-1],
+        'fin': edges[1:],
+        'centre': (edges[:-1] + edges[1:]) / 2,
+        'effectif': counts,
+    })
+
+
+def histogram_figure(values, nbins=NB_CLASSES, title=None, x_title=None, y_title=None, color=None):
+    """Histogramme pré-calculé : seules les classes sont transmises, pas les valeurs"""
+    classes = histogram_classes(values, nbins)
+    fig = go.Figure(go.Bar(
+        x=classes['centre'],
+        y=classes['effectif'],
+        width=classes['fin'] - classes['début'],
+        customdata=classes[['début', 'fin']],
+        hovertemplate="%{customdata[0]:.1f} – %{customdata[1]:.1f} : %{y}<extra></extra>",
+        marker_color=color,
+    ))
+    fig.update_layout(title=title, xaxis_title=x_title, yaxis_title=y_title, bargap=0)
+    return fig
+
+
+def top_n_autres(df, colonne, n=TOP_N, autres=AUTRES):
+    """Les n plus grandes lignes selon colonne, suivies d'une ligne « Autres » sommant le reste
+
+    Seuls les volumes et effectifs sont sommés : les colonnes de pourcentage
+    (nom contenant « % ») ne s'additionnent pas et restent vides sur « Autres ».
+    """
+    if len(df) <= n:
+        return df
+    top = df.nlargest(n, colonne)
+    sommables = [col for col in df.select_dtypes('number').columns if '%' not in str(col)]
+    reste = df.drop(top.index)[sommables].sum()
+    autres_ligne = pd.DataFrame([reste], index=pd.Index([autres], name=df.index.name))
+    return pd.concat([top, autres_ligne])
+
+
+def decimate(df, max_points=MAX_POINTS, colonne=None):
+    """Au plus max_points lignes : les plus grandes selon colonne, puis un échantillon régulier du reste"""
+    if len(df) <= max_points:
+        return df
+    if colonne is None:
+        return df.iloc[::-(-len(df) // max_points)]
+    gardes = df.nlargest(max_points // 2, colonne)
+    reste = df.drop(gardes.index)
+    pas = -(-len(reste) // (max_points - len(gardes)))
+    return pd.concat([gardes, reste.iloc[::pas]])
+
+
+def clear_caches():
+    """Vide les figures mémorisées (mesures de performance à froid)"""
+    _figures.clear()
@@ -0,0 +1,196 @@
+"""
+Mise à jour incrémentale d'un jeu de données du stock colonnaire
+
+Les nouvelles lignes d'achat / d'export (livraisons du jour) sont ajoutées
+au stock comme une nouvelle partie Parquet, et les agrégats exportateur /
+fournisseur / port utilisés par les onglets sont mis à jour par delta : seules
+les parties pas encore agrégées sont relues. Les agrégats sont conservés à
+côté des parties, dans <stock>/<jeu>/_agregats/.
+
+Usage:
+    python incremental.py livraisons.csv --dataset 2021-2022 --sheet "dB ACHAT"
+"""
+import argparse
+import json
+import os
+import time
+
+import pandas as pd
+import pyarrow.parquet as pq
+from pandas.api.types import union_categoricals
+
+from aggregations import (ExportsCube, achats_cube_from_lignes, build_achats_cube, build_exports_cube,
+                          register_cubes, update_achats_cube, update_exports_cube)
+from data_cache import DATASET_VERSION_ATTR, format_dataset_version
+from data_loader import SHEET_ACHAT, SHEET_EXPORT, clean_rows
+from ingestion import (DEFAULT_CHUNKSIZE, DEFAULT_HEADER_ROW, STORE_DIR, ColumnStore,
+                       _slug, _store_types, ingest)
+from schema import apply_schema
+
+AGGREGATS_DIRNAME = "_agregats"
+
+# Attribut des frames relues : parties déjà présentes en mémoire
+PARTS_ATTR = "store_parts"
+
+
+def concat_typed(previous, new):
+    """Concatène deux frames typées en gardant les colonnes catégorielles (union des catégories)
+
+    Seules les colonnes de `new` (celles du stock) sont conservées : les colonnes dérivées
+    ajoutées après lecture sont recalculées par l'appelant.
+    """
+    columns = {}
+    for col in new.columns:
+        old_col, new_col = previous[col], new[col]
+        if isinstance(old_col.dtype, pd.CategoricalDtype) and isinstance(new_col.dtype, pd.CategoricalDtype):
+            columns[col] = pd.Series(union_categoricals([old_col, new_col], sort_categories=True), name=col)
+        else:
+            columns[col] = pd.concat([old_col, new_col], ignore_index=True)
+    return apply_schema(pd.DataFrame(columns))
+
+
+class IncrementalDataset:
+    """Jeu de données du stock alimenté par ajouts successifs, avec agrégats mis à jour par delta"""
+
+    def __init__(self, dataset, store=None):
+        self.dataset = dataset
+        self.store = store or ColumnStore()
+
+    @property
+    def aggregates_dir(self):
+        return self.store.root / _slug(self.dataset) / AGGREGATS_DIRNAME
+
+    def frame_version(self, sheet_name):
+        """Version qu'aura la feuille relue (identique à dataset_version(store.read(...))), sans la relire"""
+        rows = sum(pq.ParquetFile(part).metadata.num_rows for part in self.store.parts(self.dataset, sheet_name))
+        return format_dataset_version(self.store.version_tag(self.dataset, sheet_name), rows)
+
+    # --- Ajout de lignes -------------------------------------------------
+
+    def append_source(self, path, sheet_names=(SHEET_ACHAT, SHEET_EXPORT), chunksize=DEFAULT_CHUNKSIZE, **kwargs):
+        """Ajoute les lignes d'un classeur / CSV puis met les agrégats à jour ; renvoie {feuille: lignes}"""
+        added = ingest(path, self.dataset, sheet_names, self.store, chunksize, **kwargs)
+        self.cubes()
+        return added
+
+    def append_rows(self, sheet_name, rows):
+        """Ajoute des lignes brutes (colonnes nommées) d'une feuille ; renvoie le nombre de lignes ajoutées"""
+        cleaned = clean_rows(rows, sheet_name)
+        if len(cleaned) == 0:
+            return 0
+        added = self.store.append(self.dataset, sheet_name, [_store_types(cleaned.reset_index(drop=True))])
+        self.cubes()
+        return added
+
+    # --- Agrégats --------------------------------------------------------
+
+    def _state_paths(self, sheet_name):
+        base = self.aggregates_dir / _slug(sheet_name)
+        return base.with_suffix(".parquet"), base.with_suffix(".json")
+
+    def _load_state(self, sheet_name):
+        """(agrégat, parties couvertes) persistés, ou (None, []) si absents / illisibles"""
+        data_path, manifest_path = self._state_paths(sheet_name)
+        try:
+            manifest = json.loads(manifest_path.read_text())
+            aggregate = pd.read_parquet(data_path)
+        except (OSError, ValueError):
+            return None, []
+        return aggregate, manifest.get("parts", [])
+
+    def _save_state(self, sheet_name, aggregate, parts):
+        data_path, manifest_path = self._state_paths(sheet_name)
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = data_path.with_name(f".{data_path.name}.tmp")
+        aggregate.to_parquet(tmp)
+        os.replace(tmp, data_path)
+        tmp = manifest_path.with_name(f".{manifest_path.name}.tmp")
+        tmp.write_text(json.dumps({"parts": parts}))
+        os.replace(tmp, manifest_path)
+
+    def _read_parts(self, parts):
+        return pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+
+    def _update_sheet(self, sheet_name, from_aggregate, to_aggregate, build, update):
+        """Met à jour l'agrégat d'une feuille avec les seules parties nouvelles"""
+        parts = self.store.parts(self.dataset, sheet_name)
+        if not parts:
+            return None
+        version = self.frame_version(sheet_name)
+        names = [part.name for part in parts]
+        aggregate, covered = self._load_state(sheet_name)
+
+        if aggregate is None or not set(covered) <= set(names):
+            # Pas d'agrégat (ou stock réécrit) : reconstruction complète
+            cube = build(self._read_parts(parts), version)
+        else:
+            new_parts = [part for part in parts if part.name not in covered]
+            if not new_parts:
+                return from_aggregate(aggregate, version)
+            cube = update(from_aggregate(aggregate, version), self._read_parts(new_parts), version)
+
+        self._save_state(sheet_name, to_aggregate(cube), names)
+        return cube
+
+    def cubes(self):
+        """(cube achats, cube exports) à jour ; le cube exports vaut None sans feuille d'export"""
+        achats = self._update_sheet(SHEET_ACHAT, achats_cube_from_lignes, lambda cube: cube.lignes,
+                                    build_achats_cube, update_achats_cube)
+        exports = self._update_sheet(SHEET_EXPORT, lambda aggregate, version: ExportsCube(version, aggregate),
+                                     lambda cube: cube.exportateurs, build_exports_cube, update_exports_cube)
+        return achats, exports
+
+    # --- Frames ----------------------------------------------------------
+
+    def frame(self, sheet_name, previous=None):
+        """Feuille typée ; si `previous` (lecture antérieure) est fourni, seules les parties nouvelles sont relues"""
+        parts = self.store.parts(self.dataset, sheet_name)
+        if not parts:
+            return None
+        known = previous.attrs.get(PARTS_ATTR) if previous is not None else None
+        names = [part.name for part in parts]
+        if known is not None and set(known) <= set(names):
+            new_parts = [part for part in parts if part.name not in known]
+            df = previous if not new_parts else concat_typed(previous, apply_schema(self._read_parts(new_parts)))
+        else:
+            df = self.store.read(self.dataset, sheet_name)
+        df.attrs[DATASET_VERSION_ATTR] = self.store.version_tag(self.dataset, sheet_name)
+        df.attrs[PARTS_ATTR] = names
+        return df
+
+    def load(self, previous=None):
+        """(achats, exports) typés, avec leurs cubes déjà enregistrés pour get_achats_cube / get_exports_cube"""
+        previous_achats, previous_exports = previous if previous is not None else (None, None)
+        achats = self.frame(SHEET_ACHAT, previous_achats)
+        exports = self.frame(SHEET_EXPORT, previous_exports)
+        achats_cube, exports_cube = self.cubes()
+        register_cubes(achats, achats_cube, exports, exports_cube)
+        return achats, exports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ajout incrémental de lignes à un jeu de données du stock")
+    parser.add_argument("source", help="Fichier .xlsx ou .csv contenant les nouvelles lignes")
+    parser.add_argument("--dataset", required=True, help="Nom du jeu de données (ex. la saison 2021-2022)")
+    parser.add_argument("--sheet", action="append", help="Feuille à compléter (répétable) ; défaut : dB ACHAT et dB EXPORT")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Nombre de lignes par bloc")
+    parser.add_argument("--header-row", type=int, default=DEFAULT_HEADER_ROW, help="Ligne (base 0) portant les en-têtes ; défaut : 1 pour .xlsx, 0 pour .csv")
+    parser.add_argument("--sep", default=None, help="Séparateur CSV (détecté automatiquement par défaut)")
+    parser.add_argument("--store", default=str(STORE_DIR), help="Dossier du stock colonnaire")
+    args = parser.parse_args()
+
+    kwargs = {"header_row": args.header_row}
+    if args.sep:
+        kwargs["sep"] = args.sep
+    sheets = args.sheet or [SHEET_ACHAT, SHEET_EXPORT]
+
+    start = time.time()
+    dataset = IncrementalDataset(args.dataset, ColumnStore(args.store))
+    added = dataset.append_source(args.source, sheets, args.chunksize, **kwargs)
+    for sheet_name, rows in added.items():
+        print(f"{sheet_name}: {rows} lignes ajoutées")
+    print(f"Ajout et mise à jour des agrégats en {time.time() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Ingestion par blocs de classeurs / CSV volumineux vers un stock colonnaire
+
+Les lignes sont lues par blocs (openpyxl en lecture seule pour les .xlsx,
+pandas.read_csv(chunksize) pour les .csv) ; chaque bloc reçoit le même
+nettoyage que les feuilles des classeurs (data_loader.clean_rows) puis est
+ajouté à un fichier Parquet du stock. La mémoire maximale dépend de la
+taille des blocs, pas de celle du fichier.
+
+Usage:
+    python ingestion.py fichier.xlsx --dataset 2021-2022
+    python ingestion.py export.csv --dataset 2021-2022 --sheet "dB ACHAT" --chunksize 100000
+"""
+import argparse
+import csv
+import hashlib
+import os
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data_cache import DATASET_VERSION_ATTR
+from data_loader import NUMERIC_COLS, SHEET_ACHAT, SHEET_EXPORT, TEXT_COLS, _convert_cell, clean_rows
+from schema import apply_schema
+
+# Stock colonnaire des jeux de données ingérés (un dossier par jeu, une sous-partie par feuille)
+STORE_DIR = Path(os.environ.get("CACAO_STORE_DIR", "data_store"))
+
+DEFAULT_CHUNKSIZE = 50_000
+
+# Dans les classeurs, la ligne 0 est une ligne de totaux et la ligne 1 porte les en-têtes ;
+# un CSV porte ses en-têtes sur sa première ligne
+XLSX_HEADER_ROW = 1
+CSV_HEADER_ROW = 0
+
+# Ligne d'en-têtes selon le format de la source (None : XLSX_HEADER_ROW ou CSV_HEADER_ROW)
+DEFAULT_HEADER_ROW = None
+
+
+def _slug(text):
+    return re.sub(r"[^0-9A-Za-z.-]+", "_", str(text)).strip("_.") or "sheet"
+
+
+def _header_names(values):
+    """Noms de colonnes comme df.iloc[0].astype(str) : cellule vide -> 'nan'"""
+    return ['nan' if v is None or (isinstance(v, float) and np.isnan(v)) else str(v) for v in values]
+
+
+def _xlsx_chunks(path, sheet_name, chunksize, header_row):
+    """Blocs de lignes d'une feuille .xlsx, lue en flux (openpyxl read_only)"""
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet_name not in wb.sheetnames:
+            raise KeyError(f"Feuille '{sheet_name}' absente de {path}")
+        rows = wb[sheet_name].iter_rows(values_only=True)
+        columns = None
+        for i, row in enumerate(rows):
+            if i == header_row:
+                columns = _header_names(row)
+                break
+        if columns is None:
+            return
+
+        # Comme data_loader._sheet_rows : les lignes vides intermédiaires sont gardées,
+        # seules les lignes vides finales sont ignorées (mêmes lignes que l'instantané)
+        width = len(columns)
+        block = []
+        empty = []
+        for row in rows:
+            values = [_convert_cell(v) for v in row[:width]] + [None] * (width - len(row))
+            if all(v is None for v in row):
+                empty.append(values)
+                continue
+            block.extend(empty)
+            empty = []
+            block.append(values)
+            if len(block) >= chunksize:
+                yield pd.DataFrame(block, columns=columns)
+                block = []
+        if block:
+            yield pd.DataFrame(block, columns=columns)
+    finally:
+        wb.close()
+
+
+def _sniff_separator(path, encoding):
+    with open(path, "r", encoding=encoding, newline="") as f:
+        sample = f.read(64 * 1024)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+    except csv.Error:
+        return ","
+
+
+def _csv_chunks(path, chunksize, header_row, sep=None, encoding="utf-8"):
+    """Blocs de lignes d'un CSV (toutes les cellules lues en texte, converties au nettoyage)"""
+    sep = sep or _sniff_separator(path, encoding)
+    header = pd.read_csv(path, sep=sep, header=None, skiprows=header_row, nrows=1,
+                         dtype=str, encoding=encoding)
+    columns = _header_names(header.iloc[0].tolist())
+    reader = pd.read_csv(path, sep=sep, header=None, names=columns, skiprows=header_row + 1,
+                         dtype=str, chunksize=chunksize, encoding=encoding, skip_blank_lines=True)
+    for chunk in reader:
+        yield chunk
+
+
+def iter_source_chunks(path, sheet_name=SHEET_ACHAT, chunksize=DEFAULT_CHUNKSIZE,
+                       header_row=DEFAULT_HEADER_ROW, sep=None, encoding="utf-8"):
+    """Blocs bruts (colonnes nommées) d'une source .xlsx ou .csv
+
+    header_row=None : ligne d'en-têtes par défaut du format (1 pour .xlsx, 0 pour .csv).
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        header_row = CSV_HEADER_ROW if header_row is None else header_row
+        return _csv_chunks(path, chunksize, header_row, sep=sep, encoding=encoding)
+    header_row = XLSX_HEADER_ROW if header_row is None else header_row
+    return _xlsx_chunks(path, sheet_name, chunksize, header_row)
+
+
+def _store_types(df):
+    """Types stables d'un bloc à l'autre : volumes en float64, autres colonnes en texte"""
+    converted = {}
+    for col in df.columns:
+        if col in NUMERIC_COLS:
+            converted[col] = df[col].astype(np.float64)
+        elif col in TEXT_COLS:
+            converted[col] = df[col].astype(str)
+        else:
+            converted[col] = df[col].astype('string')
+    return df.assign(**converted)
+
+
+def iter_clean_chunks(path, sheet_name=SHEET_ACHAT, chunksize=DEFAULT_CHUNKSIZE, **kwargs):
+    """Blocs nettoyés comme les feuilles des classeurs (clean_rows), prêts à être ajoutés au stock"""
+    for chunk in iter_source_chunks(path, sheet_name, chunksize, **kwargs):
+        cleaned = clean_rows(chunk, sheet_name)
+        if len(cleaned):
+            yield _store_types(cleaned.reset_index(drop=True))
+
+
+class ColumnStore:
+    """Stock Parquet : <racine>/<jeu>/<feuille>/part-NNNNN.parquet
+
+    Chaque ingestion ajoute un nouveau fichier de partie (un groupe de lignes par bloc) ;
+    les parties existantes ne sont jamais réécrites.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = Path(root)
+
+    def datasets(self):
+        """Jeux de données présents dans le stock"""
+        if not self.root.exists():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir() and any(p.glob("*/part-*.parquet")))
+
+    def _sheet_dir(self, dataset, sheet_name):
+        return self.root / _slug(dataset) / _slug(sheet_name)
+
+    def parts(self, dataset, sheet_name):
+        """Fichiers de parties d'une feuille, dans l'ordre d'ajout"""
+        return sorted(self._sheet_dir(dataset, sheet_name).glob("part-*.parquet"))
+
+    def append(self, dataset, sheet_name, chunks):
+        """Écrit les blocs dans une nouvelle partie ; renvoie le nombre de lignes ajoutées"""
+        sheet_dir = self._sheet_dir(dataset, sheet_name)
+        sheet_dir.mkdir(parents=True, exist_ok=True)
+        existing = self.parts(dataset, sheet_name)
+        number = int(existing[-1].stem.split("-")[1]) + 1 if existing else 0
+        target = sheet_dir / f"part-{number:05d}.parquet"
+        tmp = sheet_dir / f".part-{number:05d}.parquet.tmp"
+
+        writer = None
+        rows = 0
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    schema = self._existing_schema(existing) or table.schema
+                    writer = pq.ParquetWriter(tmp, schema)
+                writer.write_table(table.cast(writer.schema))
+                rows += len(chunk)
+        except BaseException:
+            if writer is not None:
+                writer.close()
+            tmp.unlink(missing_ok=True)
+            raise
+        if writer is None:
+            return 0
+        writer.close()
+        os.replace(tmp, target)
+        return rows
+
+    def _existing_schema(self, parts):
+        """Schéma des parties déjà stockées, pour que toutes les parties restent compatibles"""
+        if not parts:
+            return None
+        return pq.read_schema(parts[0]).remove_metadata()
+
+    def version(self, dataset, sheet_name):
+        """Version d'une feuille du stock : dépend de la liste et de la taille des parties"""
+        digest = hashlib.sha256()
+        for part in self.parts(dataset, sheet_name):
+            digest.update(f"{part.name}:{part.stat().st_size}".encode())
+        return digest.hexdigest()[:16]
+
+    def version_tag(self, dataset, sheet_name):
+        """Étiquette de version posée sur les frames relues du stock"""
+        return f"store:{_slug(dataset)}:{_slug(sheet_name)}:{self.version(dataset, sheet_name)}"
+
+    def read(self, dataset, sheet_name, columns=None):
+        """Relit une feuille du stock avec le schéma typé (catégories, volumes ajustés)"""
+        parts = self.parts(dataset, sheet_name)
+        if not parts:
+            raise KeyError(f"Aucune donnée stockée pour {dataset} / {sheet_name}")
+        table = pa.concat_tables(pq.read_table(part, columns=columns) for part in parts)
+        df = apply_schema(table.to_pandas(split_blocks=True))
+        df.attrs[DATASET_VERSION_ATTR] = self.version_tag(dataset, sheet_name)
+        return df
+
+
+def ingest(path, dataset, sheet_names=(SHEET_ACHAT, SHEET_EXPORT), store=None,
+           chunksize=DEFAULT_CHUNKSIZE, **kwargs):
+    """Ingère les feuilles d'une source dans le stock ; renvoie {feuille: lignes ajoutées}
+
+    Un CSV ne contient qu'une feuille : sheet_names doit alors en désigner une seule.
+    """
+    store = store or ColumnStore()
+    if Path(path).suffix.lower() == ".csv" and len(sheet_names) != 1:
+        raise ValueError("Un fichier CSV correspond à une seule feuille (préciser --sheet)")
+    added = {}
+    for sheet_name in sheet_names:
+        chunks = iter_clean_chunks(path, sheet_name, chunksize, **kwargs)
+        added[sheet_name] = store.append(dataset, sheet_name, chunks)
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion par blocs d'un classeur ou d'un CSV dans le stock colonnaire")
+    parser.add_argument("source", help="Fichier .xlsx ou .csv")
+    parser.add_argument("--dataset", required=True, help="Nom du jeu de données (ex. la saison 2021-2022)")
+    parser.add_argument("--sheet", action="append", help="Feuille à ingérer (répétable) ; défaut : dB ACHAT et dB EXPORT")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Nombre de lignes par bloc")
+    parser.add_argument("--header-row", type=int, default=DEFAULT_HEADER_ROW, help="Ligne (base 0) portant les en-têtes ; défaut : 1 pour .xlsx, 0 pour .csv")
+    parser.add_argument("--sep", default=None, help="Séparateur CSV (détecté automatiquement par défaut)")
+    parser.add_argument("--store", default=str(STORE_DIR), help="Dossier du stock colonnaire")
+    args = parser.parse_args()
+
+    kwargs = {"header_row": args.header_row}
+    if args.sep:
+        kwargs["sep"] = args.sep
+    sheets = args.sheet or [SHEET_ACHAT, SHEET_EXPORT]
+
+    start = time.time()
+    added = ingest(args.source, args.dataset, sheets, ColumnStore(args.store), args.chunksize, **kwargs)
+    for sheet_name, rows in added.items():
+        print(f"{sheet_name}: {rows} lignes ajoutées")
+    print(f"Ingestion terminée en {time.time() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
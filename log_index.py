@@ -0,0 +1,172 @@
+"""
+Index SQLite du journal des accès, pour la consultation admin
+
+Les entrées de tous les jours (fichiers JSON Lines, segments compressés et
+anciens fichiers JSON) sont indexées dans logs/access_index.sqlite par
+horodatage, utilisateur et action. Les fichiers actifs étant en ajout seul,
+seuls les octets ajoutés depuis la dernière synchronisation sont relus. Les
+pages affichées et les statistiques sont calculées par requêtes indexées,
+sans charger le journal dans le processus Streamlit.
+"""
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+from access_log import LOG_DIR, log_files, read_entries
+
+INDEX_FILENAME = "access_index.sqlite"
+
+DISPLAY_COLUMNS = ['timestamp', 'username', 'action', 'details']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    username TEXT,
+    action TEXT,
+    details TEXT,
+    ip TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_entries_timestamp ON entries (timestamp);
+CREATE INDEX IF NOT EXISTS idx_entries_user ON entries (username, timestamp);
+CREATE INDEX IF NOT EXISTS idx_entries_action ON entries (action, timestamp);
+CREATE INDEX IF NOT EXISTS idx_entries_source ON entries (source);
+CREATE TABLE IF NOT EXISTS sources (
+    name TEXT PRIMARY KEY,
+    signature TEXT NOT NULL,
+    offset INTEGER NOT NULL
+);
+"""
+
+
+def _row(entry, source):
+    return (source, str(entry.get("timestamp", "")), entry.get("username"), entry.get("action"),
+            entry.get("details"), entry.get("ip"))
+
+
+def _read_appended(path, offset):
+    """(entrées, nouvel offset) des lignes complètes ajoutées après `offset`"""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    entries = []
+    for line in data[:end].splitlines():
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+    return entries, offset + end
+
+
+class AccessLogIndex:
+    """Index des entrées du journal ; sync() intègre les fichiers nouveaux ou complétés"""
+
+    def __init__(self, log_dir=LOG_DIR, db_path=None):
+        self.log_dir = Path(log_dir)
+        self.db_path = Path(db_path) if db_path else self.log_dir / INDEX_FILENAME
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _connect(self):
+        """Connexion validée en fin de bloc (annulée sur erreur) puis fermée"""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def sync(self):
+        """Indexe les entrées ajoutées depuis la dernière synchronisation ; renvoie le nombre d'entrées ajoutées"""
+        added = 0
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            known = {name: (signature, offset) for name, signature, offset in conn.execute("SELECT name, signature, offset FROM sources")}
+            present = set()
+            for path in log_files(self.log_dir):
+                present.add(path.name)
+                stat = path.stat()
+                signature = f"{stat.st_ino}:{stat.st_mtime_ns}:{stat.st_size}"
+                previous = known.get(path.name)
+                if previous and previous[0] == signature:
+                    continue
+
+                same_file = previous and previous[0].split(":")[0] == str(stat.st_ino) and stat.st_size >= previous[1]
+                if path.name.endswith(".jsonl") and same_file:
+                    # Fichier actif en ajout seul : seule la fin est relue
+                    entries, offset = _read_appended(path, previous[1])
+                else:
+                    conn.execute("DELETE FROM entries WHERE source = ?", (path.name,))
+                    if path.name.endswith(".jsonl"):
+                        entries, offset = _read_appended(path, 0)
+                    else:
+                        entries, offset = read_entries(path), stat.st_size
+
+                conn.executemany("INSERT INTO entries (source, timestamp, username, action, details, ip) VALUES (?, ?, ?, ?, ?, ?)",
+                                 [_row(entry, path.name) for entry in entries])
+                conn.execute("INSERT OR REPLACE INTO sources (name, signature, offset) VALUES (?, ?, ?)",
+                             (path.name, signature, offset))
+                added += len(entries)
+
+            # Fichiers disparus (renommés par rotation, supprimés) : leurs entrées sont retirées
+            for name in set(known) - present:
+                conn.execute("DELETE FROM entries WHERE source = ?", (name,))
+                conn.execute("DELETE FROM sources WHERE name = ?", (name,))
+        return added
+
+    def _where(self, start=None, end=None, users=None, actions=None):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(str(start))
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(str(end))
+        if users:
+            clauses.append(f"username IN ({', '.join('?' * len(users))})")
+            params.extend(users)
+        if actions is not None:
+            if not actions:
+                clauses.append("0")
+            else:
+                clauses.append(f"action IN ({', '.join('?' * len(actions))})")
+                params.extend(actions)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, start=None, end=None, users=None, actions=None, limit=50, offset=0):
+        """Une page d'entrées (plus récentes d'abord) ; start / end : bornes ISO [start, end["""
+        where, params = self._where(start, end, users, actions)
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                f"SELECT {', '.join(DISPLAY_COLUMNS)} FROM entries{where} ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+                conn, params=params + [limit, offset])
+
+    def stats(self, start=None, end=None, users=None, actions=None):
+        """Nombre d'entrées, connexions réussies, échecs et utilisateurs uniques du filtre"""
+        where, params = self._where(start, end, users, actions)
+        with self._connect() as conn:
+            total, success, failed, unique_users = conn.execute(
+                "SELECT COUNT(*), "
+                "COALESCE(SUM(action = 'LOGIN_SUCCESS'), 0), "
+                "COALESCE(SUM(action = 'LOGIN_FAILED'), 0), "
+                f"COUNT(DISTINCT username) FROM entries{where}", params).fetchone()
+        return {"total": total, "success": success, "failed": failed, "unique_users": unique_users}
+
+    def users(self):
+        """Utilisateurs présents dans le journal"""
+        with self._connect() as conn:
+            return [name for (name,) in conn.execute("SELECT DISTINCT username FROM entries WHERE username IS NOT NULL ORDER BY username")]
+
+    def time_range(self):
+        """(premier, dernier) horodatage indexé, ou (None, None)"""
+        with self._connect() as conn:
+            return conn.execute("SELECT MIN(timestamp), MAX(timestamp) FROM entries").fetchone()
@@ -0,0 +1,136 @@
+"""
+Matrice creuse fournisseurs × exportateurs (volumes livrés)
+
+La matrice est construite une fois par version du jeu de données à partir
+des paires (exportateur, fournisseur) du cube des achats : sa taille suit le
+nombre de relations réelles, pas le produit fournisseurs × exportateurs. Les
+indicateurs de concentration (HHI, part des N premiers fournisseurs,
+exclusivité) se calculent directement sur la structure creuse ; la vue
+matrice n'extrait en dense que le bloc des K plus gros fournisseurs et
+exportateurs.
+
+Les relations de volume nul (lignes à 0 kg) sont conservées comme zéros
+explicites : elles comptent comme relations, comme dans le cube.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from aggregations import COL_EXPORTATEUR, COL_FOURNISSEUR, COL_VOLUME, _VersionCache, get_achats_cube
+from data_cache import dataset_version
+
+TOP_N = 5
+TOP_K = 30
+
+
+@dataclass(frozen=True)
+class SupplierExporterMatrix:
+    """Volumes (kg) fournisseurs × exportateurs, en CSR (lignes) et CSC (colonnes)"""
+    version: str
+    fournisseurs: pd.Index
+    exportateurs: pd.Index
+    lignes: sparse.csr_matrix
+    colonnes: sparse.csc_matrix
+
+    @property
+    def nb_relations(self):
+        return self.lignes.nnz
+
+    def nbytes(self):
+        """Mémoire occupée par la structure creuse (CSR + CSC)"""
+        return sum(m.data.nbytes + m.indices.nbytes + m.indptr.nbytes for m in (self.lignes, self.colonnes))
+
+    def volumes_exportateurs(self):
+        return np.asarray(self.colonnes.sum(axis=0)).ravel()
+
+    def volumes_fournisseurs(self):
+        return np.asarray(self.lignes.sum(axis=1)).ravel()
+
+    def nb_exportateurs_par_fournisseur(self):
+        return np.diff(self.lignes.indptr)
+
+    def nb_fournisseurs_par_exportateur(self):
+        return np.diff(self.colonnes.indptr)
+
+    def hhi(self):
+        """Indice de Herfindahl-Hirschman de chaque exportateur (0 à 10 000) sur ses fournisseurs"""
+        totaux = self.volumes_exportateurs()
+        carres = np.asarray(self.colonnes.multiply(self.colonnes).sum(axis=0)).ravel()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(totaux > 0, carres / totaux ** 2 * 10000, 0.0)
+
+    def part_top_n(self, n=TOP_N):
+        """Part (%) du volume de chaque exportateur apportée par ses n premiers fournisseurs"""
+        indptr, data = self.colonnes.indptr, self.colonnes.data
+        parts = np.zeros(len(self.exportateurs))
+        for j in range(len(self.exportateurs)):
+            volumes = data[indptr[j]:indptr[j + 1]]
+            total = volumes.sum()
+            if total > 0:
+                top = volumes if len(volumes) <= n else np.partition(volumes, len(volumes) - n)[-n:]
+                parts[j] = top.sum() / total * 100
+        return parts
+
+    def exclusivite(self):
+        """(nb fournisseurs exclusifs, part exclusive du volume en %) de chaque exportateur
+
+        Un fournisseur est exclusif s'il ne livre qu'un seul exportateur.
+        """
+        exclusifs = (self.nb_exportateurs_par_fournisseur() == 1).astype(np.float64)
+        # Relations (volume nul compris) : même structure que la matrice, valeurs à 1
+        liens = sparse.csr_matrix((np.ones(self.lignes.nnz), self.lignes.indices, self.lignes.indptr),
+                                  shape=self.lignes.shape)
+        nb = liens.T @ exclusifs
+        volumes = self.lignes.T @ exclusifs
+        totaux = self.volumes_exportateurs()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            parts = np.where(totaux > 0, volumes / totaux * 100, 0.0)
+        return nb.astype(np.int64), parts
+
+    def concentration(self, n=TOP_N):
+        """Indicateurs de concentration par exportateur (tri par volume décroissant)"""
+        nb_exclusifs, part_exclusive = self.exclusivite()
+        df = pd.DataFrame({
+            COL_VOLUME: self.volumes_exportateurs(),
+            'Nb Fournisseurs': self.nb_fournisseurs_par_exportateur(),
+            'HHI': self.hhi().round(0),
+            f'% Top {n} fournisseurs': self.part_top_n(n).round(1),
+            'Fournisseurs exclusifs': nb_exclusifs,
+            '% Volume exclusif': part_exclusive.round(1),
+        }, index=pd.Index(self.exportateurs, name=COL_EXPORTATEUR))
+        return df.sort_values(COL_VOLUME, ascending=False)
+
+    def bloc(self, k_fournisseurs=TOP_K, k_exportateurs=TOP_K):
+        """Bloc dense des k plus gros fournisseurs × k plus gros exportateurs (volumes en kg)"""
+        lignes = np.argsort(-self.volumes_fournisseurs(), kind='stable')[:k_fournisseurs]
+        colonnes = np.argsort(-self.volumes_exportateurs(), kind='stable')[:k_exportateurs]
+        dense = self.lignes[lignes][:, colonnes].toarray()
+        return pd.DataFrame(dense, index=pd.Index(self.fournisseurs[lignes], name=COL_FOURNISSEUR),
+                            columns=pd.Index(self.exportateurs[colonnes], name=COL_EXPORTATEUR))
+
+
+def build_supplier_matrix(cube):
+    """Matrice creuse depuis les paires (exportateur, fournisseur) du cube des achats"""
+    paires = cube.paires
+    index = paires.index.remove_unused_levels()
+    exportateurs, fournisseurs = index.levels
+    volumes = paires[COL_VOLUME].to_numpy(dtype=np.float64)
+    coo = sparse.coo_matrix((volumes, (index.codes[1], index.codes[0])),
+                            shape=(len(fournisseurs), len(exportateurs)))
+    return SupplierExporterMatrix(cube.version, pd.Index(fournisseurs), pd.Index(exportateurs), coo.tocsr(), coo.tocsc())
+
+
+_matrices = _VersionCache()
+
+
+def get_supplier_matrix(df):
+    """Matrice fournisseurs × exportateurs, construite une fois par version du jeu de données"""
+    version = dataset_version(df)
+    return _matrices.get_or_build(version, lambda: build_supplier_matrix(get_achats_cube(df)))
+
+
+def clear_caches():
+    """Vide les matrices mémorisées (mesures de performance à froid)"""
+    _matrices.clear()
@@ -0,0 +1,84 @@
+"""
+Schéma typé en mémoire des feuilles achats / exports
+
+Les dimensions texte très répétées (fournisseurs, exportateurs, régions...)
+sont stockées en catégories et les volumes en entiers de taille ajustée.
+Cela réduit la mémoire des DataFrames, donc aussi le coût de sérialisation
+du cache Streamlit et des instantanés Arrow.
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+CATEGORICAL_COLS = ['Code fournisseur', 'Nom fournisseur', 'Exportateurs', 'EXPORTATEUR SIMPLE', 'Region activité']
+VOLUME_COLS = ['Volume livré (kg)', 'ABIDJAN', 'INTERIEUR', 'SAN PEDRO', 'Volume exporté (kg)', 'Total Exporté']
+
+# Plus petit type entier utilisé pour les volumes : int32 garde les opérations
+# ligne à ligne sans débordement (les sommes pandas passent de toute façon en int64)
+_INT_TYPES = [np.int32, np.int64]
+
+
+def downcast_volume(series):
+    """Entier le plus petit possible si toutes les valeurs sont entières, sinon float64"""
+    values = series.to_numpy()
+    if not np.issubdtype(values.dtype, np.number):
+        return series
+    if np.issubdtype(values.dtype, np.floating):
+        if not np.isfinite(values).all() or not np.equal(np.mod(values, 1), 0).all():
+            return series.astype(np.float64)
+    if len(values) == 0:
+        return series.astype(_INT_TYPES[0])
+    low, high = values.min(), values.max()
+    for int_type in _INT_TYPES:
+        info = np.iinfo(int_type)
+        if info.min <= low and high <= info.max:
+            return series.astype(int_type)
+    return series
+
+
+def apply_schema(df):
+    """Convertit les dimensions texte en catégories et ajuste le type des volumes"""
+    converted = {}
+    for col in CATEGORICAL_COLS:
+        if col in df.columns:
+            converted[col] = df[col].astype('category').cat.remove_unused_categories()
+    for col in VOLUME_COLS:
+        if col in df.columns:
+            converted[col] = downcast_volume(df[col])
+    if not converted:
+        return df
+    return df.assign(**converted)
+
+
+def _object_column_bytes(series):
+    """Taille estimée de la colonne si elle était stockée en chaînes Python (dtype object)"""
+    categories = series.cat.categories
+    sizes = np.fromiter((sys.getsizeof(str(c)) for c in categories), dtype=np.int64, count=len(categories))
+    codes = series.cat.codes.to_numpy()
+    strings = int(sizes[codes[codes >= 0]].sum()) if len(sizes) else 0
+    return strings + 8 * len(series)
+
+
+def memory_report(df):
+    """Mémoire par colonne : schéma typé vs stockage brut (chaînes object, float64)
+
+    Le volume "brut" est estimé à partir des catégories, sans reconstruire les chaînes.
+    """
+    rows = []
+    for col in df.columns:
+        series = df[col]
+        current = int(series.memory_usage(index=False, deep=True))
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            raw = _object_column_bytes(series)
+        elif pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+            raw = 8 * len(series)
+        else:
+            raw = current
+        rows.append({'Colonne': col, 'Type': str(series.dtype), 'Mémoire (octets)': current, 'Mémoire brute (octets)': raw})
+
+    report = pd.DataFrame(rows)
+    total_current = int(report['Mémoire (octets)'].sum()) if rows else 0
+    total_raw = int(report['Mémoire brute (octets)'].sum()) if rows else 0
+    ratio = total_raw / total_current if total_current else 1.0
+    return report, total_current, total_raw, ratio
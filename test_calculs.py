@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+
+from calculs import format_number_column
+from theme import format_number
+
+
+def test_format_number_column_vide():
+    resultat = format_number_column(pd.Series([], dtype=float))
+    assert len(resultat) == 0
+    assert resultat.dtype == object
+
+
+def test_format_number_column_comme_format_number():
+    valeurs = pd.Series([0, 7, 999, 1000, 1234567.8, -45000], index=list("abcdef"))
+    resultat = format_number_column(valeurs)
+    assert list(resultat.index) == list(valeurs.index)
+    assert list(resultat) == [format_number(v) for v in valeurs]
+
+
+def test_format_number_column_non_fini():
+    assert list(format_number_column([np.nan, 1500])) == ['nan', '1 500']
@@ -0,0 +1,48 @@
+import openpyxl
+
+from data_loader import SHEET_ACHAT, SHEET_EXPORT, load_sheets
+from ingestion import ColumnStore, ingest
+
+ACHAT = ['Code fournisseur', 'Nom fournisseur', 'Exportateurs', 'EXPORTATEUR SIMPLE', 'Region activité',
+         'Volume livré (kg)', 'ABIDJAN', 'INTERIEUR', 'SAN PEDRO']
+EXPORT = ['EXPORTATEUR SIMPLE', 'ABJ', 'SP', 'Total général']
+
+
+def _classeur(path):
+    """Classeur au format des saisons (ligne de totaux, en-têtes) avec des lignes vides au milieu et à la fin"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = SHEET_ACHAT
+    ws.append(["2020/2021"])
+    ws.append(ACHAT)
+    ws.append(["A1", "COOP A", "EXP A", "EXP A", "NORD", 1000.0, 1000, 0, 0])
+    ws.append([None] * len(ACHAT))
+    ws.append(["A2", "COOP B", "EXP B", "EXP B", "SUD", 2500, 0, 0, 2500])
+    ws = wb.create_sheet(SHEET_EXPORT)
+    ws.append(["Total"])
+    ws.append(EXPORT)
+    ws.append(["EXP A", 900, 0, 900])
+    ws.append([None] * len(EXPORT))
+    ws.append(["EXP B", 0, 2400, 2400])
+    ws.append([None] * len(EXPORT))
+    ws.append([None] * len(EXPORT))
+    wb.save(path)
+
+
+def test_ingestion_memes_lignes_que_l_instantane(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / "saison.xlsx"
+    _classeur(source)
+
+    store = ColumnStore(tmp_path / "stock")
+    ingest(source, "2020-2021", store=store)
+    sheets = load_sheets(source)
+
+    for sheet_name in (SHEET_ACHAT, SHEET_EXPORT):
+        attendu = sheets[sheet_name]
+        stocke = store.read("2020-2021", sheet_name)
+        assert len(stocke) == len(attendu)
+        for col in attendu.columns:
+            assert stocke[col].astype(str).tolist() == attendu[col].astype(str).tolist()
+    # La ligne vide intermédiaire de dB EXPORT est gardée, les lignes vides finales non
+    assert len(sheets[SHEET_EXPORT]) == 3
@@ -0,0 +1,57 @@
+"""
+Charte graphique BON PLEIN : couleurs, thème Plotly et formats numériques
+
+Partagée par le dashboard Streamlit et les rapports générés hors application.
+"""
+import numpy as np
+
+# Configuration des couleurs BON PLEIN pour les graphiques
+BON_PLEIN_COLORS = {
+    'primary': '#1e3a5f',
+    'secondary': '#2c5282', 
+    'accent': '#bee3f8',
+    'text': '#2c3e50',
+    'text_secondary': '#666',
+    'palette': ['#1e3a5f', '#2c5282', '#bee3f8', '#4a5568', '#2d3748', '#1a202c', '#718096', '#4299e1', '#63b3ed', '#90cdf4']
+}
+
+def format_number(num):
+    """Formate un nombre selon les standards BON PLEIN : Arial, pas de virgule, séparateur milliers"""
+    if isinstance(num, (int, float, np.integer, np.floating)):
+        # Toujours convertir en entier et ajouter séparateur de milliers
+        return f"{int(num):,}".replace(",", " ")
+    return str(num)
+
+def format_tonnage(kg_value):
+    """Formate un tonnage : XXX XXX tonnes"""
+    tonnes = kg_value / 1000
+    return f"{format_number(tonnes)} tonnes"
+
+def apply_bon_plein_theme(fig):
+    """Applique le thème BON PLEIN à un graphique Plotly"""
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(
+            family="Arial, sans-serif",
+            size=12,
+            color=BON_PLEIN_COLORS['text']
+        ),
+        title=dict(
+            font=dict(size=16, color=BON_PLEIN_COLORS['primary'], weight='normal'),
+            x=0.5,
+            xanchor='center'
+        ),
+        xaxis=dict(
+            gridcolor='rgba(190, 227, 248, 0.3)',
+            linecolor=BON_PLEIN_COLORS['accent'],
+            tickcolor=BON_PLEIN_COLORS['secondary']
+        ),
+        yaxis=dict(
+            gridcolor='rgba(190, 227, 248, 0.3)', 
+            linecolor=BON_PLEIN_COLORS['accent'],
+            tickcolor=BON_PLEIN_COLORS['secondary']
+        ),
+        colorway=BON_PLEIN_COLORS['palette']
+    )
+    return fig
@@ -0,0 +1,298 @@
+"""
+Séries temporelles des expéditions : agrégats journaliers, hebdomadaires et mensuels
+
+Les lignes d'achat (dB ACHAT) ne sont pas datées ; seules les déclarations
+d'export des feuilles « IMPORT <saison> » le sont (DATENR, PORT, PDSNET,
+EXPORTATEUR SIMPLE). Elles sont lues une fois (instantané Arrow, comme les
+autres feuilles) puis agrégées en un cube jour × exportateur × port, avec :
+
+- les cumuls le long des jours : le volume d'une plage de dates se lit par
+  une différence de deux cumuls, sans repasser sur les lignes ;
+- les agrégats hebdomadaires et mensuels, déduits du cube journalier.
+
+Les courbes de campagne (cumul depuis le 1er octobre) et les séries des
+onglets se calculent sur ces agrégats ; le cube est construit une fois par
+version de la feuille.
+"""
+import re
+from dataclasses import dataclass
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from aggregations import COL_EXPORTATEUR, _VersionCache
+from calculs import format_number_column
+from catalog import _sheet_names
+from data_cache import dataset_version, load_snapshot
+from data_loader import EXPORT_RENAME_MAP
+from entity_resolution import CANONICAL_COLS, MAPPING_FILE, add_canonical_columns, get_resolver
+
+SHEET_PREFIX = "IMPORT"
+
+COL_DATE = 'DATENR'
+COL_PORT = 'PORT'
+COL_POIDS = 'PDSNET'
+COL_EXPORTATEUR_CANONIQUE = CANONICAL_COLS[COL_EXPORTATEUR][1]
+COLONNES = [COL_DATE, COL_PORT, COL_POIDS, COL_EXPORTATEUR]
+
+# Ports des déclarations (ABJ, SP) -> noms des autres feuilles
+PORTS = {code: nom for code, nom in EXPORT_RENAME_MAP.items() if code in ('ABJ', 'SP')}
+
+# Une campagne cacao court du 1er octobre au 30 septembre
+MOIS_DEBUT_CAMPAGNE = 10
+
+FREQUENCES = {'Jour': 'D', 'Semaine': 'W', 'Mois': 'M'}
+
+_SAISON = re.compile(r"(20\d{2})\D?(20\d{2})")
+
+
+def shipment_sheet(sheet_names):
+    """Feuille des déclarations d'export datées (« IMPORT ... »), ou None"""
+    return next((name for name in sheet_names if name.upper().startswith(SHEET_PREFIX)), None)
+
+
+def read_shipments(file_path, sheet_name):
+    """Déclarations datées d'une feuille IMPORT : date, port, poids net (kg), exportateur"""
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb[sheet_name].iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        manquantes = [col for col in COLONNES if col not in header]
+        if manquantes:
+            raise KeyError(f"Colonnes absentes de la feuille '{sheet_name}': {', '.join(manquantes)}")
+        positions = [header.index(col) for col in COLONNES]
+        values = [[row[i] if i < len(row) else None for i in positions] for row in rows]
+    finally:
+        wb.close()
+
+    df = pd.DataFrame(values, columns=COLONNES)
+    df[COL_DATE] = pd.to_datetime(df[COL_DATE], errors='coerce').dt.normalize()
+    df[COL_POIDS] = pd.to_numeric(df[COL_POIDS], errors='coerce').fillna(0).astype(np.int64)
+    df[COL_PORT] = df[COL_PORT].map(PORTS).astype('category')
+    df[COL_EXPORTATEUR] = df[COL_EXPORTATEUR].astype('category')
+    return df.dropna(subset=[COL_DATE, COL_PORT, COL_EXPORTATEUR]).reset_index(drop=True)
+
+
+def load_shipments(file_path, sheet_name):
+    """Déclarations d'une feuille, depuis l'instantané Arrow si le classeur n'a pas changé"""
+    return load_snapshot(file_path, sheet_name, lambda: read_shipments(file_path, sheet_name))
+
+
+def debut_campagne(date):
+    """1er octobre de la campagne contenant la date"""
+    annee = date.year if date.month >= MOIS_DEBUT_CAMPAGNE else date.year - 1
+    return pd.Timestamp(annee, MOIS_DEBUT_CAMPAGNE, 1)
+
+
+def campagne_saison(label):
+    """1er octobre de la campagne désignée par un libellé de saison (ex. « 2020-2021 »), ou None"""
+    match = _SAISON.search(str(label))
+    return pd.Timestamp(int(match.group(1)), MOIS_DEBUT_CAMPAGNE, 1) if match else None
+
+
+def _campagne_majoritaire(dates):
+    """1er octobre de la campagne qui porte le plus de déclarations"""
+    annees = dates.dt.year - (dates.dt.month < MOIS_DEBUT_CAMPAGNE)
+    return pd.Timestamp(int(annees.mode().iloc[0]), MOIS_DEBUT_CAMPAGNE, 1)
+
+
+def _dans_campagne(dates, debut):
+    """Masque des dates comprises entre le 1er octobre debut et le 30 septembre suivant"""
+    return dates.between(debut, debut + pd.DateOffset(years=1) - pd.Timedelta(days=1)).to_numpy()
+
+
+def _periodes(jours, frequence):
+    """Indices de début de chaque période (semaine ou mois) dans le calendrier journalier, et leurs libellés"""
+    periodes = jours.to_period(frequence)
+    debuts = np.flatnonzero(np.r_[True, periodes[1:] != periodes[:-1]])
+    return debuts, periodes[debuts].start_time
+
+
+@dataclass(frozen=True)
+class ShipmentRollups:
+    """Volumes expédiés (kg) jour × exportateur × port, avec cumuls et agrégats semaine / mois
+
+    jours couvre sans trou le calendrier du 1er octobre de la campagne au
+    dernier jour déclaré ; cumuls[i] = volume des jours [0, i).
+    hors_campagne : déclarations écartées car datées hors de la campagne
+    (date mal saisie), qui étireraient sinon le calendrier sans limite.
+    """
+    version: str
+    jours: pd.DatetimeIndex
+    exportateurs: pd.Index
+    ports: pd.Index
+    quotidien: np.ndarray             # (jours, exportateurs, ports)
+    cumuls: np.ndarray                # (jours + 1, exportateurs, ports)
+    agregats: dict                    # fréquence 'W' / 'M' -> (index des périodes, volumes)
+    hors_campagne: int = 0
+
+    def _selection(self, exportateurs=None, ports=None):
+        e = slice(None) if not exportateurs else [i for i in self.exportateurs.get_indexer(exportateurs) if i >= 0]
+        p = slice(None) if not ports else [i for i in self.ports.get_indexer(ports) if i >= 0]
+        return e, p
+
+    def _bornes(self, debut=None, fin=None):
+        """Positions [i, j) des jours de la plage [debut, fin] (dates incluses)"""
+        i = 0 if debut is None else self.jours.searchsorted(pd.Timestamp(debut))
+        j = len(self.jours) if fin is None else self.jours.searchsorted(pd.Timestamp(fin), side='right')
+        return i, max(i, j)
+
+    def totaux(self, debut=None, fin=None):
+        """Volumes exportateur × port de la plage de dates (différence de cumuls)"""
+        i, j = self._bornes(debut, fin)
+        return pd.DataFrame(self.cumuls[j] - self.cumuls[i], index=self.exportateurs, columns=self.ports)
+
+    def total(self, debut=None, fin=None, exportateurs=None, ports=None):
+        """Volume de la plage de dates pour la sélection d'exportateurs et de ports"""
+        i, j = self._bornes(debut, fin)
+        e, p = self._selection(exportateurs, ports)
+        return float((self.cumuls[j] - self.cumuls[i])[e][:, p].sum())
+
+    def serie(self, frequence='D', exportateurs=None, ports=None, par_port=False):
+        """Volumes par période (D, W ou M) de la sélection ; une colonne par port si par_port"""
+        if frequence == 'D':
+            index, volumes = self.jours, self.quotidien
+        else:
+            index, volumes = self.agregats[frequence]
+        e, p = self._selection(exportateurs, ports)
+        volumes = volumes[:, e][:, :, p].sum(axis=1)
+        if par_port:
+            return pd.DataFrame(volumes, index=index, columns=self.ports[p])
+        return pd.Series(volumes.sum(axis=1), index=index)
+
+    def cumul_campagne(self, exportateurs=None, ports=None):
+        """Volume cumulé depuis le début de chaque campagne, jour par jour (index : date)"""
+        e, p = self._selection(exportateurs, ports)
+        cumuls = self.cumuls[:, e][:, :, p].sum(axis=(1, 2))
+        # Remise à zéro au 1er octobre : on retranche le cumul du début de la campagne
+        debuts = np.flatnonzero((self.jours.month == MOIS_DEBUT_CAMPAGNE) & (self.jours.day == 1))
+        depart = np.zeros(len(self.jours), dtype=np.int64)
+        depart[debuts] = debuts
+        depart = np.maximum.accumulate(depart)
+        return pd.Series(cumuls[1:] - cumuls[depart], index=self.jours)
+
+
+def build_rollups(shipments, version=None, campagne=None):
+    """Cube jour × exportateur × port et ses agrégats depuis les déclarations
+
+    Le calendrier est borné à une campagne (1er octobre au 30 septembre) :
+    campagne (1er octobre) si elle est donnée et contient des déclarations,
+    sinon celle qui en porte le plus. Les déclarations datées hors campagne
+    sont écartées.
+    """
+    version = version or dataset_version(shipments)
+    hors_campagne = 0
+    if len(shipments):
+        dates = shipments[COL_DATE]
+        debut = campagne if campagne is not None else _campagne_majoritaire(dates)
+        dans_campagne = _dans_campagne(dates, debut)
+        if not dans_campagne.any():
+            debut = _campagne_majoritaire(dates)
+            dans_campagne = _dans_campagne(dates, debut)
+        hors_campagne = int((~dans_campagne).sum())
+        shipments = shipments[dans_campagne]
+    exportateur = COL_EXPORTATEUR_CANONIQUE if COL_EXPORTATEUR_CANONIQUE in shipments.columns else COL_EXPORTATEUR
+    exportateurs = shipments[exportateur].astype('category')
+    ports = shipments[COL_PORT].astype('category')
+    dates = shipments[COL_DATE]
+    if len(shipments):
+        jours = pd.date_range(debut, dates.max(), freq='D')
+    else:
+        jours = pd.DatetimeIndex([])
+
+    # Une seule passe sur les lignes : case (jour, exportateur, port) aplatie puis bincount
+    forme = (len(jours), len(exportateurs.cat.categories), len(ports.cat.categories))
+    jour = (dates - jours[0]).dt.days.to_numpy() if len(jours) else np.zeros(0, dtype=np.int64)
+    cases = np.ravel_multi_index((jour, exportateurs.cat.codes.to_numpy(), ports.cat.codes.to_numpy()), forme)
+    quotidien = np.bincount(cases, weights=shipments[COL_POIDS].to_numpy(dtype=np.float64),
+                            minlength=int(np.prod(forme))).reshape(forme)
+
+    cumuls = np.zeros((len(jours) + 1,) + quotidien.shape[1:])
+    np.cumsum(quotidien, axis=0, out=cumuls[1:])
+    agregats = {}
+    for frequence in ('W', 'M'):
+        debuts, index = _periodes(jours, frequence) if len(jours) else (np.zeros(0, dtype=np.int64), jours)
+        volumes = np.add.reduceat(quotidien, debuts, axis=0) if len(debuts) else quotidien[:0]
+        agregats[frequence] = (pd.DatetimeIndex(index), volumes)
+
+    return ShipmentRollups(
+        version=version,
+        jours=jours,
+        exportateurs=pd.Index(exportateurs.cat.categories.astype(str), name=COL_EXPORTATEUR),
+        ports=pd.Index(ports.cat.categories.astype(str), name=COL_PORT),
+        quotidien=quotidien,
+        cumuls=cumuls,
+        agregats=agregats,
+        hors_campagne=hors_campagne,
+    )
+
+
+def courbes_campagne(rollups, exportateurs=None, ports=None):
+    """Cumuls de campagne alignés par jour de campagne : une colonne par campagne
+
+    rollups : agrégats d'une ou plusieurs saisons ; les campagnes présentes
+    dans plusieurs agrégats sont additionnées.
+    """
+    courbes = {}
+    for rollup in rollups:
+        cumul = rollup.cumul_campagne(exportateurs, ports)
+        annees = cumul.index.year - (cumul.index.month < MOIS_DEBUT_CAMPAGNE)
+        for annee, serie in cumul.groupby(annees):
+            debut = pd.Timestamp(annee, MOIS_DEBUT_CAMPAGNE, 1)
+            label = f"{annee}-{annee + 1}"
+            serie.index = (serie.index - debut).days
+            courbes[label] = courbes[label].add(serie, fill_value=0) if label in courbes else serie
+    if not courbes:
+        return pd.DataFrame()
+    courbes = pd.DataFrame(courbes).sort_index(axis=1)
+    courbes.index.name = 'Jour de campagne'
+    return courbes
+
+
+def tableau_plage(rollups, debut=None, fin=None, exportateurs=None, ports=None):
+    """Volumes (kg) par exportateur et par port sur la plage de dates, formatés pour l'affichage"""
+    totaux = pd.concat([rollup.totaux(debut, fin) for rollup in rollups]).groupby(level=0).sum()
+    if exportateurs:
+        totaux = totaux.loc[totaux.index.isin(exportateurs)]
+    if ports:
+        totaux = totaux[[port for port in totaux.columns if port in ports]]
+    totaux['Total'] = totaux.sum(axis=1)
+    totaux = totaux[totaux['Total'] > 0].sort_values('Total', ascending=False)
+    return totaux.apply(format_number_column)
+
+
+_rollups = _VersionCache()
+
+
+def get_rollups(shipments, resolver=None, campagne=None):
+    """Agrégats temporels d'une feuille de déclarations, construits une fois par version et par campagne
+
+    Avec un résolveur (entity_resolution), les exportateurs sont agrégés sous leur nom canonique.
+    """
+    version = dataset_version(shipments)
+    return _rollups.get_or_build((version, campagne), lambda: build_rollups(
+        add_canonical_columns(shipments, resolver), version, campagne))
+
+
+def season_rollups(catalog, label):
+    """Agrégats temporels d'une saison du catalogue, bornés à sa campagne
+
+    None sans feuille IMPORT datée, ou si la feuille n'a pas les colonnes attendues.
+    """
+    season = catalog.season(label)
+    if season is None or season.source != "xlsx":
+        return None
+    sheet = shipment_sheet(_sheet_names(season.path))
+    if sheet is None:
+        return None
+    try:
+        shipments = load_shipments(season.path, sheet)
+    except KeyError:
+        return None
+    return get_rollups(shipments, get_resolver(catalog.data_dir / MAPPING_FILE.name), campagne_saison(label))
+
+
+def clear_caches():
+    """Vide les agrégats mémorisés (mesures de performance à froid)"""
+    _rollups.clear()